@@ -0,0 +1,85 @@
+"""
+Accuracy-versus-memory benchmark for the HyperLogLog distinct-count sketches.
+
+Scales up data/raw/saas_sales.csv by tiling it with fresh customer ids, then
+counts distinct values per group two ways: exactly (deduplicated group/value
+pairs, as the streaming pipeline keeps them) and with GroupedHLL sketches at
+several precisions. Both are built chunk by chunk and merged, like the
+streaming and incremental pipelines do. Two workloads are reported:
+
+    products per customer   many small groups (nunique features)
+    customers per month     few large groups (cohort / active-customer counts)
+
+Usage:
+    python benchmarks/bench_distinct_sketches.py --copies 200 --precisions 8 10 12 14
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import load_scaled_sales
+from src.cohorts import encode_periods
+from src.sketches import GroupedHLL, standard_error
+
+
+def exact_counts(keys, values, chunksize):
+    """Distinct counts from merged per-chunk (key, value) pairs"""
+    start = time.perf_counter()
+    pairs = None
+    for offset in range(0, len(keys), chunksize):
+        chunk = pd.DataFrame({'key': keys[offset:offset + chunksize],
+                              'value': values[offset:offset + chunksize]}).drop_duplicates()
+        pairs = chunk if pairs is None else pd.concat([pairs, chunk]).drop_duplicates()
+    counts = pairs.groupby('key').size()
+    nbytes = int(pairs.memory_usage(index=False, deep=True).sum())
+    return counts, nbytes, time.perf_counter() - start
+
+
+def sketch_counts(keys, values, chunksize, precision):
+    """Distinct-count estimates from merged per-chunk sketches"""
+    start = time.perf_counter()
+    sketch = None
+    for offset in range(0, len(keys), chunksize):
+        chunk = GroupedHLL.from_values(keys[offset:offset + chunksize],
+                                       values[offset:offset + chunksize], precision)
+        sketch = chunk if sketch is None else sketch.merge(chunk)
+    return sketch.estimate(), sketch.nbytes(), time.perf_counter() - start
+
+
+def run_workload(name, keys, values, chunksize, precisions):
+    exact, exact_bytes, exact_seconds = exact_counts(keys, values, chunksize)
+    print(f"\n{name}: {len(exact):,} groups, median {exact.median():,.0f} / max {exact.max():,} distinct")
+    print(f"{'method':>10} {'memory_MB':>10} {'seconds':>8} {'mean_err%':>10} {'p99_err%':>9} "
+          f"{'max_err%':>9} {'expected%':>10}")
+    print(f"{'exact':>10} {exact_bytes / 1e6:>10.2f} {exact_seconds:>8.2f} {0:>10.2f} {0:>9.2f} "
+          f"{0:>9.2f} {0:>10.2f}")
+
+    for precision in precisions:
+        estimates, nbytes, seconds = sketch_counts(keys, values, chunksize, precision)
+        errors = (estimates.reindex(exact.index) / exact - 1).abs() * 100
+        print(f"{'p=' + str(precision):>10} {nbytes / 1e6:>10.2f} {seconds:>8.2f} {errors.mean():>10.2f} "
+              f"{np.percentile(errors, 99):>9.2f} {errors.max():>9.2f} {standard_error(precision) * 100:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=100, help='Number of tiled copies of the raw data')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Rows per chunk')
+    parser.add_argument('--precisions', type=int, nargs='+', default=[8, 10, 12, 14])
+    args = parser.parse_args()
+
+    df = load_scaled_sales(args.copies)
+    print(f"Rows: {len(df):,}  Customers: {df['Customer ID'].nunique():,}")
+
+    run_workload('products per customer', df['Customer ID'], df['Product'], args.chunksize, args.precisions)
+
+    # Integer month numbers, as the cohort engine keys its cells
+    months, _ = encode_periods(df['Order Date'], 'M')
+    run_workload('customers per month', pd.Series(months), df['Customer ID'], args.chunksize, args.precisions)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark of the experiment-design engine against per-call loops.
+
+1. Sample sizes: the notebook 03 calculate_sample_size called in a Python loop
+   over a baselines x MDEs x alphas x powers grid versus one
+   sample_size_grid broadcast (checked to give identical sizes).
+2. Simulated power for Sales from data/raw/saas_sales.csv: a loop calling
+   scipy.stats.mannwhitneyu once per simulated experiment versus the batched
+   simulate_power at several worker counts, and a repeat served from
+   PowerCache.
+
+Usage:
+    python benchmarks/bench_experiment_design.py --simulations 2000 --workers 1 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import mannwhitneyu, norm
+
+from common import RAW_PATH
+from src.experiment_design import PowerCache, sample_size_grid, simulate_power
+
+
+def calculate_sample_size(baseline_rate, minimum_detectable_effect, alpha=0.05, power=0.8):
+    """Notebook 03 reference"""
+    p1 = baseline_rate
+    p2 = p1 * (1 + minimum_detectable_effect)
+    p_pool = (p1 + p2) / 2
+    z_alpha = norm.ppf(1 - alpha / 2)
+    z_beta = norm.ppf(power)
+    n = (z_alpha * np.sqrt(2 * p_pool * (1 - p_pool)) +
+         z_beta * np.sqrt(p1 * (1 - p1) + p2 * (1 - p2))) ** 2 / (p2 - p1) ** 2
+    return int(np.ceil(n))
+
+
+def loop_power(values, effect, n, n_simulations, alpha, seed):
+    """One scipy Mann-Whitney test per simulated experiment"""
+    rng = np.random.default_rng(seed)
+    rejections = 0
+    for _ in range(n_simulations):
+        control = values[rng.integers(0, len(values), n)]
+        treatment = values[rng.integers(0, len(values), n)] * (1 + effect)
+        rejections += mannwhitneyu(control, treatment, method='asymptotic').pvalue < alpha
+    return rejections / n_simulations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--simulations', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    baselines = np.linspace(0.02, 0.5, 25)
+    mdes = np.linspace(0.02, 0.3, 15)
+    alphas, powers = [0.01, 0.05, 0.1], [0.8, 0.9, 0.95]
+    start = time.perf_counter()
+    reference = [calculate_sample_size(b, m, a, p) for b in baselines for m in mdes for a in alphas for p in powers]
+    loop_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    grid = sample_size_grid(baselines, mdes, alphas, powers)
+    grid_seconds = time.perf_counter() - start
+    assert (grid['n_per_arm'].to_numpy() == np.array(reference)).all()
+    print(f"Sample-size grid ({len(grid):,} designs): loop {loop_seconds * 1000:.1f} ms, "
+          f"broadcast {grid_seconds * 1000:.1f} ms ({loop_seconds / grid_seconds:.0f}x)")
+
+    sales = pd.read_csv(RAW_PATH)['Sales'].to_numpy()
+    effects, sizes = [0.1, 0.2], [250, 500, 1000]
+    start = time.perf_counter()
+    reference = {(e, n): loop_power(sales, e, n, args.simulations, 0.05, 0) for e in effects for n in sizes}
+    loop_seconds = time.perf_counter() - start
+    print(f"\nMann-Whitney power, {len(reference)} designs x {args.simulations:,} simulations")
+    print(f"  scipy loop:            {loop_seconds:7.2f}s")
+
+    for n_workers in args.workers:
+        start = time.perf_counter()
+        power = simulate_power(sales, effects, sizes, seed=0, n_simulations=args.simulations, n_workers=n_workers)
+        seconds = time.perf_counter() - start
+        # Both estimates are noisy: compare in standard errors of their difference
+        worst = max(abs(row.power - reference[(row.effect, row.n_per_arm)]) / max(np.sqrt(2) * row.power_se, 1e-9)
+                    for row in power.itertuples())
+        print(f"  batched, {n_workers} worker(s): {seconds:7.2f}s ({loop_seconds / seconds:.0f}x), "
+              f"largest gap to loop {worst:.1f} standard errors")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PowerCache(os.path.join(tmp, 'power.json'))
+        simulate_power(sales, effects, sizes, seed=0, n_simulations=args.simulations, cache=cache)
+        start = time.perf_counter()
+        simulate_power(sales, effects, sizes, seed=0, n_simulations=args.simulations,
+                       cache=PowerCache(os.path.join(tmp, 'power.json')))
+        print(f"  cached repeat:         {time.perf_counter() - start:7.3f}s")
+    print()
+    print(power.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Staged vs fused feature pipeline benchmark.
+
+Builds customer features from a cleaned, tiled copy of
+data/raw/saas_sales.csv with the staged steps (create_customer_features +
+add_derived_metrics) and with the fused aggregation plan, checks that both
+produce identical customer features and reports wall time and tracemalloc
+peak memory for each.
+
+Passes over the transaction rows after cleaning:
+    staged: feature groupby, RFM groupby on the date column, global date max,
+            then a merge of the RFM table back into the features
+    fused:  one groupby; recency/frequency and ratios are derived from the
+            customer-level aggregates
+
+Usage:
+    python benchmarks/bench_fused_pipeline.py --copies 100
+"""
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from common import load_scaled_sales
+from src.data_processing import (
+    standardize_column_names,
+    create_column_mapping,
+    ensure_customer_id,
+    clean_data,
+    create_customer_features,
+    add_derived_metrics,
+    build_customer_features_fused,
+)
+
+
+def staged_features(df, mapping, date_columns):
+    customer_features = create_customer_features(df, mapping)
+    return add_derived_metrics(customer_features, df, mapping, date_columns)
+
+
+def profile_stage(build, df, mapping, date_columns):
+    """Best-of-3 wall time, then tracemalloc peak in a separate run"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            customer_features = build(df, mapping, date_columns)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        build(df, mapping, date_columns)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return customer_features, min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=50, help='Number of tiled copies of the raw data')
+    args = parser.parse_args()
+
+    df = load_scaled_sales(args.copies)
+    print(f"Rows: {len(df):,}  Customers: {df['Customer ID'].nunique():,}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = standardize_column_names(df)
+        mapping = create_column_mapping(df)
+        df, mapping = ensure_customer_id(df, mapping)
+        df, date_columns = clean_data(df, mapping)
+
+    staged, staged_seconds, staged_peak = profile_stage(staged_features, df, mapping, date_columns)
+    fused, fused_seconds, fused_peak = profile_stage(build_customer_features_fused, df, mapping, date_columns)
+    pd.testing.assert_frame_equal(staged, fused, check_exact=True)
+
+    print(f"{'mode':>8} {'seconds':>10} {'peak MB':>10}")
+    print(f"{'staged':>8} {staged_seconds:>10.3f} {staged_peak / 1024**2:>10.1f}")
+    print(f"{'fused':>8} {fused_seconds:>10.3f} {fused_peak / 1024**2:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
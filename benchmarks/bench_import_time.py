@@ -0,0 +1,69 @@
+"""
+Cold-start import time of the pipeline modules.
+
+Imports every module in a fresh interpreter (as a worker process or CLI job
+would) with ``python -X importtime`` and reports the median cumulative import
+time over several runs, plus which heavy optional libraries each import pulled
+in. With --budget, exits non-zero if any module takes longer, so a stray
+top-level import of a plotting library shows up as a failure.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --modules src.experimentation src.experiment_stats --budget 1.0
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from common import REPO_ROOT
+
+DEFAULT_MODULES = ['src.experiment_stats', 'src.experimentation', 'src.experiment_monitor', 'src.resampling',
+                   'src.data_processing', 'src.streaming', 'src.scoring', 'src.serving']
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'plotly', 'scipy.stats', 'sklearn']
+
+
+def import_once(module):
+    """Cumulative import time (seconds) of module in a fresh interpreter, and the heavy modules it loaded"""
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_ROOT,
+                          capture_output=True, text=True, check=True)
+    cumulative = None
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            cumulative = int(parts[1]) / 1e6
+    return cumulative, json.loads(proc.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, help='Fail if any median import time exceeds this many seconds')
+    args = parser.parse_args()
+
+    # Warm the OS file cache so the first module is not penalised
+    import_once(args.modules[0])
+
+    print(f"{'module':<26} {'median s':>9} {'min s':>7}  heavy imports")
+    over_budget = []
+    for module in args.modules:
+        runs = [import_once(module) for _ in range(args.runs)]
+        times = [seconds for seconds, _ in runs]
+        median = statistics.median(times)
+        print(f"{module:<26} {median:>9.3f} {min(times):>7.3f}  {', '.join(runs[0][1]) or '-'}")
+        if args.budget is not None and median > args.budget:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"\nFAILED: over the {args.budget}s budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
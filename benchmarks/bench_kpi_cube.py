@@ -0,0 +1,95 @@
+"""
+Benchmark of the incremental KPI cube against recomputing KPIs from all rows.
+
+A synthetic sales history (sorted by date) is loaded, and then the newest
+rows arrive in several refresh batches. On every refresh, the segment KPIs
+(revenue, profit, transactions, distinct and churn-risk customers) and the
+default alerts are produced two ways:
+
+    recompute   groupby over the full transaction table so far, as the
+                notebook 06 functions do over the whole customer table
+    cube        KPICube.update with the batch, then kpis() and
+                evaluate_alerts() from the cube cells
+
+The benchmark reports the time per refresh and the cube size, and checks
+that the cube's segment totals match the recomputed ones.
+
+Usage:
+    python benchmarks/bench_kpi_cube.py --rows 1M --refreshes 5 --batch-rows 20000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+from synthetic_sales import generate_sales, parse_rows
+from src.kpi_cube import DEFAULT_ALERT_RULES, DEFAULT_RECENT_MONTHS, KPICube
+
+SEGMENTS = ['Champions', 'Loyal Customers', 'Potential Loyalists', 'Promising', 'At Risk', 'New Customers']
+
+
+def recompute_segment_kpis(transactions, segment_of, recent_months=DEFAULT_RECENT_MONTHS):
+    """Segment KPIs from every row (the cube's churn rule, exact distinct counts)"""
+    tx = transactions.assign(segment=transactions['Customer ID'].map(segment_of),
+                             month=pd.to_datetime(transactions['Order Date']).dt.to_period('M'))
+    cutoff = tx['month'].max() - (recent_months - 1)
+    kpis = tx.groupby('segment').agg(total_revenue=('Sales', 'sum'), total_profit=('Profit', 'sum'),
+                                     transactions=('Sales', 'size'), total_customers=('Customer ID', 'nunique'))
+    last_month = tx.groupby(['segment', 'Customer ID'])['month'].max()
+    kpis['churn_risk_customers'] = (last_month < cutoff).groupby(level='segment').sum()
+    return kpis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_rows, default=1_000_000, help='History rows before the refreshes')
+    parser.add_argument('--refreshes', type=int, default=5)
+    parser.add_argument('--batch-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    sales = generate_sales(args.rows + args.refreshes * args.batch_rows, seed=0)
+    sales = sales.iloc[np.argsort(pd.to_datetime(sales['Order Date']).to_numpy(), kind='stable')]
+    history = sales.iloc[:args.rows]
+    edges = np.linspace(args.rows, len(sales), args.refreshes + 1).astype(int)
+    batches = [sales.iloc[start:end] for start, end in zip(edges[:-1], edges[1:])]
+
+    customers = sales['Customer ID'].unique()
+    rng = np.random.default_rng(0)
+    segments = pd.DataFrame({'customer_id': customers, 'customer_segment': rng.choice(SEGMENTS, len(customers))})
+    segment_of = segments.set_index('customer_id')['customer_segment']
+
+    start = time.perf_counter()
+    cube = KPICube.build(history, segments)
+    print(f"{args.rows:,} history rows, {len(customers):,} customers: cube built in "
+          f"{time.perf_counter() - start:.2f}s ({len(cube.cells):,} cells, "
+          f"{len(cube.customers.entries):,} sketch entries)")
+
+    recompute_seconds, cube_seconds = [], []
+    table = history
+    for batch in batches:
+        start = time.perf_counter()
+        table = pd.concat([table, batch], ignore_index=True)
+        reference = recompute_segment_kpis(table, segment_of)
+        recompute_seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        kpis = cube.update(batch).kpis(by='segment')
+        alerts = cube.evaluate_alerts(DEFAULT_ALERT_RULES)
+        cube_seconds.append(time.perf_counter() - start)
+
+    print(f"{args.refreshes} refreshes of {args.batch_rows:,} rows:")
+    print(f"  recompute  {np.mean(recompute_seconds) * 1000:8.1f} ms per refresh")
+    print(f"  cube       {np.mean(cube_seconds) * 1000:8.1f} ms per refresh "
+          f"({np.mean(recompute_seconds) / np.mean(cube_seconds):.0f}x), {len(alerts)} alerts")
+
+    columns = ['total_revenue', 'total_profit', 'transactions', 'total_customers', 'churn_risk_customers']
+    error = (kpis[columns] - reference[columns]).abs() / reference[columns].abs().clip(lower=1)
+    print("  largest relative difference to the recomputed KPIs: "
+          + ", ".join(f"{col} {error[col].max():.1e}" for col in columns))
+
+
+if __name__ == '__main__':
+    main()
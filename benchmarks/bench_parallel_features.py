@@ -0,0 +1,53 @@
+"""
+Speedup benchmark for the parallel customer feature builder.
+
+Scales up data/raw/saas_sales.csv by tiling it with fresh customer ids, runs
+process_data serially and with increasing worker counts, checks that every
+parallel result matches the serial one exactly and reports the speedup.
+
+Usage:
+    python benchmarks/bench_parallel_features.py --copies 200 --workers 2 4 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import pandas as pd
+
+from common import load_scaled_sales
+from src.data_processing import process_data
+
+
+def timed_process_data(df, n_workers):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        customer_features, _ = process_data(df, n_workers=n_workers)
+    return customer_features, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=100, help='Number of tiled copies of the raw data')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    df = load_scaled_sales(args.copies)
+    print(f"Rows: {len(df):,}  Customers: {df['Customer ID'].nunique():,}")
+
+    serial, serial_seconds = timed_process_data(df, n_workers=1)
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    print(f"{1:>8} {serial_seconds:>10.2f} {1.0:>8.2f}")
+
+    for n_workers in sorted(set(args.workers)):
+        if n_workers <= 1:
+            continue
+        parallel, seconds = timed_process_data(df, n_workers=n_workers)
+        pd.testing.assert_frame_equal(serial, parallel, check_exact=True)
+        print(f"{n_workers:>8} {seconds:>10.2f} {serial_seconds / seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of single-pass profiling against the exact in-memory summary.
+
+Writes a synthetic sales CSV, then summarizes it two ways:
+
+    exact     pd.read_csv + get_data_summary (describe, isnull, duplicated ...)
+    profile   profile_data reading the CSV in chunks (src.profiling)
+
+and reports wall time, peak traced memory, the worst quantile rank error of
+the profile (in percentile points, against the exact sorted column) and the
+estimated versus exact duplicate Order IDs. It also checks that merging
+profiles of two halves gives the same counts and moments as one pass.
+
+Usage:
+    python benchmarks/bench_profiling.py --rows 1M --chunksize 100000
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from common import REPO_ROOT  # noqa: F401  (puts the repository root on sys.path)
+from synthetic_sales import parse_rows, write_sales_csv
+from src.data_processing import PipelineProfiler, get_data_summary
+from src.profiling import profile_data
+
+ID_COLUMN = 'Order ID'
+
+
+def exact_summary(path):
+    df = pd.read_csv(path)
+    summary = get_data_summary(df, verbose=False)
+    summary['duplicates'] = int(df[ID_COLUMN].duplicated().sum())
+    return summary, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=parse_rows, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sales.csv')
+        write_sales_csv(path, args.rows, seed=0)
+
+        # Timed without tracing (tracemalloc slows allocations down), then traced for memory
+        timing, memory = PipelineProfiler(), PipelineProfiler(trace_memory=True)
+        for profiler in (timing, memory):
+            summary, df = profiler.run('exact', exact_summary, path)
+            profile = profiler.run('profile', profile_data, path, id_column=ID_COLUMN, chunksize=args.chunksize)
+
+        print(f"{args.rows:,} rows, chunks of {args.chunksize:,}")
+        for timed, traced in zip(timing.records, memory.records):
+            print(f"  {timed['stage']:<8} {timed['seconds']:7.2f}s  "
+                  f"peak traced {traced['peak_traced_bytes'] / 2**20:8.1f} MiB")
+
+        described = profile.describe()
+        worst = 0.0
+        for col in described.columns:
+            values = np.sort(df[col].dropna().to_numpy(dtype=float))
+            for label in ['25%', '50%', '75%']:
+                # Ties span a range of ranks; any rank inside it is correct
+                estimate, q = described.loc[label, col], float(label[:-1]) / 100
+                low = np.searchsorted(values, estimate, side='left') / len(values)
+                high = np.searchsorted(values, estimate, side='right') / len(values)
+                worst = max(worst, low - q, q - high)
+        exact_stats = pd.DataFrame(summary['numeric_stats'])
+        moments = (described.loc[['count', 'mean', 'std', 'min', 'max']]
+                   - exact_stats.loc[['count', 'mean', 'std', 'min', 'max']]).abs() / exact_stats.abs().clip(lower=1)
+        print(f"  worst quantile rank error {worst * 100:.2f} percentile points, "
+              f"worst relative moment error {moments.max().max():.1e}")
+        print(f"  duplicate {ID_COLUMN}s: exact {summary['duplicates']:,}, "
+              f"estimated {profile.id_stats()['duplicates']:,}")
+
+        half = len(df) // 2
+        merged = profile_data(df.iloc[:half], id_column=ID_COLUMN).merge(
+            profile_data(df.iloc[half:], id_column=ID_COLUMN))
+        difference = (merged.describe().loc[['count', 'mean', 'std']]
+                      - described.loc[['count', 'mean', 'std']]).abs() / described.abs().clip(lower=1)
+        print(f"  merged halves vs one pass: largest relative difference in count/mean/std "
+              f"{difference.max().max():.1e}")
+
+
+if __name__ == '__main__':
+    main()
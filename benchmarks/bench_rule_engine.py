@@ -0,0 +1,181 @@
+"""
+Benchmark of the declarative rule engine against the notebooks' apply-based labelling.
+
+Generates random customer/interaction tables of the requested size, labels
+them with the row-wise functions from notebooks 02, 05 and 06 (copied below
+as the reference) and with the rule sets in src/rules.py, checks that both
+give the same labels and reports the speedup.
+
+Usage:
+    python benchmarks/bench_rule_engine.py --rows 100000 1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+from src.rules import (
+    JOURNEY_LIFECYCLE_STAGES,
+    JOURNEY_SEGMENT_RULES,
+    RECENCY_LIFECYCLE_STAGES,
+    STRATEGY_RULES,
+    dashboard_segment_rules,
+)
+
+
+# Reference implementations, as in the notebooks
+
+def lifecycle_stage(days):
+    if days <= 30:
+        return 'New'
+    elif days <= 90:
+        return 'Growing'
+    elif days <= 180:
+        return 'Mature'
+    else:
+        return 'Loyal'
+
+
+def segment_customer(row):
+    freq = row['interaction_frequency']
+    length = row['journey_length_days']
+    interactions = row['total_interactions']
+
+    if freq > 0.5 and interactions > 10:
+        return 'High Engagement'
+    elif freq > 0.2 and interactions > 5:
+        return 'Medium Engagement'
+    elif length > 90:
+        return 'Long Journey'
+    elif interactions <= 3:
+        return 'Quick Exit'
+    else:
+        return 'Low Engagement'
+
+
+def assign_lifecycle_stage(recency):
+    if recency <= 7:
+        return 'Active'
+    elif recency <= 30:
+        return 'Regular'
+    elif recency <= 90:
+        return 'Declining'
+    else:
+        return 'Inactive'
+
+
+def make_assign_segment(df, revenue_col, engagement_col):
+    revenue_q25 = df[revenue_col].quantile(0.25)
+    revenue_q75 = df[revenue_col].quantile(0.75)
+    engagement_q25 = df[engagement_col].quantile(0.25)
+    engagement_q75 = df[engagement_col].quantile(0.75)
+
+    def assign_segment(row):
+        revenue = row[revenue_col]
+        engagement = row[engagement_col]
+
+        if revenue >= revenue_q75 and engagement >= engagement_q75:
+            return 'Champions'
+        elif revenue >= revenue_q75 and engagement < engagement_q75:
+            return 'Potential Loyalists'
+        elif revenue < revenue_q25 and engagement >= engagement_q75:
+            return 'New Customers'
+        elif revenue >= revenue_q25 and revenue < revenue_q75 and engagement >= engagement_q25:
+            return 'Loyal Customers'
+        elif revenue < revenue_q25 and engagement < engagement_q25:
+            return 'At Risk'
+        else:
+            return 'Promising'
+
+    return assign_segment
+
+
+def assign_strategy(row):
+    clv_segment = row['clv_segment']
+    churn_prob = row['predicted_churn_prob']
+
+    if clv_segment in ['High Value', 'Medium-High']:
+        if churn_prob > 0.5:
+            return 'Retention Focus - High Priority'
+        else:
+            return 'Expansion/Upsell'
+    elif clv_segment == 'Medium':
+        if churn_prob > 0.6:
+            return 'Retention Focus - Medium Priority'
+        else:
+            return 'Engagement Increase'
+    else:
+        if churn_prob > 0.7:
+            return 'Natural Churn - Monitor'
+        else:
+            return 'Value Enhancement'
+
+
+def make_frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    total_interactions = rng.integers(1, 40, n_rows)
+    journey_length_days = rng.integers(0, 400, n_rows)
+    df = pd.DataFrame({
+        'customer_age_days': rng.integers(0, 400, n_rows).astype('float64'),
+        'total_interactions': total_interactions,
+        'journey_length_days': journey_length_days,
+        'interaction_frequency': total_interactions / (journey_length_days + 1),
+        'recency_days': rng.integers(0, 200, n_rows).astype('float64'),
+        'revenue_sum': rng.lognormal(8, 1, n_rows),
+        'engagement_score': rng.random(n_rows),
+        'clv_segment': pd.Categorical(rng.choice(['Low Value', 'Medium-Low', 'Medium', 'Medium-High',
+                                                  'High Value'], n_rows)),
+        'predicted_churn_prob': rng.random(n_rows),
+    })
+    # A few missing values, which both implementations send to the default label
+    for col in ['customer_age_days', 'recency_days', 'revenue_sum']:
+        df.loc[rng.random(n_rows) < 0.01, col] = np.nan
+    return df
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000], help='Table sizes to benchmark')
+    args = parser.parse_args()
+
+    dashboard_rules = dashboard_segment_rules('revenue_sum', 'engagement_score')
+    cases = [
+        ('lifecycle_stage (02)',
+         lambda df: df['customer_age_days'].apply(lifecycle_stage),
+         lambda df: JOURNEY_LIFECYCLE_STAGES.assign(df)),
+        ('segment_customer (02)',
+         lambda df: df.apply(segment_customer, axis=1),
+         lambda df: JOURNEY_SEGMENT_RULES.assign(df)),
+        ('assign_lifecycle_stage (06)',
+         lambda df: df['recency_days'].apply(assign_lifecycle_stage),
+         lambda df: RECENCY_LIFECYCLE_STAGES.assign(df)),
+        ('assign_segment (06)',
+         lambda df: df.apply(make_assign_segment(df, 'revenue_sum', 'engagement_score'), axis=1),
+         lambda df: dashboard_rules.assign(df)),
+        ('assign_strategy (05)',
+         lambda df: df.apply(assign_strategy, axis=1),
+         lambda df: STRATEGY_RULES.assign(df)),
+    ]
+
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        print(f"\nRows: {n_rows:,}")
+        print(f"{'labelling':<30} {'apply_s':>9} {'rules_s':>9} {'speedup':>9}")
+        for name, apply_based, rule_based in cases:
+            expected, apply_seconds = timed(lambda: apply_based(df))
+            labels, rule_seconds = timed(lambda: rule_based(df))
+            pd.testing.assert_series_equal(expected, labels.astype(object), check_names=False)
+            print(f"{name:<30} {apply_seconds:>9.3f} {rule_seconds:>9.4f} {apply_seconds / rule_seconds:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
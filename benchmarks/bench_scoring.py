@@ -0,0 +1,84 @@
+"""
+Throughput benchmark for batch customer scoring.
+
+Trains notebook-05-style churn (RandomForestClassifier) and revenue
+(GradientBoostingRegressor) models on a sample of synthetic customer
+features, persists them as a ScoringPipeline and scores the full table with
+score_customers at several worker counts, checking that every run writes
+the same output. Reports customers per second.
+
+Usage:
+    python benchmarks/bench_scoring.py --customers 1000000 --workers 1 2 4
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+from src.columnar import write_columnar
+from src.scoring import ScoringPipeline, score_customers
+
+FEATURES = ['revenue_sum', 'revenue_mean', 'frequency', 'recency_days', 'engagement_score',
+            'support_tickets_mean', 'login_frequency_mean']
+
+
+def make_customer_features(n_customers, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'customer_id': np.arange(n_customers)})
+    df['frequency'] = rng.poisson(5, n_customers) + 1
+    df['revenue_mean'] = rng.lognormal(7, 0.8, n_customers)
+    df['revenue_sum'] = df['revenue_mean'] * df['frequency']
+    df['recency_days'] = rng.exponential(60, n_customers)
+    df['engagement_score'] = rng.uniform(0, 100, n_customers)
+    df['support_tickets_mean'] = rng.poisson(2, n_customers).astype('float64')
+    df['login_frequency_mean'] = rng.poisson(20, n_customers).astype('float64')
+    df.loc[rng.random(n_customers) < 0.02, 'engagement_score'] = np.nan
+    df['is_churned'] = ((df['recency_days'] > 90) | (df['engagement_score'] < 15)).astype(int)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=500000)
+    parser.add_argument('--train-size', type=int, default=20000)
+    parser.add_argument('--chunksize', type=int, default=50000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    customer_features = make_customer_features(args.customers)
+    train = customer_features.sample(min(args.train_size, args.customers), random_state=42)
+    X = train[FEATURES].fillna(train[FEATURES].mean())
+    churn_model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1).fit(X, train['is_churned'])
+    revenue_features = [col for col in FEATURES if col != 'revenue_sum']
+    revenue_model = GradientBoostingRegressor(n_estimators=100, random_state=42).fit(
+        train[revenue_features].fillna(train[revenue_features].mean()), train['revenue_sum'])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = ScoringPipeline.from_training(train, churn_model, FEATURES, revenue_model, revenue_features)
+        pipeline.save(os.path.join(tmp, 'scoring'))
+        pipeline = ScoringPipeline.load(os.path.join(tmp, 'scoring'))
+        source = os.path.join(tmp, 'customer_features.columnar')
+        write_columnar(customer_features, source)
+
+        print(f"Customers: {args.customers:,}  chunksize: {args.chunksize:,}")
+        print(f"{'workers':>8} {'seconds':>9} {'customers/s':>12}")
+        first = None
+        for n_workers in args.workers:
+            output = os.path.join(tmp, f"scored_{n_workers}.csv")
+            report = score_customers(source, pipeline, output, chunksize=args.chunksize,
+                                     n_workers=n_workers, verbose=False)
+            scored = pd.read_csv(output)
+            if first is None:
+                first = scored
+            else:
+                pd.testing.assert_frame_equal(first, scored)
+            print(f"{n_workers:>8} {report['seconds']:>9.2f} {report['customers_per_second']:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark of mini-batch segmentation against notebook 04's full-batch k search.
+
+Builds customer features from a tiled copy of data/raw/saas_sales.csv, then
+chooses k over a range twice: with full-batch KMeans plus an exact silhouette
+per k (the notebook's loop) and with src.segmentation.select_k (mini-batch
+centroids, silhouette on a bounded sample, k fitted across workers). Reports
+time, inertia and silhouette per k for both.
+
+Usage:
+    python benchmarks/bench_segmentation.py --copies 100 --workers 4
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+from common import load_scaled_sales
+from src.data_processing import process_data
+from src.segmentation import select_k
+
+
+def notebook_k_search(X_scaled, k_values):
+    """Notebook 04: full-batch KMeans and exact silhouette for every k"""
+    rows = []
+    for k in k_values:
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
+        kmeans.fit(X_scaled)
+        rows.append({'k': k, 'inertia': kmeans.inertia_, 'silhouette': silhouette_score(X_scaled, kmeans.labels_)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=100, help='Number of tiled copies of the raw data')
+    parser.add_argument('--k-max', type=int, default=10, help='Largest k to try (from 2)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sample-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    customer_features, _ = process_data(load_scaled_sales(args.copies), verbose=False)
+    features = customer_features.select_dtypes(include=[np.number]).columns.tolist()[1:9]
+    k_values = range(2, args.k_max + 1)
+    print(f"Customers: {len(customer_features):,}  Features: {features}")
+
+    start = time.perf_counter()
+    results, _ = select_k(customer_features, features, k_values, sample_size=args.sample_size,
+                          seed=42, n_workers=args.workers)
+    minibatch_seconds = time.perf_counter() - start
+
+    # Notebook preprocessing: median fill, IQR capping, standard scaling
+    X = customer_features[features].fillna(customer_features[features].median())
+    q1, q3 = X.quantile(0.25), X.quantile(0.75)
+    X = X.clip(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1), axis=1)
+    X_scaled = ((X - X.mean()) / X.std(ddof=0).replace(0, 1)).to_numpy()
+
+    start = time.perf_counter()
+    reference = notebook_k_search(X_scaled, k_values)
+    full_seconds = time.perf_counter() - start
+
+    comparison = reference.merge(results[['k', 'inertia', 'silhouette']], on='k', suffixes=('_full', '_minibatch'))
+    print(comparison.round(4).to_string(index=False))
+    print(f"\nfull-batch: {full_seconds:.2f}s  mini-batch ({args.workers} workers): {minibatch_seconds:.2f}s  "
+          f"speedup: {full_seconds / minibatch_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
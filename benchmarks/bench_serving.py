@@ -0,0 +1,125 @@
+"""
+Latency benchmark for the analytics serving layer under concurrent load.
+
+Starts src.serving in a separate process and fires random filtered summary
+and breakdown queries from concurrent keep-alive clients. Half of the
+requests revalidate with If-None-Match, like a dashboard polling for changes.
+Then it touches the source files to check that hot reload swaps the data
+version. Reports throughput and p50/p95/p99 latency.
+
+Usage:
+    python benchmarks/bench_serving.py --clients 16 --requests 2000
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from common import RAW_PATH, REPO_ROOT
+from src.serving import AnalyticsService, make_server
+
+SEGMENTS_PATH = os.path.join(REPO_ROOT, 'data', 'results', 'dashboard_ready_data.csv')
+
+
+def serve(transactions, segments, reload_interval, port_queue):
+    service = AnalyticsService(transactions, segments)
+    service.start_watching(reload_interval)
+    server = make_server(service, port=0)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def random_query(rng, dimensions):
+    params = []
+    if rng.random() < 0.5:
+        params.append('segment=' + ','.join(rng.sample(dimensions['segment'], rng.randint(1, 2))))
+    if rng.random() < 0.5:
+        params.append('region=' + rng.choice(dimensions['region']))
+    if rng.random() < 0.5:
+        params.append('month_from=' + rng.choice(dimensions['month']))
+    if rng.random() < 0.5:
+        return '/api/summary?' + '&'.join(params)
+    return '/api/breakdown?' + '&'.join(params + ['by=' + rng.choice(['segment', 'region', 'month'])])
+
+
+def get(conn, path, etag=None):
+    conn.request('GET', path.replace(' ', '%20'), headers={'If-None-Match': etag} if etag else {})
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, response.getheader('ETag'), body
+
+
+def client(port, n_requests, dimensions, seed, latencies, statuses):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    etags = {}
+    for _ in range(n_requests):
+        path = random_query(rng, dimensions)
+        etag = etags.get(path) if rng.random() < 0.5 else None
+        start = time.perf_counter()
+        status, new_etag, _ = get(conn, path, etag)
+        latencies.append(time.perf_counter() - start)
+        statuses.append(status)
+        etags[path] = new_etag
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per client')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        transactions = shutil.copy(RAW_PATH, os.path.join(tmp, 'saas_sales.csv'))
+        segments = shutil.copy(SEGMENTS_PATH, os.path.join(tmp, 'dashboard_ready_data.csv'))
+        port_queue = multiprocessing.Queue()
+        server = multiprocessing.Process(target=serve, args=(transactions, segments, 0.2, port_queue), daemon=True)
+        server.start()
+        port = port_queue.get(timeout=60)
+
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        dimensions = json.loads(get(conn, '/api/dimensions')[2])
+
+        latencies, statuses = [], []
+        threads = [threading.Thread(target=client, args=(port, args.requests, dimensions, seed, latencies, statuses))
+                   for seed in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = np.array(latencies) * 1000
+        counts = {status: statuses.count(status) for status in sorted(set(statuses))}
+        print(f"{len(latencies):,} requests from {args.clients} clients in {elapsed:.2f}s "
+              f"({len(latencies) / elapsed:,.0f} req/s), statuses {counts}")
+        print(f"latency ms  p50 {np.percentile(latencies, 50):.2f}  p95 {np.percentile(latencies, 95):.2f}  "
+              f"p99 {np.percentile(latencies, 99):.2f}  max {latencies.max():.2f}")
+
+        # Hot reload: a changed source file yields a new data version and ETag
+        _, etag, _ = get(conn, '/api/summary')
+        version = json.loads(get(conn, '/api/health')[2])['version']
+        os.utime(segments, ns=(time.time_ns(), time.time_ns() + 10**9))
+        deadline = time.time() + 10
+        while time.time() < deadline and json.loads(get(conn, '/api/health')[2])['version'] == version:
+            time.sleep(0.05)
+        status, _, _ = get(conn, '/api/summary', etag)
+        print(f"hot reload: version changed {json.loads(get(conn, '/api/health')[2])['version'] != version}, "
+              f"revalidating unchanged content gives {status}")
+        conn.close()
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
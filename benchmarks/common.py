@@ -0,0 +1,24 @@
+"""Shared helpers for the benchmark scripts."""
+
+import os
+import sys
+
+import pandas as pd
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RAW_PATH = os.path.join(REPO_ROOT, 'data', 'raw', 'saas_sales.csv')
+
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+
+def load_scaled_sales(copies):
+    """Tile the raw sales export, giving every copy its own customer ids"""
+    raw = pd.read_csv(RAW_PATH)
+    id_span = int(raw['Customer ID'].max()) + 1
+    frames = []
+    for i in range(copies):
+        frame = raw.copy()
+        frame['Customer ID'] = frame['Customer ID'] + i * id_span
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
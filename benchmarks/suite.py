@@ -0,0 +1,256 @@
+"""
+Reproducible scale benchmark suite with machine-readable baselines.
+
+Runs the pipeline's heavy paths on synthetic SaaS sales tables of fixed size
+and seed (see synthetic_sales.py):
+
+    process_data         every process_data stage, timed by PipelineProfiler
+    experiment_analysis  ExperimentAnalyzer.run_experiment_analysis on the
+                         notebook 03 experiments (pricing, ui, feature)
+    journey              journey_transitions, stage_transition_matrix,
+                         transition_summary and journey_ngrams (notebook 02)
+    cohort_retention     CohortRetention update plus customer and revenue
+                         retention matrices
+
+Each benchmark runs in a freshly spawned process, so its peak RSS is its own.
+Loading the data and building inputs such as experiment columns is not timed.
+With --repeat N (default 3) the fastest of N runs is kept, and its peak RSS is
+the lowest of the N. Generated tables are cached as CSV under benchmarks/.cache,
+keyed by row count and seed.
+
+Results are written as JSON. A run compared against a baseline fails (exit
+status 1) when any benchmark is slower or uses more memory than the baseline
+beyond the thresholds. Baselines are only comparable on the same machine.
+
+Usage:
+    python benchmarks/suite.py --rows 1M --save-baseline benchmarks/.cache/baseline.json
+    python benchmarks/suite.py --rows 1M --compare benchmarks/.cache/baseline.json --threshold 0.2
+    python benchmarks/suite.py --rows 1M 10M 50M --benchmarks process_data cohort_retention
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from common import REPO_ROOT
+from src.cohorts import CohortRetention
+from src.data_processing import PipelineProfiler, process_data
+from src.experimentation import ExperimentAnalyzer
+from src.journey import journey_ngrams, journey_transitions, stage_transition_matrix, transition_summary
+from src.rules import JOURNEY_LIFECYCLE_STAGES
+from synthetic_sales import parse_rows, write_sales_csv
+
+RESULTS_VERSION = 1
+CACHE_DIR = os.path.join(REPO_ROOT, 'benchmarks', '.cache')
+EXPERIMENTS = ['pricing_experiment', 'ui_experiment', 'feature_experiment']
+EXPERIMENT_METRICS = ['page_views', 'session_duration', 'clicks', 'Sales', 'converted']
+
+
+# Benchmarks: untimed setup, then every timed step through the profiler
+
+def bench_process_data(df, profiler):
+    process_data(df, verbose=False, profiler=profiler)
+
+
+def add_synthetic_experiments(df, seed=42):
+    """Notebook 03 experiment columns: per-customer arms with treatment effects"""
+    rng = np.random.default_rng(seed)
+    customer_codes, customers = pd.factorize(df['Customer'])
+    for experiment in EXPERIMENTS:
+        arms = rng.choice(np.array(['Control', 'Treatment'], dtype=object), size=len(customers))
+        df[experiment] = arms[customer_codes]
+    pricing = (df['pricing_experiment'] == 'Treatment').to_numpy()
+    ui = (df['ui_experiment'] == 'Treatment').to_numpy()
+    feature = (df['feature_experiment'] == 'Treatment').to_numpy()
+
+    df['Sales'] = df['Sales'] * np.where(pricing, 1.15, 1.0) * np.where(ui, 1.08, 1.0)
+    n_rows = len(df)
+    converted = rng.random(n_rows) < 0.3
+    converted[pricing] = rng.random(int(pricing.sum())) < 0.4
+    converted[ui] = rng.random(int(ui.sum())) < 0.35
+    df['converted'] = converted.astype(np.int64)
+    df['page_views'] = rng.poisson(5, n_rows) * np.where(ui, 1.2, 1.0)
+    df['session_duration'] = rng.exponential(10, n_rows) * np.where(ui, 1.3, 1.0)
+    df['clicks'] = rng.poisson(3, n_rows) * np.where(feature, 1.25, 1.0)
+    return df
+
+
+def bench_experiment_analysis(df, profiler):
+    analyzer = ExperimentAnalyzer(add_synthetic_experiments(df))
+    for experiment in EXPERIMENTS:
+        profiler.run(experiment, analyzer.run_experiment_analysis, experiment, EXPERIMENT_METRICS)
+
+
+def bench_journey(df, profiler):
+    df['Order Date'] = pd.to_datetime(df['Order Date'])
+    df['customer_age_days'] = (df['Order Date'] - df.groupby('Customer ID')['Order Date'].transform('min')).dt.days
+    df['lifecycle_stage'] = JOURNEY_LIFECYCLE_STAGES.assign(df)
+
+    transitions = profiler.run('journey_transitions', journey_transitions, df, 'Customer ID', 'Order Date')
+    profiler.run('stage_transition_matrix', stage_transition_matrix, transitions)
+    profiler.run('transition_summary', transition_summary, transitions)
+    profiler.run('journey_ngrams', journey_ngrams, df, 'Customer ID', 'Order Date', n=3)
+
+
+def bench_cohort_retention(df, profiler):
+    df['Order Date'] = pd.to_datetime(df['Order Date'])
+    cohorts = CohortRetention('Customer ID', 'Order Date', revenue_col='Sales')
+    profiler.run('update', cohorts.update, df)
+    profiler.run('customer_retention', cohorts.retention_matrix, 'customers')
+    profiler.run('revenue_retention', cohorts.retention_matrix, 'revenue')
+
+
+BENCHMARKS = {
+    'process_data': bench_process_data,
+    'experiment_analysis': bench_experiment_analysis,
+    'journey': bench_journey,
+    'cohort_retention': bench_cohort_retention,
+}
+
+
+def dataset_path(n_rows, seed, cache_dir=CACHE_DIR):
+    """Generate (once) and return the cached synthetic table for n_rows and seed"""
+    path = os.path.join(cache_dir, f"saas_sales_{n_rows}_seed{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        write_sales_csv(path + '.tmp', n_rows, seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def _run_once(name, path, trace_memory):
+    """Worker: load the table and run one benchmark (in its own process)"""
+    loading = PipelineProfiler()
+    df = loading.run('load', pd.read_csv, path)
+    profiler = PipelineProfiler(trace_memory=trace_memory)
+    BENCHMARKS[name](df, profiler)
+    return loading.records[0]['peak_rss_bytes'], profiler.records
+
+
+def run_benchmark(name, path, n_rows, repeat=1, trace_memory=False):
+    """
+    Run one benchmark in fresh processes and keep the fastest run
+
+    Returns:
+        dict: benchmark, rows, seconds (sum of its timed steps), peak_rss_bytes,
+            load_peak_rss_bytes (the peak once the table is loaded, before the
+            benchmark starts), peak_traced_bytes and the per-step records of
+            the fastest run
+    """
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(_run_once, name, path, trace_memory).result())
+
+    totals = [sum(record['seconds'] for record in records) for _, records in runs]
+    load_peak, best = runs[int(np.argmin(totals))]
+    peaks = [max((r['peak_rss_bytes'] or 0) for r in records) for _, records in runs]
+    traced = [r['peak_traced_bytes'] for r in best if r['peak_traced_bytes'] is not None]
+    return {
+        'benchmark': name,
+        'rows': n_rows,
+        'seconds': min(totals),
+        'peak_rss_bytes': min(peaks) or None,
+        'load_peak_rss_bytes': load_peak,
+        'peak_traced_bytes': max(traced) if traced else None,
+        'stages': [{key: record[key] for key in ('stage', 'seconds', 'rows_in', 'rows_out')} for record in best],
+    }
+
+
+def compare_results(results, baseline, threshold=0.2, memory_threshold=None, min_seconds=0.05):
+    """
+    Compare a run against a baseline
+
+    Args:
+        results (dict): Output of the suite
+        baseline (dict): Earlier output of the suite
+        threshold (float): Allowed relative slowdown (0.2: 20% slower)
+        memory_threshold (float): Allowed relative peak RSS growth (None: as threshold)
+        min_seconds (float): Slowdowns smaller than this many seconds are noise
+
+    Returns:
+        pd.DataFrame: One row per benchmark and size in both runs, with the
+            ratios to the baseline and a 'regression' flag
+    """
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    key = ['benchmark', 'rows']
+    current = pd.DataFrame(results['results'])[key + ['seconds', 'peak_rss_bytes']]
+    previous = pd.DataFrame(baseline['results'])[key + ['seconds', 'peak_rss_bytes']]
+    comparison = previous.merge(current, on=key, suffixes=('_baseline', ''))
+
+    comparison['time_ratio'] = comparison['seconds'] / comparison['seconds_baseline']
+    comparison['memory_ratio'] = comparison['peak_rss_bytes'] / comparison['peak_rss_bytes_baseline']
+    slower = ((comparison['time_ratio'] > 1 + threshold)
+              & (comparison['seconds'] - comparison['seconds_baseline'] > min_seconds))
+    larger = comparison['memory_ratio'] > 1 + memory_threshold
+    comparison['regression'] = slower | larger.fillna(False)
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', nargs='+', default=['1M'], help='Table sizes, e.g. 1M 10M 50M')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark; the fastest is kept')
+    parser.add_argument('--trace-memory', action='store_true', help='Also trace Python allocations per step')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--output', help='Write the results JSON here')
+    parser.add_argument('--save-baseline', help='Write the results JSON here as the new baseline')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative slowdown')
+    parser.add_argument('--memory-threshold', type=float, help='Allowed relative peak RSS growth')
+    args = parser.parse_args()
+
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': args.seed,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'results': [],
+    }
+    for n_rows in [parse_rows(rows) for rows in args.rows]:
+        path = dataset_path(n_rows, args.seed, args.cache_dir)
+        for name in args.benchmarks:
+            result = run_benchmark(name, path, n_rows, args.repeat, args.trace_memory)
+            results['results'].append(result)
+            peak = result['peak_rss_bytes']
+            print(f"{name:<22} {n_rows:>12,} rows {result['seconds']:>9.2f}s "
+                  f"{'' if peak is None else f'{peak / 2**20:>9.0f} MiB peak RSS'}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('seed') != args.seed:
+            print(f"Warning: baseline was generated with seed {baseline.get('seed')}, this run with {args.seed}")
+        comparison = compare_results(results, baseline, args.threshold, args.memory_threshold)
+        print(comparison[['benchmark', 'rows', 'seconds_baseline', 'seconds', 'time_ratio', 'memory_ratio',
+                          'regression']].round(3).to_string(index=False))
+        if comparison['regression'].any():
+            print(f"\nFAILED: {int(comparison['regression'].sum())} regression(s) beyond the thresholds")
+            sys.exit(1)
+        print("\nOK: no regressions beyond the thresholds")
+
+
+if __name__ == '__main__':
+    main()
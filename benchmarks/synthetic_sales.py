@@ -0,0 +1,185 @@
+"""
+Synthetic SaaS sales generator.
+
+Produces transaction tables with the schema of data/raw/saas_sales.csv at any
+size (e.g. 1M/10M/50M rows) by resampling the real export, so column
+distributions and the relationships between columns carry over:
+
+    orders      order headers (date, contact, location, segment, customer) are
+                drawn from the real orders; dates get a few days of jitter
+    customers   the customer count grows with the row count; every synthetic
+                customer is a clone of a real one (name suffix, same industry),
+                and orders of a real customer are spread over its clones
+    line items  the number of lines per order and every line's Product,
+                Sales, Quantity, Discount and Profit are resampled jointly;
+                Sales and Profit share a small multiplicative noise, so
+                margins per discount level are preserved
+
+Rows are generated in chunks, each from its own child of one SeedSequence, so
+the output for a given seed and row count is reproducible and memory stays
+bounded by the chunk size.
+
+Usage:
+    python benchmarks/synthetic_sales.py --rows 10M --output data/raw/synthetic_sales_10m.csv
+
+    from synthetic_sales import generate_sales
+    df = generate_sales(1_000_000, seed=0)
+"""
+
+import argparse
+import string
+
+import numpy as np
+import pandas as pd
+
+from common import RAW_PATH
+
+COLUMNS = ['Row ID', 'Order ID', 'Order Date', 'Date Key', 'Contact Name', 'Country', 'City', 'Region',
+           'Subregion', 'Customer', 'Customer ID', 'Industry', 'Segment', 'Product', 'License', 'Sales',
+           'Quantity', 'Discount', 'Profit']
+HEADER_COLUMNS = ['Order Date', 'Contact Name', 'Country', 'City', 'Region', 'Subregion', 'Customer',
+                  'Customer ID', 'Industry', 'Segment']
+LINE_COLUMNS = ['Product', 'Sales', 'Quantity', 'Discount', 'Profit']
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+DATE_JITTER_DAYS = 3
+AMOUNT_NOISE = 0.05
+LICENSE_ALPHABET = np.array(list(string.ascii_uppercase + string.digits))
+LICENSE_LENGTH = 10
+
+
+def parse_rows(value):
+    """Row counts like '1M', '500k' or '10000'"""
+    value = str(value).strip().upper()
+    multiplier = {'K': 1_000, 'M': 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+
+
+class SalesTemplate:
+    """Empirical distributions of the real export"""
+
+    def __init__(self, reference=RAW_PATH):
+        raw = pd.read_csv(reference)
+        raw['Order Date'] = pd.to_datetime(raw['Order Date'])
+        orders = raw.groupby('Order ID', sort=False)
+        self.headers = orders[HEADER_COLUMNS].first().reset_index(drop=True)
+        self.lines_per_order = orders.size().to_numpy()
+        self.lines = raw[LINE_COLUMNS].reset_index(drop=True)
+        self.rows_per_customer = len(raw) / raw['Customer ID'].nunique()
+        self.first_date = raw['Order Date'].min()
+        self.last_date = raw['Order Date'].max()
+
+        self.template_ids = self.headers['Customer ID'].drop_duplicates().to_numpy()
+
+
+def _clone_counts(template, n_rows):
+    """Synthetic customers per real customer (at least one each)"""
+    n_customers = max(len(template.template_ids), int(round(n_rows / template.rows_per_customer)))
+    base, extra = divmod(n_customers, len(template.template_ids))
+    return np.array([base + (i < extra) for i in range(len(template.template_ids))])
+
+
+def _generate_chunk(template, n_rows, seed, clone_counts, first_row, order_offset):
+    rng = np.random.default_rng(seed)
+
+    # Orders until the chunk is full; the last order is truncated to fit
+    expected_orders = int(n_rows / template.lines_per_order.mean() * 1.1) + 10
+    sizes = rng.choice(template.lines_per_order, size=expected_orders)
+    while sizes.sum() < n_rows:
+        sizes = np.concatenate([sizes, rng.choice(template.lines_per_order, size=expected_orders)])
+    ends = np.cumsum(sizes)
+    n_orders = int(np.searchsorted(ends, n_rows) + 1)
+    sizes = sizes[:n_orders]
+    sizes[-1] -= ends[n_orders - 1] - n_rows
+
+    headers = template.headers.iloc[rng.integers(0, len(template.headers), n_orders)].reset_index(drop=True)
+    jitter = pd.to_timedelta(rng.integers(-DATE_JITTER_DAYS, DATE_JITTER_DAYS + 1, n_orders), unit='D')
+    dates = (headers['Order Date'] + jitter).clip(template.first_date, template.last_date)
+
+    # Spread each real customer's orders over its clones
+    template_index = pd.Index(template.template_ids).get_indexer(headers['Customer ID'])
+    clones = clone_counts[template_index]
+    clone = (rng.random(n_orders) * clones).astype(np.int64)
+    customer_ids = (template.template_ids[template_index]
+                    + clone * (template.template_ids.max() - template.template_ids.min() + 1))
+    names = headers['Customer'].to_numpy(dtype=object)
+    suffixed = clone > 0
+    names[suffixed] = names[suffixed] + ' ' + clone[suffixed].astype(str)
+
+    order_numbers = order_offset + 100000 + np.arange(n_orders)
+    order_ids = (headers['Region'].astype(str) + '-' + dates.dt.year.astype(str) + '-'
+                 + pd.Series(order_numbers).astype(str))
+
+    order_of_row = np.repeat(np.arange(n_orders), sizes)
+    lines = template.lines.iloc[rng.integers(0, len(template.lines), n_rows)].reset_index(drop=True)
+    noise = np.exp(rng.normal(0, AMOUNT_NOISE, n_rows))
+    licenses = LICENSE_ALPHABET[rng.integers(0, len(LICENSE_ALPHABET), (n_rows, LICENSE_LENGTH))]
+
+    # Format each distinct day once; a chunk spans at most a few thousand days
+    days, day_of_order = np.unique(dates.to_numpy(), return_inverse=True)
+    day_of_row = day_of_order[order_of_row]
+    days = pd.DatetimeIndex(days)
+    chunk = pd.DataFrame({
+        'Row ID': first_row + np.arange(n_rows),
+        'Order ID': order_ids.to_numpy()[order_of_row],
+        'Order Date': days.strftime('%-m/%-d/%Y').to_numpy(dtype=object)[day_of_row],
+        'Date Key': (days.year * 10000 + days.month * 100 + days.day).to_numpy(dtype=np.int64)[day_of_row],
+    })
+    for col in ['Contact Name', 'Country', 'City', 'Region', 'Subregion']:
+        chunk[col] = headers[col].to_numpy()[order_of_row]
+    chunk['Customer'] = names[order_of_row]
+    chunk['Customer ID'] = customer_ids[order_of_row]
+    for col in ['Industry', 'Segment']:
+        chunk[col] = headers[col].to_numpy()[order_of_row]
+    chunk['Product'] = lines['Product'].to_numpy()
+    chunk['License'] = licenses.view(f'<U{LICENSE_LENGTH}').ravel()
+    chunk['Sales'] = (lines['Sales'].to_numpy() * noise).round(4)
+    chunk['Quantity'] = lines['Quantity'].to_numpy()
+    chunk['Discount'] = lines['Discount'].to_numpy()
+    chunk['Profit'] = (lines['Profit'].to_numpy() * noise).round(4)
+    return chunk[COLUMNS], n_orders
+
+
+def iter_sales_chunks(n_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS, reference=RAW_PATH):
+    """Yield the synthetic table in chunks of at most chunk_rows rows"""
+    template = SalesTemplate(reference)
+    clone_counts = _clone_counts(template, n_rows)
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    first_row, order_offset = 1, 0
+    for i in range(n_chunks):
+        size = min(chunk_rows, n_rows - i * chunk_rows)
+        chunk, n_orders = _generate_chunk(template, size, seeds[i], clone_counts, first_row, order_offset)
+        first_row += size
+        order_offset += n_orders
+        yield chunk
+
+
+def generate_sales(n_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS, reference=RAW_PATH):
+    """Synthetic sales table with n_rows rows, in memory"""
+    return pd.concat(iter_sales_chunks(n_rows, seed, chunk_rows, reference), ignore_index=True)
+
+
+def write_sales_csv(path, n_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS, reference=RAW_PATH):
+    """Stream a synthetic sales table to CSV without holding it in memory"""
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(iter_sales_chunks(n_rows, seed, chunk_rows, reference)):
+            chunk.to_csv(f, index=False, header=i == 0)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1M', help="Rows to generate, e.g. 1M, 10M, 50M")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--output', required=True, help='CSV file to write')
+    args = parser.parse_args()
+
+    n_rows = parse_rows(args.rows)
+    write_sales_csv(args.output, n_rows, args.seed, args.chunk_rows)
+    print(f"Wrote {n_rows:,} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Incremental Cohort Retention
+============================
+
+Cohort x period retention with integer period arithmetic. Dates are encoded
+as integer months, weeks or days since the epoch by casting to
+``datetime64[M]``/``datetime64[D]``, so period offsets are plain integer
+subtraction. Every update folds a batch of new events into per-cell
+counters (distinct active customers and revenue per cohort and offset);
+old cohorts are never recomputed because each customer's first and last
+active period are kept, which is all that is needed to count a customer at
+most once per period.
+
+Usage:
+    from src.cohorts import CohortRetention
+
+    cohorts = CohortRetention('Customer', 'Order Date', revenue_col='Sales', granularity='M')
+    cohorts.update(df)
+    retention = cohorts.retention_matrix()                  # share of customers
+    revenue_retention = cohorts.retention_matrix('revenue') # revenue vs first period
+    cohorts.save('../data/processed/cohorts')
+
+    # Next month: fold in only the new events
+    cohorts = CohortRetention.load('../data/processed/cohorts')
+    cohorts.update(new_month_df)
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.columnar import write_columnar, read_columnar
+
+GRANULARITIES = {
+    'M': 'M',      # calendar months
+    'W': 'W-SUN',  # weeks starting on Monday
+    'D': 'D',      # days
+}
+
+METADATA_NAME = 'metadata.json'
+
+# 1970-01-01 was a Thursday: shifting by 3 days makes weeks start on Monday
+_WEEK_OFFSET_DAYS = 3
+
+
+def encode_periods(dates, granularity='M'):
+    """
+    Integer period numbers of dates
+
+    Args:
+        dates (pd.Series or array-like): Datetimes
+        granularity (str): 'M' (months), 'W' (Monday-based weeks) or 'D' (days)
+
+    Returns:
+        tuple: (periods as int64 since the epoch, boolean mask of non-missing dates;
+            periods of missing dates are meaningless)
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}' (expected one of {list(GRANULARITIES)})")
+    values = pd.to_datetime(dates).to_numpy()
+    valid = ~np.isnat(values)
+    if granularity == 'M':
+        periods = values.astype('datetime64[M]').astype('int64')
+    else:
+        periods = values.astype('datetime64[D]').astype('int64')
+        if granularity == 'W':
+            periods = (periods + _WEEK_OFFSET_DAYS) // 7
+    return periods, valid
+
+
+def decode_periods(periods, granularity='M'):
+    """Integer period numbers back to a pd.PeriodIndex"""
+    periods = np.asarray(periods, dtype='int64')
+    if granularity == 'M':
+        start = periods.astype('datetime64[M]')
+    elif granularity == 'W':
+        start = (periods * 7 - _WEEK_OFFSET_DAYS).astype('datetime64[D]')
+    else:
+        start = periods.astype('datetime64[D]')
+    return pd.PeriodIndex(pd.DatetimeIndex(start), freq=GRANULARITIES[granularity])
+
+
+class CohortRetention:
+    """
+    Cohort x period retention counters that can be extended period by period.
+
+    State:
+        customers: first and last active period of every customer seen
+        cells: active customers and revenue per (cohort, offset)
+        latest_period: last period folded in; updates may only add events in
+            this period or later
+    """
+
+    def __init__(self, customer_col, date_col, revenue_col=None, granularity='M'):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity '{granularity}' (expected one of {list(GRANULARITIES)})")
+        self.customer_col = customer_col
+        self.date_col = date_col
+        self.revenue_col = revenue_col
+        self.granularity = granularity
+        self.customers = pd.DataFrame({'first_period': pd.Series(dtype='int64'),
+                                       'last_period': pd.Series(dtype='int64')})
+        self.cells = pd.DataFrame({'active': pd.Series(dtype='int64'), 'revenue': pd.Series(dtype='float64')},
+                                  index=pd.MultiIndex.from_arrays([[], []], names=['cohort', 'offset']))
+        self.latest_period = None
+
+    def update(self, df):
+        """
+        Fold a batch of events into the retention counters
+
+        Args:
+            df (pd.DataFrame): New events; rows without a customer or date are ignored
+
+        Returns:
+            CohortRetention: self
+
+        Raises:
+            ValueError: If the batch has events before the latest folded period
+        """
+        periods, valid = encode_periods(df[self.date_col], self.granularity)
+        valid &= df[self.customer_col].notna().to_numpy()
+        if not valid.any():
+            return self
+
+        revenue = (df[self.revenue_col].to_numpy(dtype='float64')[valid]
+                   if self.revenue_col is not None else np.zeros(int(valid.sum())))
+        events = pd.DataFrame({'customer': df[self.customer_col].to_numpy()[valid],
+                               'period': periods[valid], 'revenue': revenue})
+        if self.latest_period is not None and events['period'].min() < self.latest_period:
+            raise ValueError("Batch has events before the latest folded period; rebuild the cohorts instead")
+
+        # One row per (customer, period) active in the batch
+        pairs = events.groupby(['customer', 'period'], sort=False)['revenue'].sum().reset_index()
+
+        known = self.customers.reindex(pairs['customer'])
+        batch_first = pairs.groupby('customer', sort=False)['period'].transform('min').to_numpy()
+        known_first = known['first_period'].to_numpy()
+        first = np.where(np.isnan(known_first), batch_first, known_first).astype('int64')
+        # Customers already counted in this period by an earlier batch are not counted again
+        already_counted = known['last_period'].to_numpy() == pairs['period'].to_numpy()
+
+        cells = pd.DataFrame({
+            'cohort': first,
+            'offset': pairs['period'].to_numpy() - first,
+            'active': (~already_counted).astype('int64'),
+            'revenue': pairs['revenue'].to_numpy(),
+        }).groupby(['cohort', 'offset']).sum()
+        self.cells = self.cells.add(cells, fill_value=0).astype({'active': 'int64'})
+
+        # First/last active period per customer (last only moves forward)
+        span = pd.DataFrame({'first_period': first, 'last_period': pairs['period'].to_numpy()},
+                            index=pairs['customer']).groupby(level=0).agg(
+            {'first_period': 'min', 'last_period': 'max'})
+        span.index.name = None
+        existing = self.customers.index.intersection(span.index)
+        self.customers.loc[existing, 'last_period'] = np.maximum(
+            self.customers.loc[existing, 'last_period'], span.loc[existing, 'last_period'])
+        self.customers = pd.concat([self.customers, span.drop(existing)])
+
+        latest = int(pairs['period'].max())
+        self.latest_period = latest if self.latest_period is None else max(self.latest_period, latest)
+        return self
+
+    def cohort_counts(self, value='active'):
+        """
+        Cohort x offset matrix of active customers (or revenue with value='revenue')
+
+        Only cohorts that acquired customers are listed. Cells after the latest
+        folded period are NaN; observed cells without activity are 0.
+        """
+        if self.cells.empty:
+            return pd.DataFrame()
+        cohorts = np.unique(self.cells.index.get_level_values('cohort'))
+        offsets = np.arange(0, self.latest_period - cohorts[0] + 1)
+        matrix = self.cells[value].unstack('offset').reindex(index=cohorts, columns=offsets).fillna(0)
+        matrix = matrix.where(cohorts[:, None] + offsets[None, :] <= self.latest_period)
+
+        matrix.index = decode_periods(matrix.index, self.granularity)
+        matrix.index.name = 'cohort'
+        matrix.columns.name = 'period_number'
+        return matrix
+
+    def cohort_sizes(self):
+        """Number of customers acquired in each cohort period"""
+        sizes = self.cells['active'].xs(0, level='offset')
+        sizes.index = decode_periods(sizes.index, self.granularity)
+        sizes.index.name = 'cohort'
+        return sizes
+
+    def retention_matrix(self, kind='customers'):
+        """
+        Cohort x period retention
+
+        Args:
+            kind (str): 'customers' for the share of each cohort active in each
+                period, 'revenue' for each period's revenue relative to the
+                cohort's first-period revenue
+
+        Returns:
+            pd.DataFrame: cohort x period_number
+        """
+        if kind == 'customers':
+            counts = self.cohort_counts('active')
+            return counts.divide(counts[0], axis=0)
+        if kind == 'revenue':
+            if self.revenue_col is None:
+                raise ValueError("Revenue retention needs a revenue_col")
+            revenue = self.cohort_counts('revenue')
+            return revenue.divide(revenue[0], axis=0)
+        raise ValueError(f"Unknown retention kind '{kind}' (expected 'customers' or 'revenue')")
+
+    def save(self, directory):
+        """Write the counters to a directory (columnar tables plus metadata)"""
+        directory = Path(directory)
+        if directory.exists():
+            shutil.rmtree(directory)
+        customers = self.customers.rename_axis('customer').reset_index()
+        write_columnar(customers, directory / 'customers')
+        write_columnar(self.cells.reset_index(), directory / 'cells')
+        metadata = {
+            'customer_col': self.customer_col,
+            'date_col': self.date_col,
+            'revenue_col': self.revenue_col,
+            'granularity': self.granularity,
+            'latest_period': self.latest_period,
+        }
+        with open(directory / METADATA_NAME, 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    @classmethod
+    def load(cls, directory):
+        """Load counters written by ``save``"""
+        directory = Path(directory)
+        with open(directory / METADATA_NAME) as f:
+            metadata = json.load(f)
+        cohorts = cls(metadata['customer_col'], metadata['date_col'],
+                      metadata['revenue_col'], metadata['granularity'])
+        cohorts.latest_period = metadata['latest_period']
+        customers = read_columnar(directory / 'customers').copy()
+        cohorts.customers = customers.set_index('customer').rename_axis(None)
+        cohorts.cells = read_columnar(directory / 'cells').copy().set_index(['cohort', 'offset'])
+        return cohorts
@@ -0,0 +1,245 @@
+"""
+Columnar Storage for Processed Data
+===================================
+
+A dependency-free columnar format: one ``.npy`` file per column plus a JSON
+schema manifest. Files are memory-mapped on read, so loading a projection of a
+wide feature table only touches the requested columns, and dtypes (including
+datetimes, categoricals and the nullable ``Int64``/``Float64``/``boolean``
+types) round-trip without re-parsing. Object columns must hold only strings
+(and missing values); other object columns, like mixed types or
+``datetime.date`` values, and other extension dtypes raise a TypeError
+instead of being silently converted.
+
+Layout of a columnar directory::
+
+    customer_features.columnar/
+        manifest.json           # row count, column order, dtypes, encodings
+        col_0000.npy            # values (or dictionary codes) of column 0
+        col_0002.categories.npy # dictionary of a string/categorical column
+        col_0003.valid.npy      # validity of a nullable (masked) column
+        ...
+
+Usage:
+    from src.columnar import write_columnar, read_columnar
+
+    write_columnar(customer_features, '../data/processed/customer_features.columnar')
+    features = read_columnar('../data/processed/customer_features.columnar',
+                             columns=['customer_id', 'sales_sum', 'recency_days'])
+"""
+
+import json
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def is_columnar_dataset(path):
+    """Return True if ``path`` is a directory written by ``write_columnar``"""
+    return (Path(path) / MANIFEST_NAME).is_file()
+
+
+MASKED_ARRAYS = {'b': pd.arrays.BooleanArray, 'i': pd.arrays.IntegerArray, 'u': pd.arrays.IntegerArray,
+                 'f': pd.arrays.FloatingArray}
+
+
+def _unsupported(series, reason):
+    return TypeError(f"Column '{series.name}' has unsupported dtype {series.dtype} for columnar storage ({reason})")
+
+
+def _encode_series(series):
+    """
+    Encode a column as fixed-width numpy arrays
+
+    Returns:
+        tuple: (values, categories, validity, manifest entry)
+    """
+    dtype = series.dtype
+    entry = {'name': str(series.name), 'dtype': str(dtype)}
+
+    if isinstance(dtype, pd.CategoricalDtype) or dtype == 'object':
+        if isinstance(dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            categories = dtype.categories
+            entry['ordered'] = bool(dtype.ordered)
+        else:
+            codes, categories = pd.factorize(series)
+        categories = np.asarray(categories)
+        if categories.dtype == 'object':
+            # Anything but strings would come back stringified
+            if pd.api.types.infer_dtype(categories, skipna=True) not in ('string', 'empty'):
+                raise _unsupported(series, "object values must all be strings")
+            categories = categories.astype(str) if len(categories) else np.array([], dtype='<U1')
+        entry['encoding'] = 'dictionary'
+        return codes.astype(np.int32), categories, None, entry
+
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        entry['encoding'] = 'temporal'
+        entry['tz'] = str(dtype.tz)
+        entry['dtype'] = f"datetime64[{dtype.unit}]"
+        return series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().view('int64'), None, None, entry
+
+    if isinstance(series.array, tuple(MASKED_ARRAYS.values())):
+        # Nullable Int64/Float64/boolean: numpy values plus a validity array
+        entry['encoding'] = 'masked'
+        validity = series.notna().to_numpy()
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=dtype.numpy_dtype.type(0))
+        return values, None, validity, entry
+
+    if isinstance(dtype, np.dtype) and dtype.kind in 'mM':
+        entry['encoding'] = 'temporal'
+        return series.to_numpy().view('int64'), None, None, entry
+
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        entry['encoding'] = 'plain'
+        return series.to_numpy(), None, None, entry
+
+    raise _unsupported(series, "only numpy, nullable numeric/boolean, datetime, categorical and string columns")
+
+
+def write_columnar(df, directory, row_order=None):
+    """
+    Write a dataframe as a columnar directory of ``.npy`` files
+
+    Args:
+        df (pd.DataFrame): Data to write (the index is not stored)
+        directory (str or Path): Output directory, replaced if it exists
+        row_order (np.ndarray): Optional row permutation applied while writing
+
+    Returns:
+        dict: The schema manifest that was written
+    """
+    # Files are written to a sibling directory and swapped in afterwards: frames
+    # read earlier keep mapping the old files (truncating them in place would
+    # crash their readers), and an interrupted write leaves the old data intact
+    target = Path(directory)
+    directory = _sibling(target, 'tmp')
+    directory.mkdir(parents=True)
+    try:
+        manifest = _write_files(df, directory, row_order)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    previous = _sibling(target, 'old')
+    if target.exists():
+        target.rename(previous)
+    directory.rename(target)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def _sibling(path, suffix):
+    """Unique staging path next to ``path``"""
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.{suffix}")
+
+
+def _write_files(df, directory, row_order):
+    """Write the column files and manifest of ``df`` into an empty directory"""
+    manifest = {'format_version': FORMAT_VERSION, 'n_rows': len(df), 'columns': []}
+    for i, col in enumerate(df.columns):
+        values, categories, validity, entry = _encode_series(df[col])
+        if row_order is not None:
+            values = values[row_order]
+            validity = validity[row_order] if validity is not None else None
+
+        entry['file'] = f"col_{i:04d}.npy"
+        np.save(directory / entry['file'], values, allow_pickle=False)
+        if categories is not None:
+            entry['categories_file'] = f"col_{i:04d}.categories.npy"
+            np.save(directory / entry['categories_file'], categories, allow_pickle=False)
+        if validity is not None:
+            entry['validity_file'] = f"col_{i:04d}.valid.npy"
+            np.save(directory / entry['validity_file'], validity, allow_pickle=False)
+        manifest['columns'].append(entry)
+
+    with open(directory / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(directory):
+    """Load the schema manifest of a columnar directory"""
+    with open(Path(directory) / MANIFEST_NAME) as f:
+        return json.load(f)
+
+
+def read_categories(directory, column):
+    """Load the dictionary of a string/categorical column"""
+    directory = Path(directory)
+    entry = _manifest_entries(read_manifest(directory), [column])[0]
+    return np.load(directory / entry['categories_file'], allow_pickle=False)
+
+
+def _manifest_entries(manifest, columns):
+    entries = {entry['name']: entry for entry in manifest['columns']}
+    if columns is None:
+        return manifest['columns']
+    missing = [col for col in columns if col not in entries]
+    if missing:
+        raise KeyError(f"Columns not found in columnar dataset: {missing}")
+    return [entries[col] for col in columns]
+
+
+def _decode_entry(directory, entry, rows, strings_as_codes):
+    # Copy-on-write mapping: callers may edit the frame without touching the
+    # files; np.asarray drops the memmap subclass but keeps the zero-copy view
+    values = np.asarray(np.load(directory / entry['file'], mmap_mode='c', allow_pickle=False))
+    if rows is not None:
+        values = values[rows]
+
+    encoding = entry['encoding']
+    if encoding == 'plain':
+        return values
+    if encoding == 'temporal':
+        decoded = values.view(entry['dtype'])
+        if 'tz' in entry:
+            return pd.DatetimeIndex(decoded).tz_localize('UTC').tz_convert(entry['tz'])
+        return decoded
+    if encoding == 'masked':
+        validity = np.load(directory / entry['validity_file'], mmap_mode='r', allow_pickle=False)
+        if rows is not None:
+            validity = validity[rows]
+        return MASKED_ARRAYS[values.dtype.kind](values, ~validity)
+
+    # Dictionary encoded
+    if strings_as_codes:
+        return values
+    categories = np.load(directory / entry['categories_file'], allow_pickle=False)
+    if entry['dtype'] == 'category':
+        return pd.Categorical.from_codes(values, categories, ordered=entry.get('ordered', False))
+    present = values >= 0
+    decoded = np.full(len(values), np.nan, dtype=object)
+    decoded[present] = categories.astype(object)[values[present]]
+    return decoded
+
+
+def read_columnar(directory, columns=None, rows=None, strings_as_codes=False):
+    """
+    Load a projection of a columnar directory
+
+    Column files are memory-mapped, so only the requested columns (and rows)
+    are ever paged in.
+
+    Args:
+        directory (str or Path): Directory written by ``write_columnar``
+        columns (list): Columns to load, in order (default: all)
+        rows (slice): Optional row range to load
+        strings_as_codes (bool): Return int32 dictionary codes (-1 = missing)
+            instead of decoding string/categorical columns
+
+    Returns:
+        pd.DataFrame: The requested columns with their original dtypes
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    entries = _manifest_entries(manifest, columns)
+
+    data = {entry['name']: _decode_entry(directory, entry, rows, strings_as_codes) for entry in entries}
+    return pd.DataFrame(data, columns=[entry['name'] for entry in entries], copy=False)
@@ -1,14 +1,46 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from src.columnar import write_columnar, read_columnar, is_columnar_dataset
+
+logger = logging.getLogger(__name__)
+
+# Parent logger of every pipeline module (src.data_processing, src.streaming, ...)
+PIPELINE_LOGGER_NAME = __name__.rpartition('.')[0] or __name__
+
+# Candidate formats tried, in order, when inferring an explicit date format
+DATE_FORMATS = [
+    '%m/%d/%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y %H:%M:%S',
+    '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y', '%d.%m.%Y', '%Y%m%d',
+]
+
+def is_numeric_feature_dtype(dtype):
+    """True for integer and float dtypes (of any width), excluding booleans"""
+    return pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype)
+
+def is_string_feature_dtype(dtype):
+    """True for object (string) and categorical dtypes"""
+    return dtype == 'object' or isinstance(dtype, pd.CategoricalDtype)
+
 def standardize_column_names(df):
     """
     Standardize column names to lowercase with underscores
     """
-    # Create a copy to avoid modifying original
-    df_clean = df.copy()
+    # Shallow copy: relabeling columns must not modify the original, but
+    # there is no need to duplicate the underlying data
+    df_clean = df.copy(deep=False)
     
     # Convert column names to lowercase and replace spaces with underscores
     df_clean.columns = df_clean.columns.str.lower().str.replace(' ', '_').str.replace('-', '_')
@@ -27,9 +59,9 @@ def force_create_customer_id(df):
     Force create a customer_id column if it doesn't exist
     """
     if 'customer_id' not in df.columns:
-        df = df.copy()
+        df = df.copy(deep=False)
         df['customer_id'] = range(len(df))
-        print("Force created customer_id column with sequential numbers")
+        logger.info("Force created customer_id column with sequential numbers")
     return df
 
 def find_matching_column(df_columns, possible_names):
@@ -72,23 +104,23 @@ def ensure_customer_id(df, actual_column_mapping):
     """
     Ensure we have a customer_id column
     """
-    print(f"DEBUG: Current dataframe columns: {df.columns.tolist()}")
-    print(f"DEBUG: Current column mapping: {actual_column_mapping}")
+    logger.debug("Current dataframe columns: %s", df.columns.tolist())
+    logger.debug("Current column mapping: %s", actual_column_mapping)
     
     # Check if customer_id already exists in the dataframe
     if 'customer_id' in df.columns:
         actual_column_mapping['customer_id'] = 'customer_id'
-        print("Found existing 'customer_id' column")
+        logger.info("Found existing 'customer_id' column")
         return df, actual_column_mapping
     
     # Check if customer_id is already mapped
     if 'customer_id' in actual_column_mapping:
         customer_id_col = actual_column_mapping['customer_id']
         if customer_id_col in df.columns:
-            print(f"Using existing mapping: '{customer_id_col}' as customer identifier")
+            logger.info("Using existing mapping: '%s' as customer identifier", customer_id_col)
             return df, actual_column_mapping
         else:
-            print(f"WARNING: Mapped column '{customer_id_col}' not found in dataframe")
+            logger.warning("Mapped column '%s' not found in dataframe", customer_id_col)
     
     # Look for any column that might be an ID
     id_candidates = []
@@ -97,72 +129,229 @@ def ensure_customer_id(df, actual_column_mapping):
         if any(term in col_lower for term in ['id', 'customer', 'client', 'user']):
             id_candidates.append(col)
     
-    print(f"DEBUG: ID candidates found: {id_candidates}")
+    logger.debug("ID candidates found: %s", id_candidates)
     
     if id_candidates:
         # Use the first candidate
         actual_column_mapping['customer_id'] = id_candidates[0]
-        print(f"Using '{id_candidates[0]}' as customer identifier")
+        logger.info("Using '%s' as customer identifier", id_candidates[0])
     else:
         # Create synthetic customer ID
-        print("No suitable ID column found, creating synthetic customer_id")
-        df = df.copy()  # Make sure we're working with a copy
+        logger.info("No suitable ID column found, creating synthetic customer_id")
+        df = df.copy(deep=False)  # Add the column without touching the caller's frame
         df['customer_id'] = range(len(df))
         actual_column_mapping['customer_id'] = 'customer_id'
-        print("Created synthetic customer_id column")
+        logger.info("Created synthetic customer_id column")
     
     # Final verification
     customer_id_col = actual_column_mapping['customer_id']
     if customer_id_col not in df.columns:
-        print(f"CRITICAL: customer_id column '{customer_id_col}' still not found!")
-        print(f"Available columns: {df.columns.tolist()}")
+        logger.error("customer_id column '%s' still not found! Available columns: %s",
+                     customer_id_col, df.columns.tolist())
         # Force create it
-        df = df.copy()
+        df = df.copy(deep=False)
         df['customer_id'] = range(len(df))
         actual_column_mapping['customer_id'] = 'customer_id'
-        print("Force created customer_id column")
+        logger.info("Force created customer_id column")
     
-    print(f"DEBUG: Final customer_id column: {actual_column_mapping['customer_id']}")
-    print(f"DEBUG: Column exists in dataframe: {actual_column_mapping['customer_id'] in df.columns}")
+    logger.debug("Final customer_id column: %s", actual_column_mapping['customer_id'])
+    logger.debug("Column exists in dataframe: %s", actual_column_mapping['customer_id'] in df.columns)
     
     return df, actual_column_mapping
 
-def clean_data(df, actual_column_mapping):
+def infer_date_format(values, sample_size=1000):
+    """
+    Infer an explicit strftime format from a sample of date strings
+    
+    Returns:
+        str or None: First candidate format that parses every sampled value
+    """
+    sample = pd.Series(values.head(10 * sample_size).dropna().unique()[:sample_size]).astype(str)
+    if sample.empty:
+        return None
+    for date_format in DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors='coerce').notna().all():
+            return date_format
+    return None
+
+def parse_integer_date_key(values):
+    """
+    Vectorized parse of integer yyyymmdd date keys (e.g. 20221109)
+    
+    Invalid keys (e.g. month 13 or February 30th) become NaT.
+    """
+    keys = values.to_numpy(dtype='float64')
+    valid = ~np.isnan(keys)
+    keys = np.where(valid, keys, 19700101).astype('int64')
+    
+    year, month_day = np.divmod(keys, 10000)
+    month, day = np.divmod(month_day, 100)
+    dates = ((year - 1970).astype('M8[Y]').astype('M8[M]') + (month - 1)).astype('M8[D]') + (day - 1)
+    
+    # Rolled-over dates (day 31 of a 30-day month...) do not round-trip
+    months = dates.astype('M8[M]')
+    round_trip = ((months.astype('M8[Y]').astype('int64') + 1970) * 10000
+                  + (months.astype('int64') % 12 + 1) * 100
+                  + (dates - months.astype('M8[D]')).astype('int64') + 1)
+    valid &= (round_trip == keys) & (month >= 1) & (month <= 12) & (day >= 1)
+    
+    return pd.Series(np.where(valid, dates, np.datetime64('NaT')).astype('M8[ns]'), index=values.index)
+
+def _is_integer_date_key(values):
+    if not pd.api.types.is_numeric_dtype(values.dtype) or values.dtype == 'bool':
+        return False
+    keys = values.dropna()
+    return (not keys.empty and (keys % 1 == 0).all()
+            and keys.min() >= 10000101 and keys.max() <= 99991231)
+
+def parse_date_column(values):
+    """
+    Convert one column to datetime using the fastest applicable parser
+    
+    Integer yyyymmdd keys take a vectorized arithmetic path, strings are parsed
+    with an inferred explicit format, and values the format does not match fall
+    back to pandas' flexible parser.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    if _is_integer_date_key(values):
+        return parse_integer_date_key(values)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.to_datetime(values, errors='coerce')
+    
+    date_format = infer_date_format(values)
+    if date_format is None:
+        return pd.to_datetime(values, errors='coerce')
+    
+    parsed = pd.to_datetime(values, format=date_format, errors='coerce')
+    unmatched = parsed.isna() & values.notna()
+    if unmatched.any():
+        parsed[unmatched] = pd.to_datetime(values[unmatched], errors='coerce')
+    return parsed
+
+def convert_date_columns(df):
+    """
+    Convert every column whose name mentions a date or time to datetime
+    
+    Returns:
+        tuple: (df, date_columns)
+    """
+    date_columns = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = parse_date_column(df[col])
+    
+    return df, date_columns
+
+def estimate_memory_usage(df, sample_size=1000):
+    """
+    Estimate a dataframe's memory in bytes without a deep scan of every string
+    
+    Object columns are estimated from the per-value size of a sample instead of
+    measuring every string, which would cost a full extra pass over the data.
+    """
+    total = 0
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == 'object' and len(values) > sample_size:
+            sample = values.sample(sample_size, random_state=0)
+            total += int(values.memory_usage(index=False) + sample.memory_usage(index=False, deep=True)
+                         / sample_size * len(values) - sample.memory_usage(index=False))
+        else:
+            total += int(values.memory_usage(index=False, deep=True))
+    return total
+
+def optimize_dtypes(df, exclude=(), max_category_ratio=0.5, measure_memory=True):
+    """
+    Shrink a dataframe's memory footprint without changing its values
+    
+    Low-cardinality strings become categoricals and integers are downcast to
+    the smallest type that holds them. Floats stay float64: pandas aggregates
+    float32 columns in float32, which would change the feature values.
+    
+    Args:
+        df (pd.DataFrame): Dataframe to optimize (modified in place)
+        exclude (iterable): Columns to leave untouched (e.g. the customer id)
+        max_category_ratio (float): Maximum unique/rows ratio for categorical conversion
+        measure_memory (bool): Estimate memory before/after (reported as None otherwise)
+    
+    Returns:
+        tuple: (df, report) where report holds estimated memory before/after in
+            bytes and the {column: (old dtype, new dtype)} conversions
+    """
+    memory_before = estimate_memory_usage(df) if measure_memory else None
+    conversions = {}
+    
+    for col in df.columns:
+        if col in exclude:
+            continue
+        values = df[col]
+        old_dtype = values.dtype
+        
+        if old_dtype == 'object':
+            if len(values) and values.nunique() <= max_category_ratio * len(values):
+                df[col] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(old_dtype):
+            df[col] = pd.to_numeric(values, downcast='integer')
+        
+        if df[col].dtype != old_dtype:
+            conversions[col] = (str(old_dtype), str(df[col].dtype))
+    
+    memory_after = estimate_memory_usage(df) if measure_memory else None
+    report = {
+        'memory_before_bytes': memory_before,
+        'memory_after_bytes': memory_after,
+        'conversions': conversions,
+    }
+    return df, report
+
+def clean_data(df, actual_column_mapping, optimize_memory=True):
     """
     Clean the data by handling missing values and converting data types
+    
+    With optimize_memory, an ingestion stage (optimize_dtypes) then converts
+    low-cardinality strings to categoricals and downcasts numerics so every
+    later step works on a smaller frame.
     """
-    print(f"Dataset shape before cleaning: {df.shape}")
-    print("Missing values per column:")
-    print(df.isnull().sum())
+    logger.info("Dataset shape before cleaning: %s", df.shape)
+    # The full null count is a diagnostic only: skipped unless it is logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Missing values per column:\n%s", df.isnull().sum())
     
     # Remove rows with missing customer_id
     customer_id_col = actual_column_mapping['customer_id']
-    df = df.dropna(subset=[customer_id_col])
+    # Explicit copy: the stages below assign columns to the filtered frame
+    df = df.dropna(subset=[customer_id_col]).copy()
     
     # Fill missing values in numeric columns with median
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     for col in numeric_cols:
-        if df[col].isnull().sum() > 0:
+        if df[col].isnull().any():
             df[col] = df[col].fillna(df[col].median())
     
-    print(f"Dataset shape after cleaning: {df.shape}")
+    logger.info("Dataset shape after cleaning: %s", df.shape)
     
     # Convert date columns to datetime if present
-    date_columns = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-    for col in date_columns:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+    df, date_columns = convert_date_columns(df)
+    
+    logger.info("Date columns converted: %s", date_columns)
     
-    print(f"Date columns converted: {date_columns}")
+    if optimize_memory:
+        measure_memory = logger.isEnabledFor(logging.INFO)
+        df, report = optimize_dtypes(df, exclude=[customer_id_col], measure_memory=measure_memory)
+        if measure_memory:
+            before_mb = report['memory_before_bytes'] / 1024**2
+            after_mb = report['memory_after_bytes'] / 1024**2
+            logger.info("Memory usage: %.2f MB -> %.2f MB (%.1f%% saved)", before_mb, after_mb,
+                        (1 - after_mb / before_mb) * 100 if before_mb else 0)
+        logger.debug("Optimized dtypes: %s", report['conversions'])
     
     return df, date_columns
 
-def create_customer_features(df, actual_column_mapping):
+def build_aggregation_plan(df, actual_column_mapping):
     """
-    Create customer-level features for segmentation
+    Build the customer-level aggregation dictionary for the available columns
     """
-    print("Creating customer-level features for segmentation...")
-    
     customer_id_col = actual_column_mapping['customer_id']
     
     # Build aggregation dictionary based on available mapped columns
@@ -172,13 +361,13 @@ def create_customer_features(df, actual_column_mapping):
             col_dtype = df[actual_col].dtype
             
             # Handle numeric columns
-            if col_dtype in ['int64', 'float64']:
+            if is_numeric_feature_dtype(col_dtype):
                 agg_dict[actual_col] = ['sum', 'mean', 'count', 'std']
             # Handle datetime columns
             elif 'datetime' in str(col_dtype):
                 agg_dict[actual_col] = ['min', 'max', 'count']
-            # Handle object/string columns
-            elif col_dtype == 'object':
+            # Handle object/string columns (categoricals from optimize_dtypes included)
+            elif is_string_feature_dtype(col_dtype):
                 agg_dict[actual_col] = ['count', 'nunique']
             # Handle boolean columns
             elif col_dtype == 'bool':
@@ -189,66 +378,104 @@ def create_customer_features(df, actual_column_mapping):
     additional_numeric = [col for col in numeric_cols if col not in agg_dict and col != customer_id_col]
     for col in additional_numeric[:5]:  # Limit to first 5 additional columns
         col_dtype = df[col].dtype
-        if col_dtype in ['int64', 'float64']:
+        if is_numeric_feature_dtype(col_dtype):
             agg_dict[col] = ['sum', 'mean', 'count']
         elif 'datetime' in str(col_dtype):
             agg_dict[col] = ['min', 'max', 'count']
     
-    print(f"Aggregation dictionary: {list(agg_dict.keys())}")
+    return agg_dict
+
+def widen_integer_columns(customer_features):
+    """
+    Cast integer feature columns back to int64
+    
+    Groupby sums of downcast integer columns may come back as narrow integer
+    dtypes; features always use int64 regardless of the ingestion dtypes.
+    """
+    for col in customer_features.columns:
+        if pd.api.types.is_integer_dtype(customer_features[col].dtype):
+            customer_features[col] = customer_features[col].astype('int64')
+    return customer_features
+
+def flatten_feature_columns(customer_features, customer_id_col):
+    """
+    Flatten (column, aggregation) tuples into '<column>_<aggregation>' names
+    """
+    new_columns = [customer_id_col]
+    for col in customer_features.columns[1:]:
+        if isinstance(col, tuple):
+            new_columns.append(f"{col[0]}_{col[1]}")
+        else:
+            new_columns.append(col)
+    
+    customer_features.columns = new_columns
+    return customer_features
+
+def drop_uninformative_columns(customer_features, customer_id_col):
+    """
+    Remove feature columns that are entirely NaN or hold a single value
+    """
+    columns_to_drop = []
+    for col in customer_features.columns:
+        if col != customer_id_col:
+            # Constant values or all NaN (nunique ignores NaN)
+            if customer_features[col].nunique() <= 1:
+                columns_to_drop.append(col)
+    
+    if columns_to_drop:
+        customer_features = customer_features.drop(columns_to_drop, axis=1)
+        logger.info("Dropped %d constant/empty columns", len(columns_to_drop))
+    
+    return customer_features
+
+def create_customer_features(df, actual_column_mapping):
+    """
+    Create customer-level features for segmentation
+    """
+    logger.info("Creating customer-level features for segmentation...")
+    
+    customer_id_col = actual_column_mapping['customer_id']
+    
+    agg_dict = build_aggregation_plan(df, actual_column_mapping)
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    
+    logger.debug("Aggregation dictionary: %s", list(agg_dict.keys()))
     
     # Perform customer-level aggregation
     if agg_dict:
         try:
             customer_features = df.groupby(customer_id_col).agg(agg_dict).reset_index()
-            
-            # Flatten column names
-            new_columns = [customer_id_col]
-            for col in customer_features.columns[1:]:
-                if isinstance(col, tuple):
-                    new_columns.append(f"{col[0]}_{col[1]}")
-                else:
-                    new_columns.append(col)
-            
-            customer_features.columns = new_columns
+            customer_features = flatten_feature_columns(customer_features, customer_id_col)
+            customer_features = widen_integer_columns(customer_features)
             
             # Remove columns with all NaN or constant values
-            customer_features = customer_features.dropna(axis=1, how='all')
-            columns_to_drop = []
-            for col in customer_features.columns:
-                if col != customer_id_col:
-                    # Check for constant values or all NaN
-                    if customer_features[col].nunique() <= 1 or customer_features[col].isna().all():
-                        columns_to_drop.append(col)
+            customer_features = drop_uninformative_columns(customer_features, customer_id_col)
             
-            if columns_to_drop:
-                customer_features = customer_features.drop(columns_to_drop, axis=1)
-                print(f"Dropped {len(columns_to_drop)} constant/empty columns")
-            
-            print(f"Customer features shape: {customer_features.shape}")
-            print("Customer features columns:", customer_features.columns.tolist())
+            logger.info("Customer features shape: %s", customer_features.shape)
+            logger.debug("Customer features columns: %s", customer_features.columns.tolist())
             
         except Exception as e:
-            print(f"Error in aggregation: {e}")
-            print("Falling back to basic features...")
+            logger.warning("Error in aggregation: %s. Falling back to basic features...", e)
             customer_features = None
     else:
         customer_features = None
     
     # Fallback: create basic features from available numeric columns
     if customer_features is None:
-        print("Creating basic customer features from available numeric data...")
+        logger.info("Creating basic customer features from available numeric data...")
         available_numeric = [col for col in numeric_cols if col != customer_id_col]
         
         if available_numeric:
             # Filter out datetime columns from numeric_cols
             truly_numeric = []
             for col in available_numeric:
-                if df[col].dtype in ['int64', 'float64']:
+                if is_numeric_feature_dtype(df[col].dtype):
                     truly_numeric.append(col)
             
             if truly_numeric:
                 customer_features = df.groupby(customer_id_col)[truly_numeric].agg(['sum', 'mean', 'count']).reset_index()
                 customer_features.columns = [customer_id_col] + [f"{col[0]}_{col[1]}" for col in customer_features.columns[1:]]
+                customer_features = widen_integer_columns(customer_features)
             else:
                 raise ValueError("No truly numeric columns available for analysis")
         else:
@@ -256,14 +483,117 @@ def create_customer_features(df, actual_column_mapping):
     
     return customer_features
 
-def add_derived_metrics(customer_features, df, actual_column_mapping, date_columns):
-    """
-    Add derived business metrics to customer features
+def plan_customer_features(df, actual_column_mapping, date_columns):
     """
-    print("Creating derived business metrics...")
+    Collect every per-customer aggregation the pipeline needs into one plan
     
+    The feature aggregations of build_aggregation_plan are fused with the RFM
+    max/count of the first date column, so features and recency/frequency come
+    out of a single grouped pass. RFM-only aggregations are marked hidden and
+    removed after the derived metrics are computed.
+    
+    Returns:
+        dict: Plan with customer_id_col, agg_dict, rfm_col and hidden_columns
+    """
     customer_id_col = actual_column_mapping['customer_id']
+    agg_dict = {col: list(aggs) for col, aggs in build_aggregation_plan(df, actual_column_mapping).items()}
+    
+    rfm_col = None
+    if date_columns and date_columns[0] in df.columns:
+        rfm_col = date_columns[0]
+    
+    hidden_columns = []
+    if rfm_col is not None and agg_dict:
+        rfm_aggs = agg_dict.setdefault(rfm_col, [])
+        for agg in ['max', 'count']:
+            if agg not in rfm_aggs:
+                rfm_aggs.append(agg)
+                hidden_columns.append(f"{rfm_col}_{agg}")
+    
+    return {
+        'customer_id_col': customer_id_col,
+        'agg_dict': agg_dict,
+        'rfm_col': rfm_col,
+        'hidden_columns': hidden_columns,
+    }
+
+def aggregate_customer_features(df, plan):
+    """
+    Run every aggregation of a feature plan in a single grouped pass
+    """
+    customer_id_col = plan['customer_id_col']
+    customer_features = df.groupby(customer_id_col).agg(plan['agg_dict']).reset_index()
+    customer_features = flatten_feature_columns(customer_features, customer_id_col)
+    return widen_integer_columns(customer_features)
+
+def finalize_customer_features(customer_features, plan, current_date=None):
+    """
+    Turn fused aggregates into final features without another pass over rows
     
+    Recency and frequency are read from the fused RFM aggregates before
+    constant columns are pruned, and every derived metric works on the
+    customer-level table only.
+    
+    Args:
+        customer_features (pd.DataFrame): Output of aggregate_customer_features
+        plan (dict): Plan from plan_customer_features
+        current_date (pd.Timestamp): Recency reference date (default: latest
+            transaction across all customers)
+    """
+    customer_id_col = plan['customer_id_col']
+    rfm_col = plan['rfm_col']
+    
+    if rfm_col is not None:
+        last_transaction_date = customer_features[f"{rfm_col}_max"]
+        frequency = customer_features[f"{rfm_col}_count"]
+        if current_date is None:
+            current_date = last_transaction_date.max()
+        recency_days = (current_date - last_transaction_date).dt.days
+    
+    if plan['hidden_columns']:
+        customer_features = customer_features.drop(columns=plan['hidden_columns'])
+    customer_features = drop_uninformative_columns(customer_features, customer_id_col)
+    
+    logger.info("Customer features shape: %s", customer_features.shape)
+    
+    customer_features = add_ratio_metrics(customer_features, customer_id_col)
+    if rfm_col is not None:
+        customer_features['recency_days'] = recency_days
+        customer_features['frequency'] = frequency
+    
+    return customer_features
+
+def build_customer_features_fused(df, actual_column_mapping, date_columns):
+    """
+    Fused equivalent of create_customer_features followed by add_derived_metrics
+    
+    The staged path scans the rows twice (feature groupby, then an RFM groupby
+    on the date column plus a global max) and merges the results; here all of
+    it is one groupby and everything after works on one row per customer.
+    Falls back to the staged path when no aggregation plan can be built.
+    """
+    logger.info("Creating customer-level features (fused aggregation plan)...")
+    
+    plan = plan_customer_features(df, actual_column_mapping, date_columns)
+    if not plan['agg_dict']:
+        customer_features = create_customer_features(df, actual_column_mapping)
+        return add_derived_metrics(customer_features, df, actual_column_mapping, date_columns)
+    
+    logger.debug("Aggregation dictionary: %s", list(plan['agg_dict'].keys()))
+    
+    try:
+        customer_features = aggregate_customer_features(df, plan)
+    except Exception as e:
+        logger.warning("Error in fused aggregation: %s. Falling back to staged feature creation...", e)
+        customer_features = create_customer_features(df, actual_column_mapping)
+        return add_derived_metrics(customer_features, df, actual_column_mapping, date_columns)
+    
+    return finalize_customer_features(customer_features, plan)
+
+def add_ratio_metrics(customer_features, customer_id_col):
+    """
+    Add revenue-per-transaction and engagement ratios computed from aggregated features
+    """
     # Find revenue and transaction count columns
     revenue_cols = [col for col in customer_features.columns if 'sum' in col and any(term in col.lower() for term in ['revenue', 'amount', 'price', 'sales'])]
     count_cols = [col for col in customer_features.columns if 'count' in col]
@@ -278,6 +608,35 @@ def add_derived_metrics(customer_features, df, actual_column_mapping, date_colum
     if len(sum_cols) >= 2:
         customer_features['engagement_score'] = customer_features[sum_cols[0]] / (customer_features[sum_cols[1]] + 1)
     
+    return customer_features
+
+def merge_rfm_metrics(customer_features, customer_rfm, current_date, customer_id_col):
+    """
+    Merge recency/frequency features given each customer's last transaction date
+    
+    Args:
+        customer_features (pd.DataFrame): Customer features to extend
+        customer_rfm (pd.DataFrame): Columns [customer_id_col, 'last_transaction_date', 'frequency']
+        current_date (pd.Timestamp): Reference date for recency (latest transaction overall)
+        customer_id_col (str): Customer identifier column
+    """
+    # Calculate recency (days since last transaction)
+    customer_rfm['recency_days'] = (current_date - customer_rfm['last_transaction_date']).dt.days
+    
+    # Merge with customer_features
+    return customer_features.merge(customer_rfm[[customer_id_col, 'recency_days', 'frequency']], 
+                                   on=customer_id_col, how='left')
+
+def add_derived_metrics(customer_features, df, actual_column_mapping, date_columns):
+    """
+    Add derived business metrics to customer features
+    """
+    logger.info("Creating derived business metrics...")
+    
+    customer_id_col = actual_column_mapping['customer_id']
+    
+    customer_features = add_ratio_metrics(customer_features, customer_id_col)
+    
     # Create recency, frequency, monetary features if date columns exist
     if date_columns and len(date_columns) > 0:
         date_col = date_columns[0]
@@ -285,13 +644,8 @@ def add_derived_metrics(customer_features, df, actual_column_mapping, date_colum
             customer_rfm = df.groupby(customer_id_col)[date_col].agg(['max', 'count']).reset_index()
             customer_rfm.columns = [customer_id_col, 'last_transaction_date', 'frequency']
             
-            # Calculate recency (days since last transaction)
-            current_date = df[date_col].max()
-            customer_rfm['recency_days'] = (current_date - customer_rfm['last_transaction_date']).dt.days
-            
-            # Merge with customer_features
-            customer_features = customer_features.merge(customer_rfm[[customer_id_col, 'recency_days', 'frequency']], 
-                                                       on=customer_id_col, how='left')
+            customer_features = merge_rfm_metrics(customer_features, customer_rfm,
+                                                  df[date_col].max(), customer_id_col)
     
     return customer_features
 
@@ -299,109 +653,309 @@ def final_data_cleanup(customer_features, customer_id_col):
     """
     Final cleanup of customer features data
     """
-    print("Data type summary after aggregation:")
-    for col in customer_features.columns:
-        print(f"{col}: {customer_features[col].dtype}")
-    
-    # Handle any remaining data type issues
-    for col in customer_features.columns:
-        if col != customer_id_col:
-            # Convert object columns that should be numeric
-            if customer_features[col].dtype == 'object':
-                try:
-                    customer_features[col] = pd.to_numeric(customer_features[col], errors='coerce')
-                except:
-                    pass
-            
-            # Fill infinite values
-            if customer_features[col].dtype in ['int64', 'float64']:
-                customer_features[col] = customer_features[col].replace([np.inf, -np.inf], np.nan)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Data type summary after aggregation:\n%s",
+                     "\n".join(f"{col}: {dtype}" for col, dtype in customer_features.dtypes.items()))
+    
+    # Convert object columns that should be numeric
+    object_cols = [col for col in customer_features.columns
+                   if col != customer_id_col and customer_features[col].dtype == 'object']
+    for col in object_cols:
+        try:
+            customer_features[col] = pd.to_numeric(customer_features[col], errors='coerce')
+        except:
+            pass
+    
+    # Replace infinite values with NaN (only float columns can hold them); a
+    # single vectorized check over the float block, columns rewritten only if needed
+    float_cols = [col for col in customer_features.columns
+                  if col != customer_id_col and customer_features[col].dtype == 'float64']
+    if float_cols:
+        has_inf = np.isinf(customer_features[float_cols].to_numpy()).any(axis=0)
+        for col in np.asarray(float_cols)[has_inf]:
+            customer_features[col] = customer_features[col].replace([np.inf, -np.inf], np.nan)
     
     return customer_features
 
-def process_data(df):
+@contextmanager
+def pipeline_logging(verbose=True):
+    """
+    Route pipeline log messages to stdout for the duration of a run
+    
+    verbose=True prints progress and diagnostics (the console output notebooks
+    rely on); verbose=False only lets warnings through, and diagnostics that
+    are computed just to be displayed (null counts, dtype dumps, memory
+    estimates) are skipped entirely. verbose=None leaves the application's
+    logging configuration untouched.
+    """
+    if verbose is None:
+        yield
+        return
+    
+    pipeline_logger = logging.getLogger(PIPELINE_LOGGER_NAME)
+    previous_level, previous_propagate = pipeline_logger.level, pipeline_logger.propagate
+    handler = None
+    if not verbose:
+        pipeline_logger.setLevel(logging.WARNING)
+    else:
+        pipeline_logger.setLevel(logging.DEBUG)
+        if not any(getattr(h, 'pipeline_console', False) for h in pipeline_logger.handlers):
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            handler.pipeline_console = True
+            pipeline_logger.addHandler(handler)
+            pipeline_logger.propagate = False
+    try:
+        yield
+    finally:
+        if handler is not None:
+            pipeline_logger.removeHandler(handler)
+        pipeline_logger.setLevel(previous_level)
+        pipeline_logger.propagate = previous_propagate
+
+def _row_count(value):
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+def _peak_rss_bytes():
+    """Process high-water resident set size, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class PipelineProfiler:
+    """
+    Per-stage instrumentation for the processing pipeline
+    
+    Every stage run through ``run`` records its wall time, rows in/out (the
+    first dataframe argument and the first dataframe returned) and memory.
+    Pass a profiler to process_data and read ``report()`` afterwards, or give
+    it an ``on_stage`` callback that receives each record as the stage ends.
+    
+    Memory is always recorded as the process peak RSS after the stage, which
+    costs nothing to read but never goes down. With trace_memory=True the
+    peak of Python/numpy allocations during the stage is traced as well
+    (tracemalloc), which is exact per stage but slows the pipeline down.
+    """
+    
+    COLUMNS = ['stage', 'seconds', 'rows_in', 'rows_out', 'peak_rss_bytes', 'peak_traced_bytes']
+    
+    def __init__(self, on_stage=None, trace_memory=False):
+        self.on_stage = on_stage
+        self.trace_memory = trace_memory
+        self.records = []
+    
+    def run(self, stage, func, *args, **kwargs):
+        """
+        Run one pipeline stage and record its metrics
+        
+        Args:
+            stage (str): Stage name used in the report
+            func (callable): Stage function
+            *args, **kwargs: Passed to func
+        
+        Returns:
+            The stage function's result
+        """
+        started_tracing = False
+        traced_baseline = None
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                tracemalloc.reset_peak()
+            else:
+                started_tracing = None  # peak of an outer trace cannot be reset
+            traced_baseline = tracemalloc.get_traced_memory()[0]
+        
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            peak_traced = None
+            if self.trace_memory and started_tracing is not None:
+                peak_traced = tracemalloc.get_traced_memory()[1] - traced_baseline
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        
+        record = {
+            'stage': stage,
+            'seconds': seconds,
+            'rows_in': _row_count(args[0]) if args else None,
+            'rows_out': _row_count(result),
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'peak_traced_bytes': peak_traced,
+        }
+        self.records.append(record)
+        logger.debug("Stage '%s' took %.3fs (%s -> %s rows)", stage, seconds,
+                     record['rows_in'], record['rows_out'])
+        if self.on_stage is not None:
+            self.on_stage(record)
+        return result
+    
+    def report(self):
+        """
+        Returns:
+            pd.DataFrame: One row per stage run, in execution order
+        """
+        return pd.DataFrame(self.records, columns=self.COLUMNS)
+
+def process_data(df, n_workers=1, fused=True, verbose=True, profiler=None):
     """
     Main function to process and clean all data
     
     Args:
         df (pd.DataFrame): Raw input dataframe
+        n_workers (int): Worker processes for building customer features; values
+            above 1 hash-partition customers across a process pool (see src.parallel)
+        fused (bool): Build features and RFM metrics from one fused aggregation
+            plan (build_customer_features_fused) instead of the staged steps
+        verbose (bool): Print progress and diagnostics; False is a quiet mode that
+            also skips diagnostic-only work, None defers to the logging config
+            (see pipeline_logging)
+        profiler (PipelineProfiler): Receives wall time, rows in/out and memory
+            for every stage
     
     Returns:
         tuple: (customer_features, column_mapping)
             - customer_features (pd.DataFrame): Processed customer features dataframe
             - column_mapping (dict): Mapping of business terms to actual column names
     """
-    print("Starting data processing...")
-    print(f"Input dataframe shape: {df.shape}")
-    print(f"Input columns: {df.columns.tolist()}")
+    with pipeline_logging(verbose):
+        return _process_data(df, n_workers, fused, profiler or PipelineProfiler())
+
+def _process_data(df, n_workers, fused, profiler):
+    logger.info("Starting data processing...")
+    logger.info("Input dataframe shape: %s", df.shape)
+    logger.debug("Input columns: %s", df.columns.tolist())
     
     # Step 1: Standardize column names
-    df = standardize_column_names(df)
-    print("\nStandardized columns:")
-    print(df.columns.tolist())
+    df = profiler.run('standardize', standardize_column_names, df)
+    logger.debug("\nStandardized columns:\n%s", df.columns.tolist())
     
     # Step 2: Create column mapping
-    actual_column_mapping = create_column_mapping(df)
-    print(f"\nActual column mapping found: {actual_column_mapping}")
+    actual_column_mapping = profiler.run('column_mapping', create_column_mapping, df)
+    logger.info("\nActual column mapping found: %s", actual_column_mapping)
     
     # Step 3: Ensure customer_id exists
-    df, actual_column_mapping = ensure_customer_id(df, actual_column_mapping)
-    print(f"\nAfter ensuring customer_id - mapping: {actual_column_mapping}")
+    df, actual_column_mapping = profiler.run('ensure_customer_id', ensure_customer_id, df, actual_column_mapping)
+    logger.debug("\nAfter ensuring customer_id - mapping: %s", actual_column_mapping)
     
     # Verify customer_id is in mapping
     if 'customer_id' not in actual_column_mapping:
         raise ValueError("Failed to establish customer_id column mapping")
     
     customer_id_col = actual_column_mapping['customer_id']
-    print(f"Using customer_id column: {customer_id_col}")
+    logger.info("Using customer_id column: %s", customer_id_col)
     
     # Step 4: Clean data
-    df, date_columns = clean_data(df, actual_column_mapping)
-    
-    # Step 5: Create customer features
-    customer_features = create_customer_features(df, actual_column_mapping)
-    
-    # Step 6: Add derived metrics
-    customer_features = add_derived_metrics(customer_features, df, actual_column_mapping, date_columns)
+    df, date_columns = profiler.run('clean', clean_data, df, actual_column_mapping)
+    
+    if n_workers > 1:
+        # Steps 5-6 as a map-reduce over customer-hash partitions
+        from src.parallel import build_customer_features_parallel
+        customer_features = profiler.run('features', build_customer_features_parallel,
+                                         df, actual_column_mapping, date_columns, n_workers)
+    elif fused:
+        # Steps 5-6 in a single grouped pass
+        customer_features = profiler.run('features', build_customer_features_fused,
+                                         df, actual_column_mapping, date_columns)
+    else:
+        # Step 5: Create customer features
+        customer_features = profiler.run('create_customer_features', create_customer_features,
+                                         df, actual_column_mapping)
+        
+        # Step 6: Add derived metrics
+        customer_features = profiler.run('add_derived_metrics', add_derived_metrics,
+                                         customer_features, df, actual_column_mapping, date_columns)
     
     # Step 7: Final cleanup
-    customer_features = final_data_cleanup(customer_features, customer_id_col)
+    customer_features = profiler.run('final_cleanup', final_data_cleanup, customer_features, customer_id_col)
     
-    print(f"\nFinal customer features shape: {customer_features.shape}")
-    print("Final customer features columns:", customer_features.columns.tolist())
+    logger.info("\nFinal customer features shape: %s", customer_features.shape)
+    logger.debug("Final customer features columns: %s", customer_features.columns.tolist())
     
     return customer_features, actual_column_mapping
 
-def save_processed_data(customer_features, filepath="../data/processed/customer_features.csv"):
+def save_processed_data(customer_features, filepath="../data/processed/customer_features.csv", file_format='csv',
+                        verbose=True):
     """
-    Save processed customer features to CSV file
+    Save processed customer features to CSV or columnar storage
     
     Args:
         customer_features (pd.DataFrame): Processed customer features dataframe
         filepath (str): Path to save the CSV file
+        file_format (str): 'csv', or 'columnar' to write a memory-mappable directory of
+            .npy columns (see src.columnar) next to it, e.g. customer_features.columnar/
+        verbose (bool): Print where the data was written (see pipeline_logging)
+    
+    Returns:
+        str: Path of the written file or directory
     """
     # Create directory if it doesn't exist
     output_dir = Path(filepath).parent
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Save to CSV
-    customer_features.to_csv(filepath, index=False)
-    print(f"Customer features saved to: {filepath}")
-    print(f"File size: {os.path.getsize(filepath) / 1024:.2f} KB")
+    if file_format == 'columnar':
+        filepath = str(Path(filepath).with_suffix('.columnar'))
+        write_columnar(customer_features, filepath)
+        size = sum(f.stat().st_size for f in Path(filepath).iterdir())
+    elif file_format == 'csv':
+        customer_features.to_csv(filepath, index=False)
+        size = os.path.getsize(filepath)
+    else:
+        raise ValueError(f"Unsupported file_format '{file_format}' (expected 'csv' or 'columnar')")
+    
+    with pipeline_logging(verbose):
+        logger.info("Customer features saved to: %s", filepath)
+        logger.info("File size: %.2f KB", size / 1024)
+    return filepath
+
+def load_processed_data(filepath="../data/processed/customer_features.columnar", columns=None):
+    """
+    Load processed customer features, reading only the requested columns
+    
+    Columnar directories are memory-mapped and keep their stored dtypes
+    (datetimes included); CSV files are parsed with pd.read_csv.
+    
+    Args:
+        filepath (str): Columnar directory or CSV file written by save_processed_data
+        columns (list): Columns to load (default: all)
+    
+    Returns:
+        pd.DataFrame: Customer features
+    """
+    if is_columnar_dataset(filepath):
+        return read_columnar(filepath, columns=columns)
+    return pd.read_csv(filepath, usecols=columns)
 
-def get_data_summary(customer_features):
+def get_data_summary(customer_features, verbose=True, profile=False, chunksize=100000):
     """
     Get comprehensive summary of the processed data
     
     Args:
-        customer_features (pd.DataFrame): Processed customer features dataframe
+        customer_features (pd.DataFrame): Processed customer features dataframe; with
+            profile=True also a CSV file or columnar directory
+        verbose (bool): Print the summary; the returned value is the same either way
+        profile (bool): Summarize in one chunked pass with mergeable sketches
+            (src.profiling) instead of exact full-table statistics; quantiles
+            and duplicate IDs are then approximate on large tables
+        chunksize (int): Rows per chunk in profile mode
     
     Returns:
-        dict: Summary statistics and information about the data
+        dict: Summary statistics and information about the data, or with
+            profile=True a DataProfile (its summary() gives the same keys)
     """
-    print("\n" + "="*50)
-    print("DATA SUMMARY")
-    print("="*50)
+    if profile:
+        from src.profiling import profile_data
+        data_profile = profile_data(customer_features, chunksize=chunksize)
+        if verbose:
+            print("\n" + data_profile.report())
+        return data_profile
     
     summary = {}
     
@@ -410,6 +964,26 @@ def get_data_summary(customer_features):
     summary['columns'] = customer_features.columns.tolist()
     summary['dtypes'] = customer_features.dtypes.to_dict()
     
+    # Missing values
+    missing_values = customer_features.isnull().sum()
+    summary['missing_values'] = missing_values.to_dict()
+    
+    # Numeric columns statistics (computed once, shared by the dict and the printout)
+    numeric_cols = customer_features.select_dtypes(include=[np.number]).columns
+    numeric_stats = customer_features[numeric_cols].describe() if len(numeric_cols) > 0 else None
+    if numeric_stats is not None:
+        summary['numeric_stats'] = numeric_stats.to_dict()
+    
+    sample_data = customer_features.head()
+    summary['sample_data'] = sample_data.to_dict()
+    
+    if not verbose:
+        return summary
+    
+    print("\n" + "="*50)
+    print("DATA SUMMARY")
+    print("="*50)
+    
     print(f"Dataset Shape: {summary['shape']}")
     print(f"Number of Customers: {summary['shape'][0]}")
     print(f"Number of Features: {summary['shape'][1]}")
@@ -419,21 +993,14 @@ def get_data_summary(customer_features):
     for col, dtype in summary['dtypes'].items():
         print(f"  {col}: {dtype}")
     
-    # Missing values
-    missing_values = customer_features.isnull().sum()
-    summary['missing_values'] = missing_values.to_dict()
-    
     print(f"\nMissing Values:")
     for col, missing in summary['missing_values'].items():
         if missing > 0:
             print(f"  {col}: {missing} ({missing/len(customer_features)*100:.2f}%)")
     
-    # Numeric columns statistics
-    numeric_cols = customer_features.select_dtypes(include=[np.number]).columns
-    if len(numeric_cols) > 0:
-        summary['numeric_stats'] = customer_features[numeric_cols].describe().to_dict()
+    if numeric_stats is not None:
         print(f"\nNumeric Columns Summary:")
-        print(customer_features[numeric_cols].describe())
+        print(numeric_stats)
     
     # Customer ID info
     if 'customer_id' in customer_features.columns:
@@ -443,9 +1010,6 @@ def get_data_summary(customer_features):
     
     # Sample data
     print(f"\nSample Data (First 5 Rows):")
-    print(customer_features.head())
-    
-    summary['sample_data'] = customer_features.head().to_dict()
+    print(sample_data)
     
     return summary
-
@@ -0,0 +1,395 @@
+"""
+Experiment Design: Sample Sizes and Simulated Power
+===================================================
+
+Planning tools for the experiments analysed by ``ExperimentAnalyzer``:
+
+- ``sample_size_grid``: closed-form sample sizes for a whole grid of
+  baselines x minimum detectable effects x alphas x powers x arm counts in one
+  NumPy broadcast (two-proportion formula of notebook 03, or the normal
+  approximation for means given a standard deviation).
+- ``simulate_power``: Monte Carlo power for metrics the closed forms do not
+  describe well, such as skewed revenue that ``statistical_significance_test``
+  sends to Mann-Whitney. Both arms are resampled from historical values, the
+  treatment arm scaled by the effect. Every batch of simulated experiments is
+  one index matrix and the test runs vectorized across its rows, so no Python
+  loop runs per simulation. Batches can be spread over a process pool.
+- ``PowerCache``: simulated power per design point, keyed by a digest of the
+  design parameters and the historical data, optionally persisted as JSON, so
+  refining a grid only simulates the new points.
+
+Each design point draws from its own ``SeedSequence`` derived from the seed
+and the point's parameters. Its power therefore does not depend on the worker
+count or on which other points are in the grid.
+
+Usage:
+    from src.experiment_design import sample_size_grid, simulate_power, PowerCache
+
+    sizes = sample_size_grid(baselines=[0.2, 0.3], mdes=[0.05, 0.1, 0.2],
+                             alphas=[0.05, 0.01], powers=[0.8, 0.9], n_arms=[2, 3])
+
+    cache = PowerCache('../data/cache/power.json')
+    power = simulate_power(df['sales'], effects=[0.05, 0.1], sample_sizes=[500, 1000, 2000],
+                           test='mannwhitney', seed=42, n_workers=4, cache=cache)
+    sample_size_for_power(power, target=0.8)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import special
+
+logger = logging.getLogger(__name__)
+
+TESTS = ['mannwhitney', 'ttest', 'proportion']
+
+DEFAULT_SIMULATIONS = 2000
+
+# Upper bound on index-matrix elements per batch (simulations x pooled sample size)
+MAX_BATCH_ELEMENTS = 2 ** 22
+
+# Bump to invalidate cached power estimates after a change to the simulation
+CACHE_VERSION = 1
+
+# Historical values of the current simulation; set once per worker
+_VALUES: Dict[str, np.ndarray] = {}
+
+
+def _as_axis(values, axis, ndim):
+    """1-D array of values shaped to broadcast along one axis of an ndim grid"""
+    shape = [1] * ndim
+    shape[axis] = -1
+    return np.atleast_1d(np.asarray(values, dtype='float64')).reshape(shape)
+
+
+def sample_size_grid(baselines, mdes, alphas=0.05, powers=0.8, n_arms=2, std=None,
+                     relative: bool = True) -> pd.DataFrame:
+    """
+    Required sample sizes for every combination of design parameters
+
+    Without std the baselines are conversion rates and the two-proportion
+    formula of notebook 03 applies; with std they are metric means and the
+    normal approximation n = (z_alpha + z_beta)^2 * 2 * std^2 / delta^2 is
+    used. Designs with more than two arms compare every treatment arm with
+    one control arm at a Bonferroni-corrected alpha / (n_arms - 1).
+
+    Args:
+        baselines: Control conversion rates (or means)
+        mdes: Minimum detectable effects, relative to the baseline (or absolute
+            with relative=False)
+        alphas: Two-sided significance levels
+        powers: Target powers
+        n_arms: Numbers of arms, control included
+        std: Standard deviation of the metric, one per baseline or a scalar
+            (None: proportions)
+        relative: Treat mdes as relative lifts
+
+    Returns:
+        pd.DataFrame: One row per combination with the parameters, 'target'
+            (treatment rate or mean), 'n_per_arm' and 'n_total'; sizes are
+            missing where the effect is zero or the target rate leaves (0, 1)
+    """
+    ndim = 5
+    baseline = _as_axis(baselines, 0, ndim)
+    mde = _as_axis(mdes, 1, ndim)
+    alpha = _as_axis(alphas, 2, ndim)
+    power = _as_axis(powers, 3, ndim)
+    arms = _as_axis(n_arms, 4, ndim)
+    if (arms < 2).any():
+        raise ValueError("Experiments need at least 2 arms")
+
+    target = baseline * (1 + mde) if relative else baseline + mde
+    z_alpha = special.ndtri(1 - alpha / (arms - 1) / 2)
+    z_beta = special.ndtri(power)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if std is None:
+            p_pool = (baseline + target) / 2
+            n = ((z_alpha * np.sqrt(2 * p_pool * (1 - p_pool))
+                  + z_beta * np.sqrt(baseline * (1 - baseline) + target * (1 - target))) ** 2
+                 / (target - baseline) ** 2)
+            valid = (target > 0) & (target < 1) & (target != baseline)
+        else:
+            sigma = np.broadcast_to(np.asarray(std, dtype='float64'), np.shape(baselines) or ())
+            sigma = _as_axis(sigma, 0, ndim)
+            n = (z_alpha + z_beta) ** 2 * 2 * sigma ** 2 / (target - baseline) ** 2
+            valid = target != baseline
+    n, valid, target = np.broadcast_arrays(n, valid, target)
+
+    grid = np.meshgrid(*(np.atleast_1d(np.asarray(v, dtype='float64'))
+                         for v in (baselines, mdes, alphas, powers, n_arms)), indexing='ij')
+    result = pd.DataFrame({name: axis.ravel() for name, axis in
+                           zip(['baseline', 'mde', 'alpha', 'power', 'n_arms'], grid)})
+    result['n_arms'] = result['n_arms'].astype('int64')
+    result['target'] = target.ravel()
+    n_per_arm = np.where(valid, np.ceil(n), np.nan).ravel()
+    result['n_per_arm'] = pd.array(n_per_arm, dtype='Int64')
+    result['n_total'] = result['n_per_arm'] * result['n_arms']
+    return result
+
+
+def fingerprint_values(values) -> str:
+    """Digest of a historical metric sample (for cache keys)"""
+    return hashlib.sha1(np.ascontiguousarray(values, dtype='float64').tobytes()).hexdigest()
+
+
+class PowerCache:
+    """
+    Simulated power per design point
+
+    Keys are digests of the test, effect, sample size, alpha, number of
+    simulations, seed, batch size (it decides the spawned batch seeds) and the
+    fingerprint of the historical data, so a hit is
+    exactly the result a new simulation would give. With a path, entries are
+    loaded from and saved to a JSON file.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self.entries = {}
+        if self.path is not None and self.path.is_file():
+            with open(self.path) as f:
+                stored = json.load(f)
+            if stored.get('version') == CACHE_VERSION:
+                self.entries = stored['entries']
+
+    @staticmethod
+    def key(test, effect, n, alpha, n_simulations, seed, batch_size, data_fingerprint) -> str:
+        parts = [CACHE_VERSION, test, float(effect), int(n), float(alpha), int(n_simulations), seed,
+                 int(batch_size), data_fingerprint]
+        return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, record):
+        self.entries[key] = record
+
+    def save(self):
+        """Write the entries to the cache file (no-op for in-memory caches)"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f)
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def _init_worker(values):
+    _VALUES.clear()
+    _VALUES['values'] = values
+
+
+def _ttest_p(control, treatment):
+    """Two-sided Student t-test p-value per row"""
+    n1, n2 = control.shape[1], treatment.shape[1]
+    mean_c, mean_t = control.mean(axis=1), treatment.mean(axis=1)
+    pooled_var = ((n1 - 1) * control.var(axis=1, ddof=1) + (n2 - 1) * treatment.var(axis=1, ddof=1)) / (n1 + n2 - 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = (mean_c - mean_t) / np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+    return 2 * special.stdtr(n1 + n2 - 2, -np.abs(t_stat))
+
+
+def _mannwhitney_p(control, treatment):
+    """
+    Two-sided Mann-Whitney U p-value per row
+
+    Normal approximation with tie and continuity corrections, as
+    scipy.stats.mannwhitneyu(method='asymptotic'). Ties get average ranks,
+    computed for all rows at once from one sort.
+    """
+    size, n1 = control.shape
+    n2 = treatment.shape[1]
+    n = n1 + n2
+    pooled = np.concatenate([control, treatment], axis=1)
+    order = np.argsort(pooled, axis=1, kind='stable')
+    ordered = np.take_along_axis(pooled, order, axis=1)
+
+    # Runs of equal values are tie groups; every row starts a new group
+    new_group = np.ones(ordered.shape, dtype=bool)
+    new_group[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    flat_new_group = new_group.ravel()
+    group = np.cumsum(flat_new_group) - 1
+    starts = np.flatnonzero(flat_new_group) % n
+    sizes = np.bincount(group).astype('float64')
+    ranks = (starts + (sizes + 1) / 2)[group].reshape(size, n)
+
+    rank_sum = np.where(order < n1, ranks, 0).sum(axis=1)
+    u1 = rank_sum - n1 * (n1 + 1) / 2
+    u = np.maximum(u1, n1 * n2 - u1)
+    group_row = np.repeat(np.arange(size), new_group.sum(axis=1))
+    tie_term = np.bincount(group_row, weights=sizes ** 3 - sizes, minlength=size)
+    sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return np.minimum(2 * special.ndtr(-z), 1.0)
+
+
+def _proportion_p(control, treatment):
+    """Chi-square p-value (Yates' correction, as chi2_contingency) per row"""
+    n_c, n_t = control.shape[1], treatment.shape[1]
+    conv_c, conv_t = control.sum(axis=1), treatment.sum(axis=1)
+    observed = np.stack([conv_c, n_c - conv_c, conv_t, n_t - conv_t], axis=1).astype('float64')
+    conversions = conv_c + conv_t
+    total = n_c + n_t
+    expected = np.stack([n_c * conversions, n_c * (total - conversions),
+                         n_t * conversions, n_t * (total - conversions)], axis=1) / total
+    diff = expected - observed
+    corrected = observed + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chi2 = ((corrected - expected) ** 2 / expected).sum(axis=1)
+    return special.chdtrc(1, chi2)
+
+
+_P_VALUES = {'mannwhitney': _mannwhitney_p, 'ttest': _ttest_p, 'proportion': _proportion_p}
+
+
+def _simulate_batch(task):
+    """
+    Worker: one batch of simulated experiments for one design point
+
+    Returns:
+        tuple: (point index, number of simulations that rejected the null)
+    """
+    point, test, effect, n, alpha, size, seed = task
+    rng = np.random.default_rng(seed)
+    values = _VALUES['values']
+    index_dtype = np.int32 if len(values) < 2 ** 31 else np.int64
+
+    control = values[rng.integers(0, len(values), size=(size, n), dtype=index_dtype)]
+    if test == 'proportion':
+        # A relative lift of a conversion rate: treatment converts at rate * (1 + effect)
+        rate = min(max(values.mean() * (1 + effect), 0.0), 1.0)
+        treatment = (rng.random((size, n)) < rate).astype('float64')
+    else:
+        treatment = values[rng.integers(0, len(values), size=(size, n), dtype=index_dtype)] * (1 + effect)
+
+    p_values = _P_VALUES[test](control, treatment)
+    return point, int(np.count_nonzero(p_values < alpha))
+
+
+def _point_seed(seed, test, effect, n):
+    """SeedSequence of one design point, independent of the rest of the grid"""
+    if seed is None:
+        return np.random.SeedSequence()
+    point_key = zlib.crc32(json.dumps([test, float(effect), int(n)]).encode())
+    return np.random.SeedSequence([int(seed), point_key])
+
+
+def _run_tasks(tasks, values, n_workers):
+    if n_workers <= 1:
+        _init_worker(values)
+        try:
+            return [_simulate_batch(task) for task in tasks]
+        finally:
+            _VALUES.clear()
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(values,)) as executor:
+        return list(executor.map(_simulate_batch, tasks))
+
+
+def simulate_power(values, effects, sample_sizes, test: str = 'mannwhitney', alpha: float = 0.05,
+                   n_simulations: int = DEFAULT_SIMULATIONS, seed: Optional[int] = None, n_workers: Optional[int] = 1,
+                   cache: Optional[PowerCache] = None,
+                   max_batch_elements: int = MAX_BATCH_ELEMENTS) -> pd.DataFrame:
+    """
+    Monte Carlo power of a two-arm test for every effect x sample size
+
+    Each simulated experiment draws n control and n treatment values with
+    replacement from the historical values and multiplies the treatment
+    values by (1 + effect). For test='proportion' the values are 0/1
+    conversions and the treatment arm converts at the historical rate times
+    (1 + effect). Power is the share of simulations with p < alpha.
+
+    Args:
+        values: Historical metric values (missing values are dropped)
+        effects: Relative effects (0.1: +10%); 0 gives the false positive rate
+        sample_sizes: Units per arm
+        test: 'mannwhitney', 'ttest' or 'proportion' (chi-square with Yates' correction)
+        alpha: Two-sided significance level
+        n_simulations: Simulated experiments per design point
+        seed: Seed of the design points' SeedSequences (None: fresh entropy, not cached)
+        n_workers: Worker processes for the simulation batches; None uses the CPU count
+        cache: Reuses and stores results per design point
+        max_batch_elements: Upper bound on simulations x pooled sample size per batch
+
+    Returns:
+        pd.DataFrame: One row per (effect, n_per_arm) with 'test', 'alpha',
+            'n_simulations', 'power' and its Monte Carlo standard error 'power_se'
+    """
+    if test not in TESTS:
+        raise ValueError(f"Unknown test '{test}' (expected one of {TESTS})")
+    n_workers = n_workers or os.cpu_count() or 1
+    values = pd.Series(np.asarray(values, dtype='float64')).dropna().to_numpy()
+    if len(values) == 0:
+        raise ValueError("No historical values to resample")
+
+    points = [(float(effect), int(n)) for effect in np.atleast_1d(effects) for n in np.atleast_1d(sample_sizes)]
+    if any(n < 2 for _, n in points):
+        raise ValueError("Sample sizes must be at least 2 per arm")
+    data_fingerprint = fingerprint_values(values) if cache is not None and seed is not None else None
+    batch_sizes = [int(max(1, max_batch_elements // (2 * n))) for _, n in points]
+    keys = [PowerCache.key(test, effect, n, alpha, n_simulations, seed, batch_size, data_fingerprint)
+            if data_fingerprint is not None else None for (effect, n), batch_size in zip(points, batch_sizes)]
+
+    rejections = np.zeros(len(points), dtype='int64')
+    cached = np.zeros(len(points), dtype=bool)
+    tasks = []
+    for i, ((effect, n), batch_size, key) in enumerate(zip(points, batch_sizes, keys)):
+        hit = cache.get(key) if key is not None else None
+        if hit is not None:
+            rejections[i] = hit['rejections']
+            cached[i] = True
+            continue
+        n_batches = -(-n_simulations // batch_size)
+        children = _point_seed(seed, test, effect, n).spawn(n_batches)
+        for b, child in enumerate(children):
+            size = min(batch_size, n_simulations - b * batch_size)
+            tasks.append((i, test, effect, n, alpha, size, child))
+
+    for point, count in _run_tasks(tasks, values, n_workers):
+        rejections[point] += count
+    logger.info("Simulated %d design point(s) in %d batch(es); %d from cache",
+                int((~cached).sum()), len(tasks), int(cached.sum()))
+
+    if cache is not None:
+        for i, key in enumerate(keys):
+            if key is not None and not cached[i]:
+                cache.put(key, {'rejections': int(rejections[i])})
+        cache.save()
+
+    power = rejections / n_simulations
+    return pd.DataFrame({
+        'test': test,
+        'effect': [effect for effect, _ in points],
+        'n_per_arm': [n for _, n in points],
+        'alpha': alpha,
+        'n_simulations': n_simulations,
+        'power': power,
+        'power_se': np.sqrt(power * (1 - power) / n_simulations),
+    })
+
+
+def sample_size_for_power(power: pd.DataFrame, target: float = 0.8) -> pd.Series:
+    """
+    Smallest simulated sample size per arm reaching the target power, per effect
+
+    Returns:
+        pd.Series: effect -> n_per_arm (missing if no simulated size reaches target)
+    """
+    reached = power[power['power'] >= target]
+    smallest = reached.groupby('effect')['n_per_arm'].min()
+    return smallest.reindex(sorted(power['effect'].unique())).astype('Int64')
@@ -0,0 +1,247 @@
+"""
+Streaming Experiment Monitor
+============================
+
+Keeps running per-arm sufficient statistics (Welford/Chan moments and
+conversion counts) so an always-on experiment can be refreshed from each new
+batch of events in O(batch) instead of re-analysing the full history. The
+state is a small table that serializes to JSON for checkpointing.
+
+Besides the fixed-horizon results of ``compare_arms`` (the same t-test,
+chi-square, Cohen's d and CIs as ``ExperimentAnalyzer.run_batch_analysis``),
+every refresh updates always-valid sequential p-values from a normal mixture
+sequential probability ratio test (mSPRT). Unlike fixed-horizon p-values they
+stay valid however often the dashboard peeks.
+
+Usage:
+    from src.experiment_monitor import ExperimentMonitor
+
+    monitor = ExperimentMonitor('pricing_experiment', ['sales', 'converted'])
+    for batch in new_event_batches:
+        monitor.update(batch)
+        results = monitor.results()   # includes 'sequential_p_value'
+    monitor.save('../data/processed/pricing_monitor.json')
+
+    monitor = ExperimentMonitor.load('../data/processed/pricing_monitor.json')
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.experiment_stats import BINARY_METRICS, summarize_arms, compare_arms
+
+STATE_VERSION = 1
+
+MOMENT_COLUMNS = ['rows', 'n', 'sum', 'mean', 'm2']
+
+
+def merge_moments(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combine two tables of per-(arm, metric) moments (Chan et al. parallel update)
+
+    Both tables are indexed by (arm, metric) and hold MOMENT_COLUMNS; the
+    result covers the union of their rows.
+    """
+    index = left.index.union(right.index)
+    a = left.reindex(index).fillna(0.0)
+    b = right.reindex(index).fillna(0.0)
+
+    n = a['n'] + b['n']
+    delta = b['mean'] - a['mean']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = (b['n'] / n).fillna(0.0)
+        correction = (delta ** 2 * a['n'] * b['n'] / n).fillna(0.0)
+
+    return pd.DataFrame({
+        'rows': a['rows'] + b['rows'],
+        'n': n,
+        'sum': a['sum'] + b['sum'],
+        'mean': a['mean'] + delta * weight,
+        'm2': a['m2'] + b['m2'] + correction,
+    }, index=index)
+
+
+def msprt_p_value(diff, variance, mixture_variance):
+    """
+    Always-valid p-value of one look from a normal-mixture SPRT
+
+    Args:
+        diff (np.ndarray): Estimated differences (treatment - control)
+        variance (np.ndarray): Variance of the estimates
+        mixture_variance (np.ndarray): Variance of the normal mixing distribution
+            over the true difference
+
+    Returns:
+        np.ndarray: min(1, 1 / likelihood ratio); a running minimum over looks
+            gives the sequential p-value
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        total = variance + mixture_variance
+        log_ratio = (0.5 * np.log(variance / total)
+                     + mixture_variance * diff ** 2 / (2 * variance * total))
+        p_value = np.minimum(1.0, np.exp(-log_ratio))
+    return np.where(np.isfinite(p_value), p_value, 1.0)
+
+
+class ExperimentMonitor:
+    """
+    Incremental experiment analyzer over per-arm running moments.
+
+    Each update merges the moments of a new batch (one grouped pass over the
+    batch) and advances the sequential p-values; results() derives the full
+    comparison table from the stored moments alone.
+    """
+
+    def __init__(self, experiment_col: str, metrics: List[str], control: Any = 'Control',
+                 binary_metrics: Optional[List[str]] = None, mixture_scale: float = 0.1):
+        """
+        Args:
+            experiment_col: Column holding the arm of each row
+            metrics: Metric columns to monitor
+            control: Label of the control arm
+            binary_metrics: Metrics tested as proportions (default: BINARY_METRICS)
+            mixture_scale: Standard deviation of the mSPRT mixing distribution in
+                units of the metric's pooled standard deviation (the effect sizes
+                the test is most sensitive to); fixed per comparison at its
+                first look
+        """
+        self.experiment_col = experiment_col
+        self.metrics = list(metrics)
+        self.control = control
+        self.binary_metrics = list(BINARY_METRICS if binary_metrics is None else binary_metrics)
+        self.mixture_scale = mixture_scale
+        self.moments = pd.DataFrame(columns=MOMENT_COLUMNS, dtype='float64',
+                                    index=pd.MultiIndex.from_arrays([[], []], names=['arm', 'metric']))
+        # Per (arm, metric): frozen mixture variance and running-minimum p-value
+        self.sequential = pd.DataFrame(columns=['mixture_variance', 'sequential_p_value'], dtype='float64',
+                                       index=pd.MultiIndex.from_arrays([[], []], names=['arm', 'metric']))
+        self.n_batches = 0
+
+    def update(self, batch: pd.DataFrame) -> 'ExperimentMonitor':
+        """
+        Merge a batch of new rows and advance the sequential p-values
+
+        Args:
+            batch: New experiment rows (same columns as the full data)
+
+        Returns:
+            The monitor itself
+        """
+        if len(batch) == 0:
+            return self
+
+        summary = summarize_arms(batch, self.experiment_col, self.metrics)
+        summary['m2'] = (summary['var'].fillna(0.0) * (summary['n'] - 1).clip(lower=0))
+        batch_moments = summary.set_index(['arm', 'metric'])[MOMENT_COLUMNS].astype('float64')
+        batch_moments.loc[batch_moments['n'] == 0, 'mean'] = 0.0
+
+        self.moments = merge_moments(self.moments, batch_moments)
+        self.n_batches += 1
+        self._advance_sequential()
+        return self
+
+    def summary(self) -> pd.DataFrame:
+        """Running statistics in the long format of summarize_arms"""
+        moments = self.moments.reset_index()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = moments['m2'] / (moments['n'] - 1)
+        return pd.DataFrame({
+            'arm': moments['arm'],
+            'metric': moments['metric'],
+            'rows': moments['rows'].astype('int64'),
+            'n': moments['n'].astype('int64'),
+            'sum': moments['sum'],
+            'mean': moments['mean'].where(moments['n'] > 0),
+            'var': variance.where(moments['n'] > 1),
+        })
+
+    def _advance_sequential(self):
+        if not (self.moments.index.get_level_values('arm') == self.control).any():
+            return
+        comparison = compare_arms(self.summary(), control=self.control,
+                                  binary_metrics=self.binary_metrics)
+        comparison = comparison.set_index(['arm', 'metric'])
+
+        diff = (comparison['treatment_mean'] - comparison['control_mean']).to_numpy()
+        n_c = comparison['control_n'].to_numpy(dtype='float64')
+        n_t = comparison['treatment_n'].to_numpy(dtype='float64')
+        se_diff = comparison['se_diff'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Per-unit variance implied by the standard error of the difference
+            unit_variance = se_diff ** 2 / (1 / n_c + 1 / n_t)
+
+        state = self.sequential.reindex(comparison.index)
+        mixture_variance = state['mixture_variance'].to_numpy()
+        unset = ~np.isfinite(mixture_variance) & np.isfinite(unit_variance) & (unit_variance > 0)
+        mixture_variance = np.where(unset, self.mixture_scale ** 2 * unit_variance, mixture_variance)
+
+        look_p = msprt_p_value(diff, se_diff ** 2, mixture_variance)
+        look_p = np.where(np.isfinite(mixture_variance), look_p, 1.0)
+        previous = state['sequential_p_value'].fillna(1.0).to_numpy()
+        self.sequential = pd.DataFrame({
+            'mixture_variance': mixture_variance,
+            'sequential_p_value': np.minimum(previous, look_p),
+        }, index=comparison.index)
+
+    def results(self, alpha: float = 0.05, equal_var: bool = True) -> pd.DataFrame:
+        """
+        Fixed-horizon comparison of every arm with the control plus sequential p-values
+
+        Returns:
+            pd.DataFrame: compare_arms output with 'sequential_p_value' and
+                'sequential_significant' columns
+        """
+        results = compare_arms(self.summary(), control=self.control, alpha=alpha,
+                               binary_metrics=self.binary_metrics, equal_var=equal_var)
+        sequential = self.sequential['sequential_p_value']
+        keys = pd.MultiIndex.from_arrays([results['arm'], results['metric']])
+        results['sequential_p_value'] = sequential.reindex(keys).fillna(1.0).to_numpy()
+        results['sequential_significant'] = results['sequential_p_value'] < alpha
+        return results
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state (arm labels must be JSON-serializable)"""
+        return {
+            'version': STATE_VERSION,
+            'experiment_col': self.experiment_col,
+            'metrics': self.metrics,
+            'control': self.control,
+            'binary_metrics': self.binary_metrics,
+            'mixture_scale': self.mixture_scale,
+            'n_batches': self.n_batches,
+            'moments': self.moments.reset_index().to_dict(orient='records'),
+            'sequential': self.sequential.reset_index().to_dict(orient='records'),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'ExperimentMonitor':
+        """Rebuild a monitor from ``to_dict`` output"""
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported monitor state version {state.get('version')}")
+        monitor = cls(state['experiment_col'], state['metrics'], state['control'],
+                      state['binary_metrics'], state['mixture_scale'])
+        monitor.n_batches = state['n_batches']
+        if state['moments']:
+            monitor.moments = (pd.DataFrame(state['moments']).set_index(['arm', 'metric'])
+                               [MOMENT_COLUMNS].astype('float64'))
+        if state['sequential']:
+            monitor.sequential = (pd.DataFrame(state['sequential']).set_index(['arm', 'metric'])
+                                  .astype('float64'))
+        return monitor
+
+    def save(self, filepath):
+        """Checkpoint the state to a JSON file"""
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f, default=float)
+
+    @classmethod
+    def load(cls, filepath) -> 'ExperimentMonitor':
+        """Restore a monitor checkpointed with ``save``"""
+        with open(filepath) as f:
+            return cls.from_dict(json.load(f))
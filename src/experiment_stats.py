@@ -0,0 +1,243 @@
+"""
+Experiment Statistics Core
+==========================
+
+The vectorized arm comparisons behind ``ExperimentAnalyzer`` and the streaming
+experiment monitor: one grouped pass for per-arm sufficient statistics, tests
+of every arm against the control computed from them, multiple-testing
+corrections and per-segment breakdowns.
+
+Only numpy, pandas and scipy.special are imported (the distribution tails come
+from scipy.special rather than scipy.stats), so batch jobs and worker
+processes that just need the statistics start quickly. ``src.experimentation``
+re-exports everything here.
+
+Usage:
+    from src.experiment_stats import summarize_arms, compare_arms
+
+    summary = summarize_arms(df, 'pricing_experiment', ['sales', 'converted'])
+    results = compare_arms(summary, control='Control')
+"""
+
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import special
+
+# Metrics analysed as conversions (chi-square on proportions) rather than means
+BINARY_METRICS = ['converted']
+
+# Rows used to pick the per-metric shift that keeps sums of squares well conditioned
+SHIFT_SAMPLE_SIZE = 1000
+
+
+def summarize_arms(df: pd.DataFrame, experiment_col: str, metrics: List[str],
+                   by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Sufficient statistics of every metric for every arm in one grouped pass
+    
+    Counts, sums and sums of squares are accumulated by a single groupby over
+    the (optional) segment columns plus the experiment column. Values are
+    shifted by a per-metric pilot mean first, so the variance computed from
+    the sums of squares does not lose precision on large-valued metrics.
+    
+    Args:
+        df: Experiment data, one row per unit
+        experiment_col: Column holding the arm of each row
+        metrics: Metric columns to summarize
+        by: Optional segment columns; statistics are computed per cell and arm
+    
+    Returns:
+        Long-format DataFrame with one row per (segment cell,) arm and metric and
+        columns [*by, 'arm', 'metric', 'rows', 'n', 'sum', 'mean', 'var'], where
+        rows counts all units and n the non-missing values of the metric
+    """
+    keys = list(by or []) + [experiment_col]
+    values = df[metrics].astype('float64')
+    shift = values.iloc[:SHIFT_SAMPLE_SIZE].mean().fillna(0.0)
+    centered = values - shift
+    
+    frame = pd.concat({'n': values.notna(), 'sum': centered, 'sum_sq': centered ** 2}, axis=1)
+    frame[('rows', '')] = 1
+    grouped = frame.groupby([df[key] for key in keys], observed=True, sort=True).sum()
+    grouped.index.names = list(by or []) + ['arm']
+    
+    blocks = []
+    for metric in metrics:
+        n = grouped[('n', metric)].to_numpy(dtype='float64')
+        centered_sum = grouped[('sum', metric)].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centered_mean = centered_sum / n
+            var = (grouped[('sum_sq', metric)].to_numpy() - centered_sum * centered_mean) / (n - 1)
+        blocks.append(pd.DataFrame({
+            'metric': metric,
+            'rows': grouped[('rows', '')].to_numpy(),
+            'n': n.astype('int64'),
+            'sum': centered_sum + shift[metric] * n,
+            'mean': centered_mean + shift[metric],
+            'var': np.maximum(var, 0.0),
+        }, index=grouped.index))
+    
+    return pd.concat(blocks).reset_index()
+
+
+def compare_arms(summary: pd.DataFrame, control: Any = 'Control', alpha: float = 0.05,
+                 binary_metrics: Optional[List[str]] = None, equal_var: bool = True,
+                 by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Vectorized tests of every arm against the control arm from summary statistics
+    
+    Continuous metrics get a two-sample t-test (Student's, or Welch's with
+    equal_var=False), Cohen's d on the pooled standard deviation and a normal
+    CI for the difference in means. Binary metrics get a chi-square test on
+    the 2x2 table with Yates' correction (as chi2_contingency) and a CI for
+    the difference in rates. As with ttest_ind(control, treatment), the t
+    statistic is positive when the control mean is higher.
+    
+    Args:
+        summary: Output of summarize_arms (or any table with the same columns)
+        control: Label of the control arm
+        alpha: Significance level for 'significant' and the CIs
+        binary_metrics: Metrics to test as proportions (default: BINARY_METRICS)
+        equal_var: Pooled-variance t-test; False uses Welch's t-test
+        by: Segment columns present in summary
+    
+    Returns:
+        Tidy DataFrame with one row per (segment cell,) metric and non-control arm
+    """
+    by = list(by or [])
+    binary_metrics = BINARY_METRICS if binary_metrics is None else binary_metrics
+    if not (summary['arm'] == control).any():
+        raise ValueError(f"Control arm '{control}' not found in experiment data")
+    
+    control_rows = summary[summary['arm'] == control].drop(columns='arm')
+    merged = summary[summary['arm'] != control].merge(
+        control_rows, on=by + ['metric'], suffixes=('_t', '_c'))
+    
+    binary = merged['metric'].isin(binary_metrics).to_numpy()
+    # Proportions use every unit of the arm; means use the non-missing values
+    n_c = np.where(binary, merged['rows_c'], merged['n_c']).astype('float64')
+    n_t = np.where(binary, merged['rows_t'], merged['n_t']).astype('float64')
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_c = np.where(binary, merged['sum_c'] / n_c, merged['mean_c'])
+        mean_t = np.where(binary, merged['sum_t'] / n_t, merged['mean_t'])
+        var_c = np.where(binary, mean_c * (1 - mean_c), merged['var_c'])
+        var_t = np.where(binary, mean_t * (1 - mean_t), merged['var_t'])
+        
+        # Continuous: t-test and Cohen's d
+        dof_pooled = n_c + n_t - 2
+        pooled_var = ((n_c - 1) * merged['var_c'].to_numpy() + (n_t - 1) * merged['var_t'].to_numpy()) / dof_pooled
+        if equal_var:
+            t_se = np.sqrt(pooled_var * (1 / n_c + 1 / n_t))
+            t_dof = dof_pooled
+        else:
+            vn_c, vn_t = merged['var_c'].to_numpy() / n_c, merged['var_t'].to_numpy() / n_t
+            t_se = np.sqrt(vn_c + vn_t)
+            t_dof = (vn_c + vn_t) ** 2 / (vn_c ** 2 / (n_c - 1) + vn_t ** 2 / (n_t - 1))
+        t_stat = (mean_c - mean_t) / t_se
+        t_p = 2 * special.stdtr(t_dof, -np.abs(t_stat))
+        cohens_d = (mean_t - mean_c) / np.sqrt(pooled_var)
+        
+        # Binary: chi-square on [[conv_c, non_c], [conv_t, non_t]] with Yates' correction
+        observed = np.stack([merged['sum_c'], n_c - merged['sum_c'],
+                             merged['sum_t'], n_t - merged['sum_t']], axis=1)
+        total = n_c + n_t
+        conversions = observed[:, 0] + observed[:, 2]
+        expected = np.stack([n_c * conversions, n_c * (total - conversions),
+                             n_t * conversions, n_t * (total - conversions)], axis=1) / total[:, None]
+        diff = expected - observed
+        corrected = observed + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+        chi2 = ((corrected - expected) ** 2 / expected).sum(axis=1)
+        chi2_p = special.chdtrc(1, chi2)
+        
+        z = special.ndtri(1 - alpha / 2)
+        se_diff = np.sqrt(var_c / n_c + var_t / n_t)
+        lift = (mean_t - mean_c) / mean_c * 100
+    
+    p_value = np.where(binary, chi2_p, t_p)
+    results = merged[by + ['metric', 'arm']].copy()
+    results['test_type'] = np.where(binary, 'Chi-square', 'T-test' if equal_var else 'Welch T-test')
+    results['statistic'] = np.where(binary, chi2, t_stat)
+    results['p_value'] = p_value
+    results['significant'] = p_value < alpha
+    results['control_mean'] = mean_c
+    results['treatment_mean'] = mean_t
+    results['lift'] = lift
+    results['cohens_d'] = np.where(binary, np.nan, cohens_d)
+    results['se_diff'] = se_diff
+    results['ci_lower'] = (mean_t - mean_c) - z * se_diff
+    results['ci_upper'] = (mean_t - mean_c) + z * se_diff
+    results['control_n'] = n_c.astype('int64')
+    results['treatment_n'] = n_t.astype('int64')
+    return results
+
+
+def adjust_p_values(p_values, method: str = 'holm') -> np.ndarray:
+    """
+    Multiple-testing adjusted p-values
+    
+    Args:
+        p_values: P-values of one family of tests; NaN entries are left out of
+            the family and stay NaN
+        method: 'holm' (family-wise error rate) or 'bh' (Benjamini-Hochberg
+            false discovery rate)
+    
+    Returns:
+        Adjusted p-values in the input order
+    """
+    p_values = np.asarray(p_values, dtype='float64')
+    adjusted = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    
+    order = valid[np.argsort(p_values[valid], kind='stable')]
+    ranked = p_values[order]
+    rank = np.arange(1, m + 1)
+    if method == 'holm':
+        stepped = np.maximum.accumulate((m - rank + 1) * ranked)
+    elif method == 'bh':
+        stepped = np.minimum.accumulate((m / rank * ranked)[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown correction method '{method}' (expected 'holm' or 'bh')")
+    adjusted[order] = np.minimum(stepped, 1.0)
+    return adjusted
+
+
+def segment_breakdown(df: pd.DataFrame, experiment_col: str, metrics: List[str], segments: List[str],
+                      control: Any = 'Control', alpha: float = 0.05, correction: str = 'holm',
+                      binary_metrics: Optional[List[str]] = None, equal_var: bool = True) -> pd.DataFrame:
+    """
+    Compare every arm with the control inside every segment cell
+    
+    Cells are the combinations of the segment columns present in the data.
+    Statistics for all cells, arms and metrics come from one groupby over
+    segments + experiment column, so the cost grows with the rows rather
+    than rows x cells. P-values are adjusted across all cells and arms of
+    each metric (one family per metric); cells without a control group are
+    omitted.
+    
+    Returns:
+        Tidy DataFrame: segment columns, metric, arm, the compare_arms columns,
+            'p_value_adjusted' and 'significant_adjusted'
+    """
+    segments = list(segments)
+    summary = summarize_arms(df, experiment_col, metrics, by=segments)
+    results = compare_arms(summary, control=control, alpha=alpha, binary_metrics=binary_metrics,
+                           equal_var=equal_var, by=segments)
+    
+    adjusted = np.full(len(results), np.nan)
+    for metric in metrics:
+        family = np.flatnonzero((results['metric'] == metric).to_numpy())
+        adjusted[family] = adjust_p_values(results['p_value'].to_numpy()[family], correction)
+    results['p_value_adjusted'] = adjusted
+    results['significant_adjusted'] = adjusted < alpha
+    
+    # Group the table by metric, then cell, then arm
+    results['metric'] = pd.Categorical(results['metric'], categories=list(dict.fromkeys(metrics)))
+    results = results.sort_values(['metric'] + segments + ['arm'], kind='stable').reset_index(drop=True)
+    results['metric'] = results['metric'].astype(object)
+    return results
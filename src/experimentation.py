@@ -1,40 +1,65 @@
-
 """
 A/B Testing Framework for Product Experiments
 ===========================================
 
 This module provides a comprehensive framework for designing, running, and analyzing
 A/B tests and product experiments. It includes statistical testing, effect size
-calculations, confidence intervals, and visualization capabilities.
+calculations and confidence intervals.
+
+The vectorized statistics live in src.experiment_stats and are re-exported
+here. Importing this module is cheap: scipy.stats is loaded when a per-metric
+test first runs, and the plotting backends (plt, sns, px, go, make_subplots)
+are module attributes that import on first access.
 
 Usage:
     from src.experimentation import ExperimentAnalyzer
     
     analyzer = ExperimentAnalyzer(df)
-    results = analyzer.run_experiment('pricing_test', 'treatment_group', ['conversion_rate', 'revenue'])
-    analyzer.generate_report()
+    results = analyzer.run_experiment_analysis('pricing_test', ['conversion_rate', 'revenue'])
+    
+    # All metrics and arms (vs 'Control') from one grouped pass
+    batch_results = analyzer.run_batch_analysis('pricing_test', ['revenue', 'converted'])
+    
+    # Per region x industry cell, Holm-corrected across cells
+    breakdown = analyzer.run_segment_breakdown('pricing_test', ['revenue'], ['Region', 'Industry'])
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
-from scipy.stats import chi2_contingency, mannwhitneyu, ttest_ind, normaltest
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from typing import Dict, List, Tuple, Optional, Any
-import warnings
-from datetime import datetime, timedelta
+import importlib
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+import numpy as np
+
+from src.experiment_stats import (
+    BINARY_METRICS,
+    SHIFT_SAMPLE_SIZE,
+    adjust_p_values,
+    compare_arms,
+    segment_breakdown,
+    summarize_arms,
+)
+
 logger = logging.getLogger(__name__)
 
-# Suppress warnings for cleaner output
-warnings.filterwarnings('ignore')
+# Plotting backends, imported on first attribute access (see __getattr__)
+_LAZY_ATTRIBUTES = {
+    'plt': ('matplotlib.pyplot', None),
+    'sns': ('seaborn', None),
+    'px': ('plotly.express', None),
+    'go': ('plotly.graph_objects', None),
+    'make_subplots': ('plotly.subplots', 'make_subplots'),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = importlib.import_module(module_name)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
 
 class ExperimentAnalyzer:
     """
@@ -52,10 +77,12 @@ class ExperimentAnalyzer:
     def __init__(self, df):
         self.df = df
         self.results = {}
+        self.batch_results = {}
 
 
     def statistical_significance_test(self, metric, experiment_col, alpha=0.05):
         """Perform statistical significance testing"""
+        from scipy.stats import mannwhitneyu, normaltest, ttest_ind
         
         control_data = self.df[self.df[experiment_col] == 'Control'][metric].dropna()
         treatment_data = self.df[self.df[experiment_col] == 'Treatment'][metric].dropna()
@@ -109,6 +136,7 @@ class ExperimentAnalyzer:
     
     def proportion_test(self, metric, experiment_col, alpha=0.05):
         """Test for proportions (conversion rates)"""
+        from scipy.stats import chi2_contingency
         
         control_data = self.df[self.df[experiment_col] == 'Control']
         treatment_data = self.df[self.df[experiment_col] == 'Treatment']
@@ -154,7 +182,7 @@ class ExperimentAnalyzer:
         results = {}
         
         for metric in metrics:
-            if metric in ['converted']:
+            if metric in BINARY_METRICS:
                 # Proportion test for binary metrics
                 results[metric] = self.proportion_test(metric, experiment_col)
             else:
@@ -162,4 +190,56 @@ class ExperimentAnalyzer:
                 results[metric] = self.statistical_significance_test(metric, experiment_col)
         
         self.results[experiment_col] = results
-        return results
\ No newline at end of file
+        return results
+    
+    def run_batch_analysis(self, experiment_col, metrics, control='Control', alpha=0.05,
+                           binary_metrics=None, equal_var=True):
+        """
+        Analyse all metrics and all arms from one grouped pass over the data
+        
+        Sufficient statistics for every metric and arm come from a single
+        groupby (summarize_arms); the tests are then vectorized across metrics
+        and arms (compare_arms). Every non-control arm is compared with the
+        control, so experiments may have more than two arms. Continuous metrics
+        always use the t-test here: the normality check and Mann-Whitney
+        fallback of statistical_significance_test need the raw values.
+        
+        Returns:
+            pd.DataFrame: Tidy results, one row per metric and non-control arm
+        """
+        summary = summarize_arms(self.df, experiment_col, metrics)
+        results = compare_arms(summary, control=control, alpha=alpha,
+                               binary_metrics=binary_metrics, equal_var=equal_var)
+        self.batch_results[experiment_col] = results
+        return results
+    
+    def run_segment_breakdown(self, experiment_col, metrics, segments, control='Control', alpha=0.05,
+                              correction='holm', binary_metrics=None, equal_var=True):
+        """
+        Per-segment experiment results (e.g. by Region, Industry, Segment, Product)
+        
+        One grouped pass computes every cell and arm; p-values are corrected
+        across cells with Holm ('holm') or Benjamini-Hochberg ('bh').
+        
+        Returns:
+            pd.DataFrame: Tidy results, one row per cell, metric and non-control arm
+        """
+        return segment_breakdown(self.df, experiment_col, metrics, segments, control=control, alpha=alpha,
+                                 correction=correction, binary_metrics=binary_metrics, equal_var=equal_var)
+    
+    def run_resampling_analysis(self, experiment_col, metrics, control='Control', n_resamples=10000,
+                                n_permutations=10000, alpha=0.05, seed=None, n_workers=1):
+        """
+        Bootstrap percentile/BCa CIs for lift and permutation p-values
+        
+        Non-parametric inference for skewed metrics such as revenue; see
+        src.resampling for how resamples are batched and parallelized.
+        
+        Returns:
+            pd.DataFrame: One row per metric and non-control arm
+        """
+        from src.resampling import resample_experiment
+        
+        return resample_experiment(self.df, experiment_col, metrics, control=control,
+                                   n_resamples=n_resamples, n_permutations=n_permutations,
+                                   alpha=alpha, seed=seed, n_workers=n_workers)
@@ -0,0 +1,287 @@
+"""
+Incremental Feature Refresh
+===========================
+
+Persists the per-customer partial aggregates of ``src.streaming`` together with
+an order-date high-water mark. A refresh only aggregates rows dated after the
+watermark, merges them into the stored partials and recomputes features for
+the customers those rows touch. Every other customer keeps its stored features
+and only has ``recency_days`` shifted by the number of days the reference date
+moved, so a nightly refresh scales with the new rows instead of the history.
+
+Usage:
+    from src.incremental import FeatureStore
+
+    store = FeatureStore.build('../data/raw/saas_sales.csv', '../data/processed/feature_store')
+
+    # Or keep HyperLogLog sketches instead of exact distinct values
+    store = FeatureStore.build('../data/raw/saas_sales.csv', '../data/processed/feature_store',
+                               distinct_precision=12)
+
+    # Nightly: merge the rows added since the last run
+    store = FeatureStore.load('../data/processed/feature_store')
+    customer_features = store.refresh('../data/raw/saas_sales.csv')
+    store.save()
+
+Notes:
+    Rows are selected strictly after the watermark date, so late-arriving rows
+    dated on or before it (and rows without a date) are not picked up; a full
+    ``build`` reconciles them. Median fill values for missing numeric values
+    are frozen at build time.
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from src.columnar import write_columnar, read_columnar
+from src.data_processing import (
+    standardize_column_names,
+    drop_uninformative_columns,
+    add_ratio_metrics,
+    final_data_cleanup,
+    pipeline_logging,
+)
+from src.sketches import GroupedHLL
+from src.streaming import (
+    CustomerAggregates,
+    build_customer_aggregates,
+    clean_chunk,
+    compute_column_medians,
+    iter_rows_after,
+)
+
+logger = logging.getLogger(__name__)
+
+METADATA_NAME = 'metadata.json'
+
+
+class FeatureStore:
+    """
+    On-disk per-customer partial aggregates with an order-date watermark.
+
+    Alongside the aggregates the store keeps the unpruned feature table and the
+    RFM table (last transaction date, frequency, recency) so untouched
+    customers never have to be recomputed.
+    """
+
+    def __init__(self, directory, aggregates, column_mapping, raw_names, fill_values,
+                 watermark, base_features, customer_rfm):
+        self.directory = Path(directory)
+        self.aggregates = aggregates
+        self.column_mapping = column_mapping
+        self.raw_names = raw_names
+        self.fill_values = fill_values
+        self.watermark = watermark
+        self.base_features = base_features
+        self.customer_rfm = customer_rfm
+
+    @classmethod
+    def build(cls, filepath, directory, chunksize=100000, verbose=True, distinct_precision=None,
+              **read_csv_kwargs):
+        """
+        Full build: stream the whole history into a new store and save it
+
+        Args:
+            filepath (str): Raw transactions CSV
+            directory (str): Store directory (replaced if it exists)
+            chunksize (int): Raw rows per chunk
+            verbose (bool): Print progress (see ``pipeline_logging``)
+            distinct_precision (int): Keep HyperLogLog sketches of this precision
+                for ``nunique`` features instead of exact distinct values
+            **read_csv_kwargs: Extra keyword arguments forwarded to ``pd.read_csv``
+
+        Returns:
+            FeatureStore: The saved store
+        """
+        with pipeline_logging(verbose):
+            return cls._build(filepath, directory, chunksize, distinct_precision, read_csv_kwargs)
+
+    @classmethod
+    def _build(cls, filepath, directory, chunksize, distinct_precision, read_csv_kwargs):
+        aggregates, column_mapping, raw_names, synthetic_id = build_customer_aggregates(
+            filepath, chunksize, distinct_precision, **read_csv_kwargs)
+        if synthetic_id:
+            raise ValueError("Incremental refresh needs a customer id column in the source data")
+        if aggregates.rfm_col is None:
+            raise ValueError("Incremental refresh needs a date column for the watermark")
+
+        fill_values = {}
+        missing_cols = aggregates.columns_with_missing_values()
+        if missing_cols:
+            fill_values = compute_column_medians(filepath, raw_names, aggregates.customer_id_col,
+                                                 missing_cols, chunksize, read_csv_kwargs)
+
+        customer_rfm, watermark = aggregates.rfm_frame()
+        customer_rfm['recency_days'] = (watermark - customer_rfm['last_transaction_date']).dt.days
+
+        store = cls(directory, aggregates, column_mapping, raw_names, fill_values, watermark,
+                    aggregates.feature_table(fill_values), customer_rfm)
+        store.save()
+        logger.info("Feature store built at %s (watermark %s)", store.directory, watermark.date())
+        return store
+
+    def _new_rows(self, source, chunksize, read_csv_kwargs):
+        """Yield cleaned rows dated after the watermark from a CSV path or dataframe"""
+        date_column = self.raw_names[self.aggregates.rfm_col]
+        for rows in iter_rows_after(source, date_column, self.watermark, chunksize, read_csv_kwargs):
+            standardized = standardize_column_names(rows)
+            new_rows, _ = clean_chunk(standardized, self.aggregates.customer_id_col)
+            if len(new_rows):
+                yield new_rows
+
+    def refresh(self, source, chunksize=100000, verbose=True, **read_csv_kwargs):
+        """
+        Merge rows dated after the watermark and return refreshed customer features
+
+        Args:
+            source (str or pd.DataFrame): Raw transactions CSV (only rows after the
+                watermark are used) or a dataframe of new raw rows
+            chunksize (int): Raw rows per chunk when reading a CSV
+            verbose (bool): Print progress (see ``pipeline_logging``)
+            **read_csv_kwargs: Extra keyword arguments forwarded to ``pd.read_csv``
+
+        Returns:
+            pd.DataFrame: Customer features for all customers
+        """
+        with pipeline_logging(verbose):
+            return self._refresh(source, chunksize, read_csv_kwargs)
+
+    def _refresh(self, source, chunksize, read_csv_kwargs):
+        aggregates = self.aggregates
+        customer_id_col = aggregates.customer_id_col
+
+        new = None
+        for rows in self._new_rows(source, chunksize, read_csv_kwargs):
+            part = CustomerAggregates.from_frame(rows, customer_id_col, aggregates.agg_dict,
+                                                 aggregates.column_kinds, aggregates.rfm_col,
+                                                 aggregates.distinct_precision)
+            new = part if new is None else new.merge(part)
+
+        if new is None:
+            logger.info("No rows after watermark %s; features unchanged", self.watermark.date())
+            return self.customer_features()
+
+        touched = new.moments.index
+        aggregates.merge(new)
+
+        previous_watermark = self.watermark
+        self.watermark = max(previous_watermark, new.moments[(aggregates.rfm_col, 'max')].max())
+
+        # Recompute only the touched customers' features
+        touched_features = aggregates.feature_table(self.fill_values, customer_ids=touched)
+        self.base_features = self._replace_rows(self.base_features, touched_features)
+
+        # Untouched customers: shift recency by how far the reference date moved
+        shift_days = (self.watermark - previous_watermark).days
+        customer_rfm = self.customer_rfm.copy()
+        customer_rfm['recency_days'] += shift_days
+        touched_rfm, _ = aggregates.rfm_frame(customer_ids=touched)
+        touched_rfm['recency_days'] = (self.watermark - touched_rfm['last_transaction_date']).dt.days
+        self.customer_rfm = self._replace_rows(customer_rfm, touched_rfm)
+
+        logger.info("Merged %d new rows for %d customers (watermark %s -> %s)",
+                    new.n_rows, len(touched), previous_watermark.date(), self.watermark.date())
+        return self.customer_features()
+
+    def _replace_rows(self, table, rows):
+        """Replace (or add) the customers in ``rows``, keeping the table sorted by id"""
+        customer_id_col = self.aggregates.customer_id_col
+        table = table.set_index(customer_id_col)
+        rows = rows.set_index(customer_id_col)
+        table = pd.concat([table.drop(rows.index, errors='ignore'), rows]).sort_index()
+        return table.reset_index()
+
+    def customer_features(self):
+        """
+        Final customer features, as ``process_data`` computes them on the same
+        rows except for missing values: those are filled with the medians frozen
+        at build time (see the module Notes), so they can differ after refreshes
+        """
+        customer_id_col = self.aggregates.customer_id_col
+        customer_features = drop_uninformative_columns(self.base_features.copy(), customer_id_col)
+        customer_features = add_ratio_metrics(customer_features, customer_id_col)
+
+        # base_features and customer_rfm are both kept sorted by customer id
+        customer_features['recency_days'] = self.customer_rfm['recency_days'].to_numpy()
+        customer_features['frequency'] = self.customer_rfm['frequency'].to_numpy()
+
+        return final_data_cleanup(customer_features, customer_id_col)
+
+    def save(self):
+        """
+        Write the store to its directory
+
+        The new state is written next to the old one and swapped in afterwards,
+        so an interrupted save never leaves a half-written store behind.
+        """
+        aggregates = self.aggregates
+        staging = self.directory.with_name(self.directory.name + '.tmp')
+        if staging.exists():
+            shutil.rmtree(staging)
+
+        moments = aggregates.moments.copy()
+        moments.columns = [f"{col}|{stat}" for col, stat in moments.columns]
+        write_columnar(moments.reset_index(), staging / 'moments')
+        for i, (col, pairs) in enumerate(aggregates.distinct.items()):
+            if isinstance(pairs, GroupedHLL):
+                pairs = pairs.entries
+            write_columnar(pairs, staging / f"distinct_{i}")
+        write_columnar(self.base_features, staging / 'features')
+        write_columnar(self.customer_rfm, staging / 'rfm')
+
+        metadata = {
+            'customer_id_col': aggregates.customer_id_col,
+            'agg_dict': aggregates.agg_dict,
+            'column_kinds': aggregates.column_kinds,
+            'rfm_col': aggregates.rfm_col,
+            'distinct_columns': list(aggregates.distinct),
+            'distinct_precision': aggregates.distinct_precision,
+            'n_rows': aggregates.n_rows,
+            'column_mapping': self.column_mapping,
+            'raw_names': self.raw_names,
+            'fill_values': self.fill_values,
+            'watermark': self.watermark.isoformat(),
+        }
+        with open(staging / METADATA_NAME, 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+        previous = self.directory.with_name(self.directory.name + '.old')
+        if self.directory.exists():
+            self.directory.rename(previous)
+        staging.rename(self.directory)
+        if previous.exists():
+            shutil.rmtree(previous)
+
+    @classmethod
+    def load(cls, directory):
+        """Load a store written by ``save``"""
+        directory = Path(directory)
+        with open(directory / METADATA_NAME) as f:
+            metadata = json.load(f)
+
+        customer_id_col = metadata['customer_id_col']
+        distinct_precision = metadata.get('distinct_precision')
+        aggregates = CustomerAggregates(customer_id_col, metadata['agg_dict'],
+                                        metadata['column_kinds'], metadata['rfm_col'],
+                                        distinct_precision)
+        aggregates.n_rows = metadata['n_rows']
+
+        # Stores are small (one row per customer): load copies rather than
+        # keeping the files mapped, so the directory can be rewritten later
+        moments = read_columnar(directory / 'moments').copy().set_index(customer_id_col)
+        moments.columns = pd.MultiIndex.from_tuples([tuple(col.rsplit('|', 1)) for col in moments.columns])
+        aggregates.moments = moments
+        for i, col in enumerate(metadata['distinct_columns']):
+            pairs = read_columnar(directory / f"distinct_{i}").copy()
+            if distinct_precision is not None:
+                pairs = GroupedHLL(pairs, distinct_precision)
+            aggregates.distinct[col] = pairs
+
+        return cls(directory, aggregates, metadata['column_mapping'], metadata['raw_names'],
+                   metadata['fill_values'], pd.Timestamp(metadata['watermark']),
+                   read_columnar(directory / 'features').copy(),
+                   read_columnar(directory / 'rfm').copy())
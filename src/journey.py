@@ -0,0 +1,202 @@
+"""
+Customer Journey Transitions
+============================
+
+Vectorized step transitions for customer journeys. Events are ordered once by
+customer and date (one lexsort over integer codes); every transition, its
+time-to-next and every higher-order path is then read off the sorted arrays
+with shift operations masked to stay inside each customer's group, so no
+per-customer Python loop or frame filtering is involved.
+
+Usage:
+    from src.journey import journey_transitions, stage_transition_matrix, journey_ngrams
+
+    journey_flow = journey_transitions(df, 'Customer', 'Order Date', 'lifecycle_stage', max_steps=10)
+    transition_matrix = stage_transition_matrix(journey_flow)          # row-normalized, in %
+    top_paths = journey_ngrams(df, 'Customer', 'Order Date', 'lifecycle_stage', n=3).head(10)
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+NAT_SORT_KEY = np.iinfo(np.int64).max
+
+
+def _ordered_events(df, customer_col, date_col, stage_col):
+    """
+    Sort events by customer then date (stable; missing dates last)
+
+    Returns:
+        dict: customer/stage codes and labels, int64 nanosecond dates (NaT as
+            NAT_SORT_KEY) and the 0-based step of every event within its
+            customer, all in sorted order
+    """
+    customer_codes, customers = pd.factorize(df[customer_col], sort=True)
+    stage_codes, stages = pd.factorize(df[stage_col])
+    dates = pd.to_datetime(df[date_col]).to_numpy().view('int64').copy()
+    dates[dates == np.iinfo(np.int64).min] = NAT_SORT_KEY
+
+    # Rows without a customer (code -1) sort first and are dropped
+    order = np.lexsort((dates, customer_codes))
+    order = order[customer_codes[order] >= 0]
+
+    customer_codes = customer_codes[order]
+    n_events = len(order)
+    is_start = np.ones(n_events, dtype=bool)
+    is_start[1:] = customer_codes[1:] != customer_codes[:-1]
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(n_events), 0))
+
+    return {
+        'customer_codes': customer_codes,
+        'customers': np.asarray(customers),
+        'stage_codes': stage_codes[order],
+        'stages': np.asarray(stages, dtype=object),
+        'dates': dates[order],
+        'step': np.arange(n_events) - group_start,
+    }
+
+
+def _stage_labels(codes, stages):
+    labels = np.full(len(codes), np.nan, dtype=object)
+    present = codes >= 0
+    labels[present] = stages[codes[present]]
+    return labels
+
+
+def _path_starts(events, length, max_steps):
+    """Positions where `length` consecutive events belong to one customer within the step cap"""
+    n_events = len(events['step'])
+    if n_events < length:
+        return np.array([], dtype=np.int64)
+    starts = np.arange(n_events - length + 1)
+    same_customer = events['customer_codes'][starts] == events['customer_codes'][starts + length - 1]
+    keep = same_customer
+    if max_steps is not None:
+        keep &= events['step'][starts] + length <= max_steps
+    return starts[keep]
+
+
+def journey_transitions(df: pd.DataFrame, customer_col: str, date_col: str,
+                        stage_col: str = 'lifecycle_stage',
+                        max_steps: Optional[int] = None) -> pd.DataFrame:
+    """
+    Step-by-step stage transitions of every customer's journey
+
+    Args:
+        df: Event data, one row per interaction
+        customer_col: Customer identifier column
+        date_col: Event date column
+        stage_col: Stage of the customer at each event
+        max_steps: Only use each customer's first max_steps events (None: all)
+
+    Returns:
+        pd.DataFrame: Columns ['customer', 'step', 'current_stage', 'next_stage',
+            'time_to_next'] (time_to_next in whole days), ordered by customer and step
+    """
+    events = _ordered_events(df, customer_col, date_col, stage_col)
+    starts = _path_starts(events, 2, max_steps)
+
+    dates = events['dates']
+    current, following = dates[starts], dates[starts + 1]
+    missing = (current == NAT_SORT_KEY) | (following == NAT_SORT_KEY)
+    time_to_next = np.where(missing, np.nan, (following - current) // (86400 * 10**9)).astype('float64')
+
+    return pd.DataFrame({
+        'customer': events['customers'][events['customer_codes'][starts]],
+        'step': events['step'][starts] + 1,
+        'current_stage': _stage_labels(events['stage_codes'][starts], events['stages']),
+        'next_stage': _stage_labels(events['stage_codes'][starts + 1], events['stages']),
+        'time_to_next': time_to_next,
+    })
+
+
+def stage_transition_matrix(transitions: pd.DataFrame, normalize: bool = True) -> pd.DataFrame:
+    """
+    Stage-to-stage transition matrix (as pd.crosstab of current vs next stage)
+
+    Args:
+        transitions: Output of journey_transitions
+        normalize: Row-normalize to percentages; False returns counts
+
+    Returns:
+        pd.DataFrame: current_stage x next_stage
+    """
+    current_codes, current_stages = pd.factorize(transitions['current_stage'], sort=True)
+    next_codes, next_stages = pd.factorize(transitions['next_stage'], sort=True)
+    valid = (current_codes >= 0) & (next_codes >= 0)
+
+    n_next = len(next_stages)
+    counts = np.bincount(current_codes[valid] * n_next + next_codes[valid],
+                         minlength=len(current_stages) * n_next).reshape(len(current_stages), n_next)
+    matrix = pd.DataFrame(counts, index=pd.Index(current_stages, name='current_stage'),
+                          columns=pd.Index(next_stages, name='next_stage'))
+    # Like crosstab, only keep stages that occur in a complete transition
+    matrix = matrix.loc[matrix.sum(axis=1) > 0, matrix.sum(axis=0) > 0]
+    if normalize:
+        matrix = matrix.div(matrix.sum(axis=1), axis=0) * 100
+    return matrix
+
+
+def transition_summary(transitions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count, share and time-to-next statistics of every stage transition
+
+    Returns:
+        pd.DataFrame: One row per (current_stage, next_stage) with 'count',
+            'share' (of all transitions, in %), 'mean_days_to_next' and
+            'median_days_to_next', most frequent first
+    """
+    summary = transitions.groupby(['current_stage', 'next_stage'], sort=True)['time_to_next'].agg(
+        ['size', 'mean', 'median'])
+    summary.columns = ['count', 'mean_days_to_next', 'median_days_to_next']
+    summary.insert(1, 'share', summary['count'] / summary['count'].sum() * 100)
+    return summary.sort_values('count', ascending=False, kind='stable').reset_index()
+
+
+def journey_ngrams(df: pd.DataFrame, customer_col: str, date_col: str,
+                   stage_col: str = 'lifecycle_stage', n: int = 3,
+                   max_steps: Optional[int] = None) -> pd.DataFrame:
+    """
+    Frequency of n-step stage paths (higher-order transitions)
+
+    Every window of n consecutive events of one customer (within the first
+    max_steps events) counts as one path.
+
+    Args:
+        df: Event data, one row per interaction
+        customer_col: Customer identifier column
+        date_col: Event date column
+        stage_col: Stage of the customer at each event
+        n: Path length in events (2 gives plain transitions)
+        max_steps: Only use each customer's first max_steps events (None: all)
+
+    Returns:
+        pd.DataFrame: Columns stage_1..stage_n, 'count', 'share' (in %) and
+            'customers' (distinct customers taking the path), most frequent first
+    """
+    if n < 2:
+        raise ValueError("n-gram paths need n >= 2")
+
+    events = _ordered_events(df, customer_col, date_col, stage_col)
+    starts = _path_starts(events, n, max_steps)
+    stage_cols = [f"stage_{k + 1}" for k in range(n)]
+    if len(starts) == 0:
+        return pd.DataFrame(columns=stage_cols + ['count', 'share', 'customers'])
+
+    # Row k of `paths` holds the stage codes of the k-th window
+    paths = np.stack([events['stage_codes'][starts + k] for k in range(n)], axis=1)
+    unique_paths, path_ids, counts = np.unique(paths, axis=0, return_inverse=True, return_counts=True)
+    path_ids = path_ids.reshape(-1)
+
+    customer_pairs = np.unique(np.stack([path_ids, events['customer_codes'][starts]], axis=1), axis=0)
+    customers = np.bincount(customer_pairs[:, 0], minlength=len(unique_paths))
+
+    result = pd.DataFrame({col: _stage_labels(unique_paths[:, k], events['stages'])
+                           for k, col in enumerate(stage_cols)})
+    result['count'] = counts
+    result['share'] = counts / counts.sum() * 100
+    result['customers'] = customers
+    return result.sort_values(['count'] + stage_cols, ascending=[False] + [True] * n,
+                              kind='stable').reset_index(drop=True)
@@ -0,0 +1,328 @@
+"""
+Content-Addressed Stage Cache for the Processing Pipeline
+=========================================================
+
+Lazily runs the ``process_data`` stages (standardize -> ensure customer id ->
+clean -> customer features) and stores every stage output on disk under a key
+derived from:
+
+- a fingerprint of the input (file contents or dataframe hash),
+- the resolved column mapping,
+- the stage name and parameters,
+- the key of the upstream stage and the pipeline source code.
+
+Keys are computed before any data is touched (the column mapping only needs
+the header), so a warm run looks up the final stage first and loads just its
+output. Entries are evicted least-recently-used once the cache exceeds its
+size budget.
+
+Usage:
+    from src.pipeline_cache import StageCache, process_data_cached
+
+    cache = StageCache('../data/cache', max_bytes=2 * 1024**3)
+    customer_features, column_mapping = process_data_cached('../data/raw/saas_sales.csv', cache)
+
+    cache.invalidate(stage='features')  # drop one stage
+    cache.clear()                       # drop everything
+"""
+
+import hashlib
+import importlib.util
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.columnar import write_columnar, read_columnar
+from src.data_processing import (
+    standardize_column_names,
+    create_column_mapping,
+    ensure_customer_id,
+    clean_data,
+    build_customer_features_fused,
+    create_customer_features,
+    add_derived_metrics,
+    final_data_cleanup,
+    pipeline_logging,
+    PipelineProfiler,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every existing cache entry after an incompatible change
+CACHE_VERSION = 1
+
+INDEX_NAME = 'index.json'
+
+STAGES = ['standardize', 'ensure_customer_id', 'clean', 'features']
+
+# Every module the cached stages run code from (directly or through imports)
+PIPELINE_MODULES = ['src.data_processing', 'src.columnar', 'src.parallel', 'src.streaming', 'src.sketches']
+
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def fingerprint_file(filepath, block_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    h = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint_frame(df):
+    """Hash of a dataframe's values, column names and dtypes"""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    return h.hexdigest()
+
+
+def _code_fingerprint():
+    """Hash of the pipeline source, so code changes never serve stale outputs"""
+    return _digest(*[fingerprint_file(importlib.util.find_spec(module).origin) for module in PIPELINE_MODULES])
+
+
+class StageCache:
+    """
+    Size-bounded, least-recently-used on-disk store of pipeline stage outputs.
+
+    Each entry is a directory named after its key holding dataframes in the
+    columnar format plus a JSON document for the remaining (small) outputs.
+    """
+
+    def __init__(self, directory='../data/cache', max_bytes=1024**3):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _load_index(self):
+        path = self.directory / INDEX_NAME
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_index(self, index):
+        with open(self.directory / INDEX_NAME, 'w') as f:
+            json.dump(index, f, indent=2)
+
+    def __contains__(self, key):
+        return key in self._load_index()
+
+    def get(self, key):
+        """
+        Load a cached stage output
+
+        Returns:
+            dict or None: {'frames': {name: DataFrame}, 'meta': dict}, or None on a miss
+        """
+        index = self._load_index()
+        if key not in index:
+            return None
+
+        entry_dir = self.directory / key
+        with open(entry_dir / 'meta.json') as f:
+            meta = json.load(f)
+        frames = {name: read_columnar(entry_dir / name) for name in index[key]['frames']}
+
+        index[key]['last_access'] = time.time()
+        self._save_index(index)
+        return {'frames': frames, 'meta': meta}
+
+    def put(self, key, stage, frames, meta):
+        """
+        Store a stage output and evict least-recently-used entries over budget
+
+        Outputs the columnar format cannot store are not cached (with a warning).
+
+        Args:
+            key (str): Content-derived key of the output
+            stage (str): Stage name (used by ``invalidate``)
+            frames (dict): Named dataframes to store
+            meta (dict): JSON-serializable outputs of the stage
+        """
+        entry_dir = self.directory / key
+        if entry_dir.exists():
+            shutil.rmtree(entry_dir)
+        try:
+            for name, frame in frames.items():
+                write_columnar(frame, entry_dir / name)
+        except TypeError as e:
+            # e.g. mixed-type object columns, which the columnar format rejects
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            logger.warning("Not caching stage '%s' (%s): %s", stage, key[:12], e)
+            return
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        with open(entry_dir / 'meta.json', 'w') as f:
+            json.dump(meta, f, default=str)
+
+        size = sum(path.stat().st_size for path in entry_dir.rglob('*') if path.is_file())
+        index = self._load_index()
+        index[key] = {'stage': stage, 'size': size, 'frames': list(frames), 'last_access': time.time()}
+        self._evict(index, keep=key)
+        self._save_index(index)
+
+    def _evict(self, index, keep=None):
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= index[key]['size']
+            shutil.rmtree(self.directory / key, ignore_errors=True)
+            del index[key]
+
+    def invalidate(self, stage=None, key=None):
+        """
+        Remove entries for one key, one stage, or (with no arguments) everything
+
+        Returns:
+            int: Number of entries removed
+        """
+        index = self._load_index()
+        doomed = [k for k, entry in index.items()
+                  if (key is None or k == key) and (stage is None or entry['stage'] == stage)]
+        for k in doomed:
+            shutil.rmtree(self.directory / k, ignore_errors=True)
+            del index[k]
+        self._save_index(index)
+        return len(doomed)
+
+    def clear(self):
+        """Remove every cache entry"""
+        return self.invalidate()
+
+    def size_bytes(self):
+        """Total size of all entries"""
+        return sum(entry['size'] for entry in self._load_index().values())
+
+
+def _header(source):
+    if isinstance(source, pd.DataFrame):
+        return source.head(0)
+    return pd.read_csv(source, nrows=0)
+
+
+def _resolve_column_mapping(header):
+    """Resolve the column mapping from column names only (no rows needed)"""
+    standardized = standardize_column_names(header)
+    actual_column_mapping = create_column_mapping(standardized)
+    _, actual_column_mapping = ensure_customer_id(standardized, actual_column_mapping)
+    return actual_column_mapping
+
+
+def stage_keys(source, optimize_memory=True, fused=True):
+    """
+    Compute the cache key of every stage without running any of them
+
+    Returns:
+        tuple: (keys by stage name, resolved column mapping)
+    """
+    if isinstance(source, pd.DataFrame):
+        input_fingerprint = fingerprint_frame(source)
+    else:
+        input_fingerprint = fingerprint_file(source)
+    column_mapping = _resolve_column_mapping(_header(source))
+
+    params = {
+        'standardize': {},
+        'ensure_customer_id': {},
+        'clean': {'optimize_memory': optimize_memory},
+        'features': {'fused': fused},
+    }
+
+    keys = {}
+    upstream = _digest(CACHE_VERSION, _code_fingerprint(), input_fingerprint)
+    for stage in STAGES:
+        upstream = _digest(upstream, stage, column_mapping, params[stage])
+        keys[stage] = upstream
+    return keys, column_mapping
+
+
+def process_data_cached(source, cache=None, optimize_memory=True, fused=True, verbose=True, profiler=None):
+    """
+    Cached, lazy equivalent of ``process_data``
+
+    Only the stages after the last cached one are executed; a warm run loads
+    the final features straight from the cache.
+
+    Args:
+        source (str or pd.DataFrame): Raw CSV path or raw dataframe
+        cache (StageCache): Stage cache (default: ``StageCache()``)
+        optimize_memory (bool): Passed to ``clean_data``
+        fused (bool): Use the fused aggregation plan for customer features
+        verbose (bool): Print progress (see ``pipeline_logging``)
+        profiler (PipelineProfiler): Receives metrics for every stage that runs
+            (cache hits are not stages and are not recorded)
+
+    Returns:
+        tuple: (customer_features, column_mapping)
+    """
+    with pipeline_logging(verbose):
+        return _process_data_cached(source, cache or StageCache(), optimize_memory, fused,
+                                    profiler or PipelineProfiler())
+
+
+def _build_features(df, column_mapping, date_columns, fused):
+    if fused:
+        customer_features = build_customer_features_fused(df, column_mapping, date_columns)
+    else:
+        customer_features = create_customer_features(df, column_mapping)
+        customer_features = add_derived_metrics(customer_features, df, column_mapping, date_columns)
+    return final_data_cleanup(customer_features, column_mapping['customer_id'])
+
+
+def _process_data_cached(source, cache, optimize_memory, fused, profiler):
+    keys, column_mapping = stage_keys(source, optimize_memory=optimize_memory, fused=fused)
+
+    # Walk back from the final stage to the latest cached output
+    start = 0
+    state = None
+    for i in range(len(STAGES) - 1, -1, -1):
+        state = cache.get(keys[STAGES[i]])
+        if state is not None:
+            logger.info("Cache hit for stage '%s' (%s)", STAGES[i], keys[STAGES[i]][:12])
+            start = i + 1
+            break
+
+    if start == len(STAGES):
+        return state['frames']['customer_features'], state['meta']['column_mapping']
+
+    if start == 0:
+        df = source if isinstance(source, pd.DataFrame) else pd.read_csv(source)
+    else:
+        df = state['frames']['df']
+        column_mapping = state['meta'].get('column_mapping', column_mapping)
+        date_columns = state['meta'].get('date_columns', [])
+
+    for stage in STAGES[start:]:
+        logger.info("Running stage '%s' (%s)", stage, keys[stage][:12])
+        if stage == 'standardize':
+            df = profiler.run(stage, standardize_column_names, df)
+            cache.put(keys[stage], stage, {'df': df}, {})
+        elif stage == 'ensure_customer_id':
+            df, column_mapping = profiler.run(stage, ensure_customer_id, df, create_column_mapping(df))
+            cache.put(keys[stage], stage, {'df': df}, {'column_mapping': column_mapping})
+        elif stage == 'clean':
+            df, date_columns = profiler.run(stage, clean_data, df, column_mapping,
+                                            optimize_memory=optimize_memory)
+            cache.put(keys[stage], stage, {'df': df},
+                      {'column_mapping': column_mapping, 'date_columns': date_columns})
+        elif stage == 'features':
+            customer_features = profiler.run(stage, _build_features, df, column_mapping, date_columns, fused)
+            cache.put(keys[stage], stage, {'customer_features': customer_features},
+                      {'column_mapping': column_mapping})
+
+    return customer_features, column_mapping
@@ -0,0 +1,470 @@
+"""
+Single-Pass Data Profiling
+==========================
+
+Profiles a customer feature table (or any table) in one chunked pass instead of
+the separate full passes of ``describe()``, ``isnull()``, ``duplicated()`` and
+friends, so tables larger than memory can be summarized from a CSV file or a
+columnar directory. Every column keeps a small mergeable state: counts, nulls,
+min/max, the first two moments (combined with Chan's parallel update) and, for
+numeric columns, a KLL-style quantile sketch; the ID column additionally gets a
+HyperLogLog sketch (``src.sketches``) for distinct and duplicate estimates.
+Profiles of partitions or days can be merged and saved as JSON.
+
+Quantiles are exact (and match ``describe()``) until a column outgrows the
+sketch, after which their rank error is about ``1.7 / k`` (~1% with the default
+``k=200``). The duplicate-ID count is ``rows - estimated distinct IDs``, so it
+carries the error of the distinct estimate: exact for small tables, a few
+dozen IDs at ten thousand, and about ``1.04 / sqrt(2**16)`` (0.4%) of the ID
+count for large tables.
+
+Usage:
+    from src.profiling import profile_data, DataProfile
+
+    profile = profile_data('../data/processed/customer_features', chunksize=100000)
+    profile.describe()            # like customer_features.describe(), approximate quantiles
+    profile.missing_values        # pd.Series of nulls per column
+    profile.id_stats()            # {'unique': ..., 'duplicates': ...}
+    print(profile.report())
+
+    # Combine daily profiles
+    combined = DataProfile.load('profile_day1.json').merge(DataProfile.load('profile_day2.json'))
+"""
+
+import json
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.columnar import is_columnar_dataset, read_manifest
+from src.data_processing import is_numeric_feature_dtype
+from src.segmentation import iter_feature_batches
+from src.sketches import GroupedHLL
+
+STATE_VERSION = 1
+
+DEFAULT_QUANTILE_K = 200
+DEFAULT_ID_PRECISION = 16
+DEFAULT_CHUNKSIZE = 100000
+SAMPLE_ROWS = 5
+DESCRIBE_QUANTILES = [0.25, 0.5, 0.75]
+
+# Capacity of each lower level relative to the one above it (KLL's c)
+LEVEL_DECAY = 2 / 3
+
+
+class QuantileSketch:
+    """
+    KLL-style mergeable quantile sketch over float values.
+
+    levels[h] holds items that each stand for 2**h original values. When a
+    level exceeds its capacity it is sorted and every other item (from a random
+    offset) is promoted to the level above, halving it without changing the
+    total weight. Capacities shrink geometrically towards level 0, so the
+    sketch holds O(k) items however many values it has seen.
+    """
+
+    def __init__(self, k=DEFAULT_QUANTILE_K, levels=None, seed=None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.levels = levels if levels is not None else [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def n(self):
+        """Number of values summarized"""
+        return int(sum(len(items) << level for level, items in enumerate(self.levels)))
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * LEVEL_DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so that no weight is lost
+                kept, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add an array of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Union of two sketches (returns a new QuantileSketch)"""
+        if other.k != self.k:
+            raise ValueError("Cannot merge quantile sketches with different k")
+        depth = max(len(self.levels), len(other.levels))
+        levels = [np.concatenate([sketch.levels[h] if h < len(sketch.levels) else np.empty(0)
+                                  for sketch in (self, other)])
+                  for h in range(depth)]
+        merged = QuantileSketch(self.k, levels, seed=self._rng.integers(2**32))
+        merged._compress()
+        return merged
+
+    def quantile(self, q):
+        """
+        Approximate quantiles
+
+        Args:
+            q (float or array-like): Quantile(s) in [0, 1]
+
+        Returns:
+            float or np.ndarray: NaN when the sketch is empty
+        """
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)[()]
+        if len(self.levels) == 1:
+            # Nothing compacted yet: exact, with describe()'s linear interpolation
+            return np.quantile(self.levels[0], q)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, weights = items[order], weights[order]
+        # Each item sits at the middle of the rank range it stands for
+        ranks = np.cumsum(weights) - weights / 2
+        return np.interp(q * weights.sum(), ranks, items)
+
+    def to_dict(self):
+        return {'k': self.k, 'levels': [items.tolist() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['k'], [np.asarray(items, dtype=float) for items in state['levels']])
+
+
+class ColumnProfile:
+    """
+    Mergeable summary of one column.
+
+    kind is 'numeric' (moments, min/max and quantile sketch), 'datetime'
+    (min/max as nanosecond timestamps) or 'other' (counts only).
+    """
+
+    def __init__(self, dtype, kind, count=0, nulls=0, mean=0.0, m2=0.0, minimum=None, maximum=None, sketch=None):
+        self.dtype = dtype
+        self.kind = kind
+        self.count = count
+        self.nulls = nulls
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+        self.sketch = sketch
+
+    @staticmethod
+    def column_kind(dtype):
+        if is_numeric_feature_dtype(dtype):
+            return 'numeric'
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return 'datetime'
+        return 'other'
+
+    @classmethod
+    def from_series(cls, series, k=DEFAULT_QUANTILE_K):
+        """Profile of one chunk of a column"""
+        kind = cls.column_kind(series.dtype)
+        nulls = int(series.isna().sum())
+        profile = cls(str(series.dtype), kind, count=len(series) - nulls, nulls=nulls)
+        if kind == 'numeric':
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            profile.sketch = QuantileSketch(k).update(values)
+            if len(values):
+                profile.mean = float(values.mean())
+                profile.m2 = float(((values - profile.mean) ** 2).sum())
+                profile.minimum, profile.maximum = float(values.min()), float(values.max())
+        elif kind == 'datetime' and profile.count:
+            stamps = series.dropna()
+            profile.minimum, profile.maximum = stamps.min().value, stamps.max().value
+        return profile
+
+    def merge(self, other):
+        """Combined profile of two disjoint sets of rows (returns a new ColumnProfile)"""
+        dtype, kind = self.dtype, self.kind
+        if other.dtype != dtype:
+            # e.g. int64 in one chunk and float64 (with NaNs) in another
+            dtype = str(np.result_type(self.dtype, other.dtype)) if kind == other.kind == 'numeric' else 'object'
+            kind = kind if kind == other.kind else 'other'
+        merged = ColumnProfile(dtype, kind, self.count + other.count, self.nulls + other.nulls)
+        if kind == 'other':
+            return merged
+        if kind == 'numeric' and merged.count:
+            delta = other.mean - self.mean
+            merged.mean = self.mean + delta * other.count / merged.count
+            merged.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / merged.count
+            merged.sketch = self.sketch.merge(other.sketch)
+        elif kind == 'numeric':
+            merged.sketch = self.sketch.merge(other.sketch)
+        bounds = [value for value in (self.minimum, other.minimum) if value is not None]
+        merged.minimum = min(bounds) if bounds else None
+        bounds = [value for value in (self.maximum, other.maximum) if value is not None]
+        merged.maximum = max(bounds) if bounds else None
+        return merged
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1, as describe())"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    def to_dict(self):
+        state = {key: getattr(self, key) for key in ('dtype', 'kind', 'count', 'nulls', 'mean', 'm2',
+                                                     'minimum', 'maximum')}
+        state['sketch'] = self.sketch.to_dict() if self.sketch is not None else None
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        state = dict(state)
+        sketch = state.pop('sketch')
+        return cls(**state, sketch=QuantileSketch.from_dict(sketch) if sketch is not None else None)
+
+
+class DataProfile:
+    """
+    Mergeable single-pass profile of a table: shape, dtypes, nulls, numeric
+    summaries with approximate quantiles, ID duplicates and the first rows.
+    """
+
+    def __init__(self, columns: Dict[str, ColumnProfile], n_rows=0, id_column=None, id_sketch=None, sample=None):
+        self.columns = columns
+        self.n_rows = n_rows
+        self.id_column = id_column
+        self.id_sketch = id_sketch
+        self.sample = sample if sample is not None else pd.DataFrame(columns=list(columns))
+
+    @classmethod
+    def from_frame(cls, df, id_column='customer_id', k=DEFAULT_QUANTILE_K, id_precision=DEFAULT_ID_PRECISION):
+        """
+        Profile of one chunk (or all) of a table
+
+        Args:
+            df (pd.DataFrame): Rows to profile
+            id_column (str): Column whose duplicates are estimated (ignored if absent)
+            k (int): Quantile sketch size; larger is more accurate
+            id_precision (int): log2 of the HyperLogLog registers for the ID column
+
+        Returns:
+            DataProfile
+        """
+        columns = {col: ColumnProfile.from_series(df[col], k) for col in df.columns}
+        id_sketch = None
+        if id_column is not None and id_column in df.columns:
+            id_sketch = GroupedHLL.from_values(np.zeros(len(df), dtype=np.int8), df[id_column], id_precision)
+        else:
+            id_column = None
+        return cls(columns, len(df), id_column, id_sketch, df.head(SAMPLE_ROWS).reset_index(drop=True))
+
+    def merge(self, other):
+        """
+        Profile of the rows of both profiles (returns a new DataProfile).
+        The sample keeps self's first rows, so merge in row order.
+        """
+        if list(other.columns) != list(self.columns):
+            raise ValueError("Cannot merge profiles of tables with different columns")
+        if other.id_column != self.id_column:
+            raise ValueError("Cannot merge profiles with different ID columns")
+        columns = {col: profile.merge(other.columns[col]) for col, profile in self.columns.items()}
+        id_sketch = self.id_sketch.merge(other.id_sketch) if self.id_sketch is not None else None
+        sample = self.sample
+        if len(sample) < SAMPLE_ROWS:
+            sample = pd.concat([sample, other.sample], ignore_index=True).head(SAMPLE_ROWS)
+        return DataProfile(columns, self.n_rows + other.n_rows, self.id_column, id_sketch, sample)
+
+    @property
+    def shape(self):
+        return (self.n_rows, len(self.columns))
+
+    @property
+    def dtypes(self):
+        """pd.Series of dtype names per column"""
+        return pd.Series({col: profile.dtype for col, profile in self.columns.items()}, dtype=object)
+
+    @property
+    def missing_values(self):
+        """pd.Series of null counts per column"""
+        return pd.Series({col: profile.nulls for col, profile in self.columns.items()}, dtype='int64')
+
+    def describe(self, percentiles=None):
+        """
+        Numeric column summary in the layout of pd.DataFrame.describe()
+
+        Args:
+            percentiles (list): Quantiles to report (default 25%, 50%, 75%)
+
+        Returns:
+            pd.DataFrame: Statistics as rows, numeric columns as columns
+        """
+        percentiles = DESCRIBE_QUANTILES if percentiles is None else sorted(percentiles)
+        labels = [f"{q * 100:g}%" for q in percentiles]
+        stats = {}
+        for col, profile in self.columns.items():
+            if profile.kind != 'numeric':
+                continue
+            minimum = profile.minimum if profile.minimum is not None else np.nan
+            maximum = profile.maximum if profile.maximum is not None else np.nan
+            quantiles = profile.sketch.quantile(percentiles) if profile.count else [np.nan] * len(percentiles)
+            stats[col] = [profile.count, profile.mean if profile.count else np.nan, profile.std, minimum,
+                          *quantiles, maximum]
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', *labels, 'max'], dtype=float)
+
+    def datetime_ranges(self):
+        """
+        Returns:
+            pd.DataFrame: min and max per datetime column
+        """
+        ranges = {col: [pd.Timestamp(profile.minimum) if profile.minimum is not None else pd.NaT,
+                        pd.Timestamp(profile.maximum) if profile.maximum is not None else pd.NaT]
+                  for col, profile in self.columns.items() if profile.kind == 'datetime'}
+        return pd.DataFrame(ranges, index=['min', 'max'])
+
+    def id_stats(self):
+        """
+        Estimated distinct and duplicate IDs
+
+        Returns:
+            dict: {'unique', 'duplicates'} (None if the table has no ID column)
+        """
+        if self.id_column is None:
+            return None
+        present = self.columns[self.id_column].count
+        estimate = self.id_sketch.estimate()
+        unique = min(int(round(estimate.iloc[0])), present) if len(estimate) else 0
+        return {'unique': unique, 'duplicates': present - unique}
+
+    def summary(self):
+        """
+        The get_data_summary dictionary (numeric_stats with approximate quantiles)
+
+        Returns:
+            dict: shape, columns, dtypes, missing_values, numeric_stats, id_stats, sample_data
+        """
+        summary = {
+            'shape': self.shape,
+            'columns': list(self.columns),
+            'dtypes': self.dtypes.to_dict(),
+            'missing_values': self.missing_values.to_dict(),
+        }
+        numeric_stats = self.describe()
+        if not numeric_stats.empty:
+            summary['numeric_stats'] = numeric_stats.to_dict()
+        summary['id_stats'] = self.id_stats()
+        summary['sample_data'] = self.sample.to_dict()
+        return summary
+
+    def report(self):
+        """Human-readable summary (the get_data_summary printout)"""
+        lines = ["=" * 50, "DATA PROFILE", "=" * 50,
+                 f"Dataset Shape: {self.shape}",
+                 f"Number of Rows: {self.n_rows}",
+                 f"Number of Features: {len(self.columns)}",
+                 "", "Data Types:"]
+        lines += [f"  {col}: {dtype}" for col, dtype in self.dtypes.items()]
+        lines += ["", "Missing Values:"]
+        lines += [f"  {col}: {missing} ({missing / self.n_rows * 100:.2f}%)"
+                  for col, missing in self.missing_values.items() if missing > 0]
+        numeric_stats = self.describe()
+        if not numeric_stats.empty:
+            lines += ["", "Numeric Columns Summary (approximate quantiles):", numeric_stats.to_string()]
+        ranges = self.datetime_ranges()
+        if not ranges.empty:
+            lines += ["", "Date Ranges:", ranges.to_string()]
+        id_stats = self.id_stats()
+        if id_stats is not None:
+            lines += ["", f"{self.id_column} Info (estimated):",
+                      f"  Unique IDs: {id_stats['unique']}",
+                      f"  Duplicate IDs: {id_stats['duplicates']}"]
+        lines += ["", f"Sample Data (First {SAMPLE_ROWS} Rows):", self.sample.to_string()]
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """JSON-serializable state (the sample is stored as records)"""
+        return {
+            'version': STATE_VERSION,
+            'n_rows': self.n_rows,
+            'columns': {col: profile.to_dict() for col, profile in self.columns.items()},
+            'id_column': self.id_column,
+            'id_sketch': None if self.id_sketch is None else {
+                'precision': self.id_sketch.precision,
+                'buckets': self.id_sketch.entries['bucket'].tolist(),
+                'ranks': self.id_sketch.entries['rank'].tolist(),
+            },
+            'sample': json.loads(self.sample.to_json(orient='records', date_format='iso')),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported profile state version: {state.get('version')}")
+        id_sketch = None
+        if state['id_sketch'] is not None:
+            sketch = state['id_sketch']
+            entries = pd.DataFrame({'key': np.zeros(len(sketch['buckets']), dtype=np.int8),
+                                    'bucket': np.asarray(sketch['buckets'], dtype=np.int32),
+                                    'rank': np.asarray(sketch['ranks'], dtype=np.uint8)})
+            id_sketch = GroupedHLL(entries, sketch['precision'])
+        columns = {col: ColumnProfile.from_dict(profile) for col, profile in state['columns'].items()}
+        sample = pd.DataFrame(state['sample'], columns=list(columns))
+        return cls(columns, state['n_rows'], state['id_column'], id_sketch, sample)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def _source_columns(source) -> List[str]:
+    if isinstance(source, pd.DataFrame):
+        return list(source.columns)
+    if is_columnar_dataset(source):
+        return [entry['name'] for entry in read_manifest(source)['columns']]
+    return list(pd.read_csv(source, nrows=0).columns)
+
+
+def profile_data(source, id_column: Optional[str] = 'customer_id', chunksize: int = DEFAULT_CHUNKSIZE,
+                 columns: Optional[List[str]] = None, k: int = DEFAULT_QUANTILE_K,
+                 id_precision: int = DEFAULT_ID_PRECISION) -> DataProfile:
+    """
+    Profile a table in one chunked pass
+
+    Args:
+        source: DataFrame, columnar directory (read one row range at a time) or CSV file (read in chunks)
+        id_column: Column whose distinct and duplicate values are estimated (None to skip)
+        chunksize: Rows per chunk; bounds peak memory for file sources
+        columns: Columns to profile (default: all)
+        k: Quantile sketch size; larger is more accurate
+        id_precision: log2 of the HyperLogLog registers for the ID column
+
+    Returns:
+        DataProfile
+    """
+    columns = columns if columns is not None else _source_columns(source)
+    profile = None
+    for chunk in iter_feature_batches(source, columns, chunksize):
+        chunk_profile = DataProfile.from_frame(chunk[columns], id_column, k, id_precision)
+        profile = chunk_profile if profile is None else profile.merge(chunk_profile)
+    if profile is None:
+        profile = DataProfile.from_frame(pd.DataFrame(columns=columns), id_column, k, id_precision)
+    return profile
@@ -0,0 +1,239 @@
+"""
+Bootstrap and Permutation Inference for Experiments
+===================================================
+
+Non-parametric companions to the t-test and chi-square results of
+``ExperimentAnalyzer``, for skewed metrics such as revenue. Resamples are drawn
+as batched NumPy index matrices (one row per resample), so no Python loop runs
+per resample, and batches are sized to a fixed element budget so memory stays
+bounded however many resamples are requested. Batches can be spread across a
+process pool; every batch draws from its own child of one ``SeedSequence``, so
+results are reproducible for a given seed whatever the number of workers.
+
+Reported per metric and non-control arm:
+    - lift (%) of the treatment mean over the control mean
+    - bootstrap percentile and BCa confidence intervals for the lift
+    - two-sided permutation p-value for the difference in means
+
+Usage:
+    from src.resampling import resample_experiment
+
+    results = resample_experiment(df, 'pricing_experiment', ['sales', 'converted'],
+                                  n_resamples=10000, n_permutations=10000,
+                                  seed=42, n_workers=4)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import special
+
+# Upper bound on index-matrix elements per batch (resamples x sample size)
+MAX_BATCH_ELEMENTS = 2 ** 22
+
+# Arrays of the current analysis, keyed by (metric, arm); set once per worker
+_SAMPLES: Dict[Tuple[str, Any], np.ndarray] = {}
+
+
+def _init_worker(samples):
+    _SAMPLES.clear()
+    _SAMPLES.update(samples)
+
+
+def _batch_size(sample_size, max_batch_elements):
+    return int(max(1, max_batch_elements // max(sample_size, 1)))
+
+
+def _resample_batch(task):
+    """
+    Worker: one batch of bootstrap or permutation resamples
+
+    Bootstrap batches return the resampled (control mean, treatment mean)
+    pairs; permutation batches return the permuted differences in means.
+    """
+    kind, control_key, treatment_key, size, seed = task
+    rng = np.random.default_rng(seed)
+    control = _SAMPLES[control_key]
+    treatment = _SAMPLES[treatment_key]
+    index_dtype = np.int32 if len(control) + len(treatment) < 2 ** 31 else np.int64
+
+    if kind == 'bootstrap':
+        control_means = control[rng.integers(0, len(control), size=(size, len(control)),
+                                             dtype=index_dtype)].mean(axis=1)
+        treatment_means = treatment[rng.integers(0, len(treatment), size=(size, len(treatment)),
+                                                 dtype=index_dtype)].mean(axis=1)
+        return control_means, treatment_means
+
+    # Permutation: a random subset of the pooled values (argpartition of
+    # random keys) plays the treatment arm, the rest the control arm
+    pooled = np.concatenate([control, treatment])
+    n_treatment = len(treatment)
+    keys = rng.random((size, len(pooled)))
+    treatment_idx = np.argpartition(keys, n_treatment - 1, axis=1)[:, :n_treatment]
+    treatment_sums = pooled[treatment_idx].sum(axis=1)
+    control_sums = pooled.sum() - treatment_sums
+    return treatment_sums / n_treatment - control_sums / len(control)
+
+
+def _run_tasks(tasks, samples, n_workers):
+    if n_workers <= 1:
+        _init_worker(samples)
+        try:
+            return [_resample_batch(task) for task in tasks]
+        finally:
+            _SAMPLES.clear()
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(samples,)) as executor:
+        return list(executor.map(_resample_batch, tasks))
+
+
+def _lift(control_means, treatment_means):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (treatment_means - control_means) / control_means * 100
+
+
+def _jackknife_lifts(control, treatment):
+    """Leave-one-out lifts over every observation of both arms (for BCa acceleration)"""
+    control_mean, treatment_mean = control.mean(), treatment.mean()
+    control_loo = (control.sum() - control) / (len(control) - 1)
+    treatment_loo = (treatment.sum() - treatment) / (len(treatment) - 1)
+    return np.concatenate([_lift(control_loo, treatment_mean), _lift(control_mean, treatment_loo)])
+
+
+def bca_interval(boot_stats, estimate, jackknife_stats, alpha=0.05):
+    """
+    Bias-corrected and accelerated bootstrap interval
+
+    Args:
+        boot_stats (np.ndarray): Bootstrap replicates of the statistic
+        estimate (float): Statistic on the original sample
+        jackknife_stats (np.ndarray): Leave-one-out replicates of the statistic
+        alpha (float): 1 - confidence level
+
+    Returns:
+        tuple: (lower, upper)
+    """
+    boot_stats = boot_stats[np.isfinite(boot_stats)]
+    if len(boot_stats) == 0:
+        return np.nan, np.nan
+
+    # Bias correction: share of replicates below the estimate (ties count half)
+    below = (np.sum(boot_stats < estimate) + 0.5 * np.sum(boot_stats == estimate)) / len(boot_stats)
+    z0 = special.ndtri(np.clip(below, 1 / len(boot_stats), 1 - 1 / len(boot_stats)))
+
+    deviations = jackknife_stats.mean() - jackknife_stats
+    denominator = 6 * np.sum(deviations ** 2) ** 1.5
+    acceleration = np.sum(deviations ** 3) / denominator if denominator > 0 else 0.0
+
+    z = special.ndtri([alpha / 2, 1 - alpha / 2])
+    adjusted = special.ndtr(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+    lower, upper = np.quantile(boot_stats, adjusted)
+    return lower, upper
+
+
+def resample_experiment(df: pd.DataFrame, experiment_col: str, metrics: List[str],
+                        control: Any = 'Control', n_resamples: int = 10000,
+                        n_permutations: int = 10000, alpha: float = 0.05,
+                        seed: Optional[int] = None, n_workers: int = 1,
+                        max_batch_elements: int = MAX_BATCH_ELEMENTS) -> pd.DataFrame:
+    """
+    Bootstrap CIs for lift and permutation p-values for every metric and arm
+
+    Args:
+        df: Experiment data, one row per unit
+        experiment_col: Column holding the arm of each row
+        metrics: Metric columns to analyse (missing values are dropped per metric)
+        control: Label of the control arm
+        n_resamples: Bootstrap resamples per metric and arm
+        n_permutations: Permutations per metric and arm (0 to skip the test)
+        alpha: 1 - confidence level of the intervals
+        seed: Seed of the root SeedSequence (None for fresh entropy)
+        n_workers: Worker processes; 1 runs in-process, None uses the CPU count
+        max_batch_elements: Index-matrix elements per batch, which bounds the
+            memory of each batch
+
+    Returns:
+        pd.DataFrame: One row per metric and non-control arm with the lift,
+            percentile and BCa intervals and the permutation p-value
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    arms = df[experiment_col]
+    if not (arms == control).any():
+        raise ValueError(f"Control arm '{control}' not found in experiment data")
+    treatment_arms = [arm for arm in pd.unique(arms.dropna()) if arm != control]
+
+    samples = {}
+    comparisons = []
+    for metric in metrics:
+        values = df[metric].astype('float64')
+        samples[(metric, control)] = values[arms == control].dropna().to_numpy()
+        for arm in sorted(treatment_arms, key=str):
+            samples[(metric, arm)] = values[arms == arm].dropna().to_numpy()
+            if len(samples[(metric, control)]) > 1 and len(samples[(metric, arm)]) > 1:
+                comparisons.append((metric, arm))
+
+    # One task per batch; each batch gets its own child seed
+    tasks = []
+    for metric, arm in comparisons:
+        control_key, treatment_key = (metric, control), (metric, arm)
+        n_total = len(samples[control_key]) + len(samples[treatment_key])
+        for kind, n_draws in (('bootstrap', n_resamples), ('permutation', n_permutations)):
+            batch = _batch_size(n_total, max_batch_elements)
+            for start in range(0, n_draws, batch):
+                tasks.append([kind, control_key, treatment_key, min(batch, n_draws - start)])
+    for task, child in zip(tasks, np.random.SeedSequence(seed).spawn(len(tasks))):
+        task.append(child)
+
+    outputs = _run_tasks([tuple(task) for task in tasks], samples, n_workers)
+
+    boot = {}
+    perm = {}
+    for task, output in zip(tasks, outputs):
+        key = (task[1][0], task[2][1])
+        if task[0] == 'bootstrap':
+            boot.setdefault(key, []).append(output)
+        else:
+            perm.setdefault(key, []).append(output)
+
+    rows = []
+    for metric, arm in comparisons:
+        control_values, treatment_values = samples[(metric, control)], samples[(metric, arm)]
+        lift = _lift(control_values.mean(), treatment_values.mean())
+        row = {'metric': metric, 'arm': arm, 'control_mean': control_values.mean(),
+               'treatment_mean': treatment_values.mean(), 'lift': lift}
+
+        if (metric, arm) in boot:
+            control_means = np.concatenate([means for means, _ in boot[(metric, arm)]])
+            treatment_means = np.concatenate([means for _, means in boot[(metric, arm)]])
+            boot_lifts = _lift(control_means, treatment_means)
+            finite = boot_lifts[np.isfinite(boot_lifts)]
+            row['pct_ci_lower'], row['pct_ci_upper'] = (
+                np.quantile(finite, [alpha / 2, 1 - alpha / 2]) if len(finite) else (np.nan, np.nan))
+            row['bca_ci_lower'], row['bca_ci_upper'] = bca_interval(
+                boot_lifts, lift, _jackknife_lifts(control_values, treatment_values), alpha)
+        else:
+            row.update(pct_ci_lower=np.nan, pct_ci_upper=np.nan, bca_ci_lower=np.nan, bca_ci_upper=np.nan)
+
+        if (metric, arm) in perm:
+            diffs = np.concatenate(perm[(metric, arm)])
+            observed = treatment_values.mean() - control_values.mean()
+            tolerance = 1e-12 * max(1.0, abs(observed))
+            extreme = np.sum(np.abs(diffs) >= abs(observed) - tolerance)
+            row['perm_p_value'] = (1 + extreme) / (1 + len(diffs))
+        else:
+            row['perm_p_value'] = np.nan
+
+        row['control_n'] = len(control_values)
+        row['treatment_n'] = len(treatment_values)
+        rows.append(row)
+
+    columns = ['metric', 'arm', 'control_mean', 'treatment_mean', 'lift', 'pct_ci_lower', 'pct_ci_upper',
+               'bca_ci_lower', 'bca_ci_upper', 'perm_p_value', 'control_n', 'treatment_n']
+    results = pd.DataFrame(rows, columns=columns)
+    results['n_resamples'] = n_resamples
+    results['n_permutations'] = n_permutations
+    return results
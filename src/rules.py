@@ -0,0 +1,232 @@
+"""
+Declarative Label Rules
+=======================
+
+Segment, lifecycle and strategy labels declared as ordered rules instead of
+row-wise ``apply`` functions. A ``RuleSet`` is a list of (label, conditions)
+pairs where the first matching rule wins and a default label covers the rest;
+it compiles to a single ``np.select`` over boolean column masks. A
+``ThresholdRules`` ladder on one column (``<= 30 -> 'New'``, ``<= 90 ->
+'Growing'``, ...) compiles to one binary search over the sorted thresholds,
+the same binning as ``pd.cut``. Both return object labels, like the
+functions they replace; ``categorical=True`` returns a categorical instead
+(then groupbys over it need ``observed=True`` to skip unused labels).
+
+Conditions are (column, operator, value) triples combined with AND. A value
+can be a ``Quantile`` of the column, resolved on the frame being labelled
+(the dashboard segments use quartile cut-offs). Missing values follow the
+Python comparison semantics of the original functions: NaN fails ``<``,
+``<=``, ``>``, ``>=``, ``==`` and ``in`` (unless the options hold a missing
+value) but satisfies ``!=`` and ``not in``.
+
+Usage:
+    from src.rules import JOURNEY_LIFECYCLE_STAGES, RuleSet, Quantile
+
+    df['lifecycle_stage'] = JOURNEY_LIFECYCLE_STAGES.assign(df)
+
+    rules = RuleSet([
+        ('Champions', [('revenue', '>=', Quantile(0.75)), ('engagement', '>=', Quantile(0.75))]),
+        ('At Risk', [('revenue', '<', Quantile(0.25))]),
+    ], default='Promising')
+    customer_features['customer_segment'] = rules.assign(customer_features)
+"""
+
+import operator
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Label of customers that no segmentation has covered (e.g. transactions of
+# customers missing from the segment table)
+UNASSIGNED_SEGMENT = 'Unassigned'
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'in': lambda values, options: values.isin(options),
+    'not in': lambda values, options: ~values.isin(options),
+}
+
+
+class Quantile(NamedTuple):
+    """Threshold given as a quantile of the condition's column"""
+    q: float
+
+
+Condition = Tuple[str, str, Any]
+Rule = Tuple[str, Sequence[Condition]]
+
+
+def _resolve(df, column, value, cache):
+    """Threshold value of a condition; quantiles are computed once per frame"""
+    if isinstance(value, Quantile):
+        key = (column, value.q)
+        if key not in cache:
+            cache[key] = df[column].quantile(value.q)
+        return cache[key]
+    return value
+
+
+def _labels(codes, labels, index, categorical, keep_all_labels):
+    if not categorical:
+        return pd.Series(np.asarray(labels, dtype=object)[codes], index=index)
+    labels = pd.Series(pd.Categorical.from_codes(codes, categories=labels), index=index)
+    if not keep_all_labels:
+        labels = labels.cat.remove_unused_categories()
+    return labels
+
+
+class RuleSet:
+    """
+    Ordered first-match-wins labelling rules.
+
+    Each rule is (label, conditions) with conditions a list of
+    (column, operator, value) triples that must all hold; rows matching no
+    rule get the default label. Several rules may share a label.
+    """
+
+    def __init__(self, rules: Sequence[Rule], default: str):
+        for label, conditions in rules:
+            for column, op, _ in conditions:
+                if op not in OPERATORS:
+                    raise ValueError(f"Unknown operator '{op}' in rule '{label}' "
+                                     f"(expected one of {list(OPERATORS)})")
+        self.rules = [(label, list(conditions)) for label, conditions in rules]
+        self.default = default
+        self.labels = list(dict.fromkeys([label for label, _ in self.rules] + [default]))
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns the rules read"""
+        return list(dict.fromkeys(column for _, conditions in self.rules for column, _, _ in conditions))
+
+    def masks(self, df: pd.DataFrame) -> List[np.ndarray]:
+        """Boolean mask of every rule (before first-match resolution)"""
+        thresholds: Dict[Tuple[str, float], Any] = {}
+        masks = []
+        for _, conditions in self.rules:
+            mask = np.ones(len(df), dtype=bool)
+            for column, op, value in conditions:
+                matched = OPERATORS[op](df[column], _resolve(df, column, value, thresholds))
+                mask &= np.asarray(matched, dtype=bool)
+            masks.append(mask)
+        return masks
+
+    def assign(self, df: pd.DataFrame, categorical: bool = False, keep_all_labels: bool = False) -> pd.Series:
+        """
+        Label every row
+
+        Args:
+            df: Frame holding the rule columns
+            categorical: Return a categorical with categories in rule order
+                (default: object labels)
+            keep_all_labels: With categorical=True, keep every declared label as
+                a category, even if no row gets it (default: only the labels
+                that occur)
+
+        Returns:
+            pd.Series: Labels aligned with df
+        """
+        codes = [self.labels.index(label) for label, _ in self.rules]
+        default_code = self.labels.index(self.default)
+        if self.rules:
+            label_codes = np.select(self.masks(df), codes, default=default_code)
+        else:
+            label_codes = np.full(len(df), default_code)
+        return _labels(label_codes, self.labels, df.index, categorical, keep_all_labels)
+
+
+class ThresholdRules:
+    """
+    Labels from increasing thresholds on one column.
+
+    With right=True (the default) a value gets labels[i] for the first
+    threshold it is <= to, and the last label above every threshold, like
+    an if/elif chain of ``<=`` comparisons; right=False uses ``<``. Missing
+    values get missing_label (default: the last label, where such a chain
+    ends up).
+    """
+
+    def __init__(self, column: str, thresholds: Sequence[Union[float, Quantile]], labels: Sequence[str],
+                 right: bool = True, missing_label: Optional[str] = None):
+        if len(labels) != len(thresholds) + 1:
+            raise ValueError("ThresholdRules needs exactly one more label than thresholds")
+        self.column = column
+        self.thresholds = list(thresholds)
+        self.labels = list(labels)
+        self.right = right
+        self.missing_label = self.labels[-1] if missing_label is None else missing_label
+        if self.missing_label not in self.labels:
+            self.labels.append(self.missing_label)
+
+    def assign(self, data: Union[pd.DataFrame, pd.Series], categorical: bool = False,
+               keep_all_labels: bool = False) -> pd.Series:
+        """
+        Label every row
+
+        Args:
+            data: Frame holding the rule column, or the column itself
+            categorical: Return a categorical with categories in label order
+                (default: object labels)
+            keep_all_labels: With categorical=True, keep every declared label as
+                a category, even if no row gets it (default: only the labels
+                that occur)
+
+        Returns:
+            pd.Series: Labels aligned with data
+        """
+        values = data[self.column] if isinstance(data, pd.DataFrame) else data
+        frame = values.to_frame(self.column)
+        cache: Dict[Tuple[str, float], Any] = {}
+        thresholds = np.array([_resolve(frame, self.column, t, cache) for t in self.thresholds], dtype='float64')
+        if np.any(np.diff(thresholds) < 0):
+            raise ValueError(f"Thresholds of '{self.column}' must be increasing")
+
+        numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+        codes = np.searchsorted(thresholds, numbers, side='left' if self.right else 'right')
+        codes[np.isnan(numbers)] = self.labels.index(self.missing_label)
+        return _labels(codes, self.labels, values.index, categorical, keep_all_labels)
+
+
+# Notebook 02: lifecycle stage of every interaction from the customer's age
+JOURNEY_LIFECYCLE_STAGES = ThresholdRules('customer_age_days', [30, 90, 180],
+                                          ['New', 'Growing', 'Mature', 'Loyal'])
+
+# Notebook 02: journey segments from interaction patterns
+JOURNEY_SEGMENT_RULES = RuleSet([
+    ('High Engagement', [('interaction_frequency', '>', 0.5), ('total_interactions', '>', 10)]),
+    ('Medium Engagement', [('interaction_frequency', '>', 0.2), ('total_interactions', '>', 5)]),
+    ('Long Journey', [('journey_length_days', '>', 90)]),
+    ('Quick Exit', [('total_interactions', '<=', 3)]),
+], default='Low Engagement')
+
+# Notebook 06: lifecycle stage from days since the last transaction
+RECENCY_LIFECYCLE_STAGES = ThresholdRules('recency_days', [7, 30, 90],
+                                          ['Active', 'Regular', 'Declining', 'Inactive'])
+
+# Notebook 05: retention/growth strategy from CLV segment and churn probability
+STRATEGY_RULES = RuleSet([
+    ('Retention Focus - High Priority', [('clv_segment', 'in', ['High Value', 'Medium-High']),
+                                         ('predicted_churn_prob', '>', 0.5)]),
+    ('Expansion/Upsell', [('clv_segment', 'in', ['High Value', 'Medium-High'])]),
+    ('Retention Focus - Medium Priority', [('clv_segment', '==', 'Medium'), ('predicted_churn_prob', '>', 0.6)]),
+    ('Engagement Increase', [('clv_segment', '==', 'Medium')]),
+    ('Natural Churn - Monitor', [('predicted_churn_prob', '>', 0.7)]),
+], default='Value Enhancement')
+
+
+def dashboard_segment_rules(revenue_col: str, engagement_col: str) -> RuleSet:
+    """Notebook 06 customer segments from revenue and engagement quartiles"""
+    return RuleSet([
+        ('Champions', [(revenue_col, '>=', Quantile(0.75)), (engagement_col, '>=', Quantile(0.75))]),
+        ('Potential Loyalists', [(revenue_col, '>=', Quantile(0.75)), (engagement_col, '<', Quantile(0.75))]),
+        ('New Customers', [(revenue_col, '<', Quantile(0.25)), (engagement_col, '>=', Quantile(0.75))]),
+        ('Loyal Customers', [(revenue_col, '>=', Quantile(0.25)), (revenue_col, '<', Quantile(0.75)),
+                             (engagement_col, '>=', Quantile(0.25))]),
+        ('At Risk', [(revenue_col, '<', Quantile(0.25)), (engagement_col, '<', Quantile(0.25))]),
+    ], default='Promising')
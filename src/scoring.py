@@ -0,0 +1,305 @@
+"""
+Batch Model Scoring
+===================
+
+Scores customers with persisted churn and revenue models instead of refitting
+them in the notebook whenever predictions are needed. A ``ScoringPipeline``
+bundles the fitted estimators with their feature schema (feature order, fill
+values, optional scalers), the CLV parameters and the CLV segment cut-offs
+of the training population, so every later batch is scored consistently.
+
+``score_customers`` streams ``customer_features`` in chunks (dataframe,
+columnar directory or CSV) through vectorized ``predict_proba``/``predict``
+calls, optionally across a pool of worker processes, and appends each scored
+chunk to the output CSV as soon as it is ready, so memory stays bounded by a
+few chunks. Throughput is reported in customers per second.
+
+The models read the feature table they were trained on: notebook 05's
+``df_features``, i.e. the ``process_data`` output plus the columns engineered in
+its step 2 (``total_revenue``, ``engagement_score``,
+``days_since_last_activity``, ...). Notebook 05 saves that table as
+data/processed/customer_model_features.columnar; the plain
+data/processed/customer_features.csv lacks those columns and is rejected with
+"Customer features are missing model columns".
+
+Usage:
+    from src.scoring import ScoringPipeline, score_customers
+
+    # Notebook 05, after training
+    scoring = ScoringPipeline.from_training(df_features, best_model, churn_features,
+                                            best_reg_model, revenue_features)
+    scoring.save('../models/customer_scoring')
+
+    # Any time later, on features engineered as in notebook 05
+    scoring = ScoringPipeline.load('../models/customer_scoring')
+    report = score_customers('../data/processed/customer_model_features.columnar', scoring,
+                             '../data/processed/customer_analytics_with_predictions.csv',
+                             chunksize=50000, n_workers=4)
+    print(f"{report['customers_per_second']:,.0f} customers/s")
+
+Notes:
+    Models are stored with pickle; only load scoring directories you trust.
+"""
+
+import json
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.columnar import is_columnar_dataset, read_manifest
+from src.data_processing import pipeline_logging
+from src.rules import STRATEGY_RULES, ThresholdRules
+from src.segmentation import iter_feature_batches
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+SCHEMA_NAME = 'schema.json'
+MODELS_NAME = 'models.pkl'
+
+CLV_LABELS = ['Low Value', 'Medium-Low', 'Medium', 'Medium-High', 'High Value']
+PREDICTION_COLUMNS = ['predicted_churn_prob', 'predicted_revenue', 'predicted_clv', 'clv_segment', 'strategy']
+
+# Pipeline used by the current scoring run; set once per worker
+_PIPELINE: Dict[str, Any] = {}
+
+
+class ScoringPipeline:
+    """
+    Fitted churn and revenue models with the schema needed to score new customers.
+
+    Features are read in the stored order and missing values are filled with
+    the training means (as in notebook 05); a scaler, if given, is applied
+    before its model. CLV follows notebook 05:
+    revenue * (1 - churn probability) * horizon / (1 + discount rate) ** horizon,
+    clipped at 0, and is cut into CLV_LABELS at the training population's
+    quintiles; strategies come from ``src.rules.STRATEGY_RULES``.
+    """
+
+    def __init__(self, churn_model, revenue_model, churn_features: List[str], revenue_features: List[str],
+                 churn_fill_values: Dict[str, float], revenue_fill_values: Dict[str, float],
+                 churn_scaler=None, revenue_scaler=None, time_horizon: float = 2,
+                 discount_rate: float = 0.1, clv_thresholds: Optional[List[float]] = None):
+        self.churn_model = churn_model
+        self.revenue_model = revenue_model
+        self.churn_features = list(churn_features)
+        self.revenue_features = list(revenue_features)
+        self.churn_fill_values = dict(churn_fill_values)
+        self.revenue_fill_values = dict(revenue_fill_values)
+        self.churn_scaler = churn_scaler
+        self.revenue_scaler = revenue_scaler
+        self.time_horizon = time_horizon
+        self.discount_rate = discount_rate
+        self.clv_thresholds = None if clv_thresholds is None else [float(t) for t in clv_thresholds]
+
+    @classmethod
+    def from_training(cls, df_features: pd.DataFrame, churn_model, churn_features: List[str],
+                      revenue_model, revenue_features: List[str], churn_scaler=None, revenue_scaler=None,
+                      time_horizon: float = 2, discount_rate: float = 0.1) -> 'ScoringPipeline':
+        """
+        Bundle trained models with fill values and CLV cut-offs from the training data
+
+        Args:
+            df_features: Training customer features
+            churn_model: Fitted classifier with predict_proba
+            churn_features: Columns the churn model was trained on, in order
+            revenue_model: Fitted regressor
+            revenue_features: Columns the revenue model was trained on, in order
+            churn_scaler: Fitted scaler applied before the churn model (e.g. for
+                logistic regression), or None
+            revenue_scaler: Fitted scaler applied before the revenue model, or None
+            time_horizon: CLV horizon in years
+            discount_rate: Annual CLV discount rate
+
+        Returns:
+            ScoringPipeline
+        """
+        pipeline = cls(churn_model, revenue_model, churn_features, revenue_features,
+                       df_features[churn_features].mean().to_dict(),
+                       df_features[revenue_features].mean().to_dict(),
+                       churn_scaler, revenue_scaler, time_horizon, discount_rate)
+        clv = pipeline.predict(df_features)['predicted_clv']
+        pipeline.clv_thresholds = clv.quantile([0.2, 0.4, 0.6, 0.8]).tolist()
+        return pipeline
+
+    @property
+    def input_columns(self) -> List[str]:
+        """Feature columns the models read"""
+        return list(dict.fromkeys(self.churn_features + self.revenue_features))
+
+    def _matrix(self, df, features, fill_values, scaler):
+        missing = [col for col in features if col not in df.columns]
+        if missing:
+            raise ValueError(f"Customer features are missing model columns: {missing}")
+        X = df[features].astype('float64').fillna(fill_values)
+        return scaler.transform(X) if scaler is not None else X
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Churn probability, revenue and CLV of every customer
+
+        Returns:
+            pd.DataFrame: 'predicted_churn_prob', 'predicted_revenue' and
+                'predicted_clv', aligned with df
+        """
+        churn_prob = self.churn_model.predict_proba(
+            self._matrix(df, self.churn_features, self.churn_fill_values, self.churn_scaler))[:, 1]
+        revenue = self.revenue_model.predict(
+            self._matrix(df, self.revenue_features, self.revenue_fill_values, self.revenue_scaler))
+        clv = revenue * (1 - churn_prob) * self.time_horizon / (1 + self.discount_rate) ** self.time_horizon
+        return pd.DataFrame({
+            'predicted_churn_prob': churn_prob,
+            'predicted_revenue': revenue,
+            'predicted_clv': np.clip(clv, 0, None),
+        }, index=df.index)
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Predictions plus CLV segment and strategy (columns PREDICTION_COLUMNS)"""
+        if self.clv_thresholds is None:
+            raise ValueError("CLV thresholds are not set; build the pipeline with from_training")
+        scores = self.predict(df)
+        segments = ThresholdRules('predicted_clv', self.clv_thresholds, CLV_LABELS)
+        scores['clv_segment'] = segments.assign(scores, categorical=True, keep_all_labels=True)
+        scores['strategy'] = STRATEGY_RULES.assign(scores, categorical=True, keep_all_labels=True)
+        return scores
+
+    def save(self, directory):
+        """Write the models (pickle) and their schema (JSON) to a directory"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / MODELS_NAME, 'wb') as f:
+            pickle.dump({'churn_model': self.churn_model, 'revenue_model': self.revenue_model,
+                         'churn_scaler': self.churn_scaler, 'revenue_scaler': self.revenue_scaler}, f)
+        schema = {
+            'version': SCHEMA_VERSION,
+            'churn_model': type(self.churn_model).__name__,
+            'revenue_model': type(self.revenue_model).__name__,
+            'churn_features': self.churn_features,
+            'revenue_features': self.revenue_features,
+            'churn_fill_values': self.churn_fill_values,
+            'revenue_fill_values': self.revenue_fill_values,
+            'time_horizon': self.time_horizon,
+            'discount_rate': self.discount_rate,
+            'clv_thresholds': self.clv_thresholds,
+            'clv_labels': CLV_LABELS,
+        }
+        with open(directory / SCHEMA_NAME, 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    @classmethod
+    def load(cls, directory) -> 'ScoringPipeline':
+        """Load a pipeline written by ``save``"""
+        directory = Path(directory)
+        with open(directory / SCHEMA_NAME) as f:
+            schema = json.load(f)
+        if schema.get('version') != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported scoring schema version {schema.get('version')}")
+        with open(directory / MODELS_NAME, 'rb') as f:
+            models = pickle.load(f)
+        return cls(models['churn_model'], models['revenue_model'], schema['churn_features'],
+                   schema['revenue_features'], schema['churn_fill_values'], schema['revenue_fill_values'],
+                   models['churn_scaler'], models['revenue_scaler'], schema['time_horizon'],
+                   schema['discount_rate'], schema['clv_thresholds'])
+
+
+def _source_columns(source):
+    if isinstance(source, pd.DataFrame):
+        return source.columns.tolist()
+    if is_columnar_dataset(source):
+        return [entry['name'] for entry in read_manifest(source)['columns']]
+    return pd.read_csv(source, nrows=0).columns.tolist()
+
+
+def _init_worker(pipeline):
+    _PIPELINE['pipeline'] = pipeline
+
+
+def _score_chunk(chunk):
+    """Worker: the chunk with its prediction columns appended"""
+    scores = _PIPELINE['pipeline'].score(chunk)
+    return pd.concat([chunk.drop(columns=PREDICTION_COLUMNS, errors='ignore'), scores], axis=1)
+
+
+def _scored_chunks(chunks, pipeline, n_workers):
+    """Score chunks in order, keeping at most 2 chunks per worker in flight"""
+    if n_workers <= 1:
+        _init_worker(pipeline)
+        try:
+            for chunk in chunks:
+                yield _score_chunk(chunk)
+        finally:
+            _PIPELINE.clear()
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(pipeline,)) as executor:
+        pending = []
+        for chunk in chunks:
+            pending.append(executor.submit(_score_chunk, chunk))
+            if len(pending) >= 2 * n_workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def score_customers(source, pipeline: ScoringPipeline, output_path, chunksize: int = 50000,
+                    n_workers: int = 1, columns: Optional[List[str]] = None,
+                    verbose: bool = True) -> Dict[str, Any]:
+    """
+    Score every customer in chunks and write the results incrementally to CSV
+
+    Args:
+        source: Customer features with every ``pipeline.input_columns`` column
+            (see the module docstring) as a DataFrame, columnar directory or CSV
+        pipeline: Fitted ScoringPipeline
+        output_path: CSV to write; it is written under a temporary name and
+            renamed when complete
+        chunksize: Customers per chunk
+        n_workers: Worker processes; 1 scores in-process, None uses the CPU count
+        columns: Input columns to copy to the output next to the predictions
+            (default: all columns of the source)
+        verbose: Print progress (see ``pipeline_logging``)
+
+    Returns:
+        dict: 'output_path', 'customers', 'chunks', 'seconds' and
+            'customers_per_second'
+    """
+    with pipeline_logging(verbose):
+        n_workers = n_workers or os.cpu_count() or 1
+        if columns is None:
+            columns = [col for col in _source_columns(source) if col not in PREDICTION_COLUMNS]
+        read_columns = list(dict.fromkeys(list(columns) + pipeline.input_columns))
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        staging = output_path.with_name(output_path.name + '.tmp')
+
+        start = time.perf_counter()
+        n_customers = n_chunks = 0
+        chunks = iter_feature_batches(source, read_columns, chunksize)
+        with open(staging, 'w', newline='') as f:
+            for scored in _scored_chunks(chunks, pipeline, n_workers):
+                scored[list(columns) + PREDICTION_COLUMNS].to_csv(f, index=False, header=n_chunks == 0)
+                n_customers += len(scored)
+                n_chunks += 1
+                logger.debug("Scored chunk %d (%d customers)", n_chunks, n_customers)
+        os.replace(staging, output_path)
+        seconds = time.perf_counter() - start
+
+        report = {
+            'output_path': str(output_path),
+            'customers': n_customers,
+            'chunks': n_chunks,
+            'seconds': seconds,
+            'customers_per_second': n_customers / seconds if seconds > 0 else float('inf'),
+        }
+        logger.info("Scored %d customers in %d chunks in %.2fs (%.0f customers/s) -> %s",
+                    n_customers, n_chunks, seconds, report['customers_per_second'], output_path)
+    return report
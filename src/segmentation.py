@@ -0,0 +1,406 @@
+"""
+Scalable Customer Segmentation
+==============================
+
+Mini-batch k-means over ``customer_features`` read in batches (a dataframe,
+a columnar directory or a CSV), so memory is bounded by the batch size rather
+than the number of customers. Preprocessing follows notebook 04: median fill,
+IQR outlier capping and standard scaling. The medians and IQR bounds come
+from a bounded uniform sample, and the scaler mean/std from one streaming pass.
+
+Centroids are seeded on the sample (the best of several k-means++ starts,
+each polished by a few Lloyd iterations on the sample) and then refined batch by
+batch; each centroid moves to the running mean of the points assigned to it
+(per-centroid learning rate 1/count). Silhouette is estimated on the bounded
+sample, so its cost does not grow with the number of customers. Candidate
+values of k are fitted in parallel worker processes, each from its own child
+of one ``SeedSequence``, so results do not depend on the number of workers.
+
+The fitted ``SegmentationModel`` (fill values, bounds, scaler, centroids) is
+saved as JSON; new or updated customers are assigned in O(k) per customer
+without refitting, and ``partial_fit`` folds new customers into the centroids.
+
+Usage:
+    from src.segmentation import select_k, SegmentationModel
+
+    results, models = select_k('../data/processed/customer_features.columnar', features,
+                               k_values=range(2, 11), n_workers=4, seed=42)
+    best_k = int(results.loc[results['silhouette'].idxmax(), 'k'])
+    models[best_k].save('../data/processed/segmentation_model.json')
+
+    model = SegmentationModel.load('../data/processed/segmentation_model.json')
+    new_customers['cluster'] = model.assign(new_customers)
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.columnar import is_columnar_dataset, read_manifest, read_columnar
+
+STATE_VERSION = 1
+
+DEFAULT_BATCH_SIZE = 50000
+DEFAULT_MINI_BATCH_SIZE = 1024
+DEFAULT_SAMPLE_SIZE = 5000
+DEFAULT_N_INIT = 5
+SEED_LLOYD_ITERATIONS = 10
+
+# Source and preprocessing of the current fit; set once per worker
+_FIT_CONTEXT: Dict[str, Any] = {}
+
+
+def iter_feature_batches(source, columns: List[str], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield the requested columns of customer features in batches of rows
+
+    Args:
+        source: DataFrame, columnar directory (read memory-mapped, one row
+            range at a time) or CSV file (read in chunks)
+        columns: Feature columns to read
+        batch_size: Rows per batch
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), batch_size):
+            yield source[columns].iloc[start:start + batch_size]
+    elif is_columnar_dataset(source):
+        n_rows = read_manifest(source)['n_rows']
+        for start in range(0, n_rows, batch_size):
+            yield read_columnar(source, columns=columns, rows=slice(start, start + batch_size))
+    else:
+        yield from pd.read_csv(source, usecols=columns, chunksize=batch_size)
+
+
+def sample_rows(source, columns: List[str], sample_size: int = DEFAULT_SAMPLE_SIZE,
+                batch_size: int = DEFAULT_BATCH_SIZE, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Uniform sample of at most sample_size rows in one pass (bottom-k random keys)
+    """
+    rng = np.random.default_rng(seed)
+    sample = None
+    keys = np.array([])
+    for batch in iter_feature_batches(source, columns, batch_size):
+        batch_keys = rng.random(len(batch))
+        sample = batch if sample is None else pd.concat([sample, batch], ignore_index=True)
+        keys = np.concatenate([keys, batch_keys])
+        if len(keys) > sample_size:
+            keep = np.argpartition(keys, sample_size - 1)[:sample_size]
+            keep.sort()
+            sample, keys = sample.iloc[keep].reset_index(drop=True), keys[keep]
+    if sample is None:
+        raise ValueError("No customer features to sample")
+    return sample.reset_index(drop=True)
+
+
+def _squared_distances(X, centroids):
+    """Squared Euclidean distances of every row to every centroid"""
+    distances = ((X ** 2).sum(axis=1)[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1)[None, :])
+    return np.maximum(distances, 0.0)
+
+
+def _kmeans_plusplus(X, k, rng):
+    """k-means++ seeding on the sample"""
+    if len(X) < k:
+        raise ValueError(f"Need at least {k} sampled customers to fit {k} clusters")
+    centroids = [X[rng.integers(len(X))]]
+    closest = _squared_distances(X, centroids[0][None, :])[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[index])
+        closest = np.minimum(closest, _squared_distances(X, X[index][None, :])[:, 0])
+    return np.array(centroids)
+
+
+def _seed_centroids(X, k, rng, n_init):
+    """Best of n_init k-means++ starts after a few Lloyd iterations on the sample"""
+    best, best_inertia = None, np.inf
+    for _ in range(n_init):
+        centroids = _kmeans_plusplus(X, k, rng)
+        for _ in range(SEED_LLOYD_ITERATIONS):
+            labels = _squared_distances(X, centroids).argmin(axis=1)
+            sizes = np.bincount(labels, minlength=k)
+            sums = np.column_stack([np.bincount(labels, weights=X[:, j], minlength=k) for j in range(X.shape[1])])
+            filled = sizes > 0
+            centroids[filled] = sums[filled] / sizes[filled, None]
+        inertia = _squared_distances(X, centroids).min(axis=1).sum()
+        if inertia < best_inertia:
+            best, best_inertia = centroids, inertia
+    return best
+
+
+def sampled_silhouette(X: np.ndarray, labels: np.ndarray, block_size: int = 1024) -> float:
+    """
+    Mean silhouette coefficient of X (computed blockwise; use a bounded sample)
+
+    Points in singleton clusters score 0, as in sklearn's silhouette_score.
+    """
+    n_clusters = labels.max() + 1
+    sizes = np.bincount(labels, minlength=n_clusters).astype('float64')
+    if (sizes > 0).sum() < 2:
+        return np.nan
+    one_hot = np.zeros((len(X), n_clusters))
+    one_hot[np.arange(len(X)), labels] = 1.0
+
+    scores = np.empty(len(X))
+    for start in range(0, len(X), block_size):
+        block = slice(start, start + block_size)
+        distances = np.sqrt(_squared_distances(X[block], X))
+        cluster_sums = distances @ one_hot
+        own = labels[block]
+        rows = np.arange(len(own))
+        own_size = sizes[own]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = cluster_sums[rows, own] / (own_size - 1)
+            mean_other = cluster_sums / sizes[None, :]
+        mean_other[rows, own] = np.inf
+        mean_other[:, sizes == 0] = np.inf
+        b = mean_other.min(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        scores[block] = np.where(own_size > 1, np.nan_to_num(s), 0.0)
+    return float(scores.mean())
+
+
+class SegmentationModel:
+    """
+    Fitted preprocessing and centroids; assigns customers in O(k) each.
+
+    Attributes:
+        features: Feature columns, in order
+        fill_values, lower, upper: Median fill and IQR capping bounds per feature
+        mean, scale: Standard scaler parameters (computed after capping)
+        centroids: k x features matrix in scaled space
+        counts: Points each centroid has absorbed (its learning rate is 1/count)
+    """
+
+    def __init__(self, features, fill_values, lower, upper, mean, scale, centroids=None, counts=None):
+        self.features = list(features)
+        self.fill_values = np.asarray(fill_values, dtype='float64')
+        self.lower = np.asarray(lower, dtype='float64')
+        self.upper = np.asarray(upper, dtype='float64')
+        self.mean = np.asarray(mean, dtype='float64')
+        self.scale = np.asarray(scale, dtype='float64')
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype='float64')
+        self.counts = None if counts is None else np.asarray(counts, dtype='float64')
+
+    @property
+    def n_clusters(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Fill, cap and scale the feature columns of df"""
+        X = df[self.features].to_numpy(dtype='float64', na_value=np.nan)
+        X = np.where(np.isnan(X), self.fill_values, X)
+        X = np.clip(X, self.lower, self.upper)
+        return (X - self.mean) / self.scale
+
+    def assign(self, df: pd.DataFrame, return_distance: bool = False):
+        """
+        Nearest centroid of every customer
+
+        Returns:
+            np.ndarray: Cluster labels (and the squared distances to the
+                assigned centroid if return_distance)
+        """
+        distances = _squared_distances(self.transform(df), self.centroids)
+        labels = distances.argmin(axis=1)
+        if return_distance:
+            return labels, distances[np.arange(len(labels)), labels]
+        return labels
+
+    def _update(self, X):
+        """One mini-batch step: move centroids to the running mean of their points"""
+        labels = _squared_distances(X, self.centroids).argmin(axis=1)
+        n = np.bincount(labels, minlength=self.n_clusters).astype('float64')
+        sums = np.column_stack([np.bincount(labels, weights=X[:, j], minlength=self.n_clusters)
+                                for j in range(X.shape[1])])
+        self.counts = self.counts + n
+        moved = n > 0
+        self.centroids[moved] += (sums[moved] - n[moved, None] * self.centroids[moved]) / self.counts[moved, None]
+
+    def partial_fit(self, df: pd.DataFrame, mini_batch_size: int = DEFAULT_MINI_BATCH_SIZE,
+                    seed: Optional[int] = None) -> 'SegmentationModel':
+        """Fold new customers into the centroids (preprocessing stays fixed)"""
+        X = self.transform(df)
+        X = X[np.random.default_rng(seed).permutation(len(X))]
+        for start in range(0, len(X), mini_batch_size):
+            self._update(X[start:start + mini_batch_size])
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state"""
+        return {
+            'version': STATE_VERSION,
+            'features': self.features,
+            'fill_values': self.fill_values.tolist(),
+            'lower': self.lower.tolist(),
+            'upper': self.upper.tolist(),
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'centroids': None if self.centroids is None else self.centroids.tolist(),
+            'counts': None if self.counts is None else self.counts.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'SegmentationModel':
+        """Rebuild a model from ``to_dict`` output"""
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported segmentation model version {state.get('version')}")
+        return cls(state['features'], state['fill_values'], state['lower'], state['upper'],
+                   state['mean'], state['scale'], state['centroids'], state['counts'])
+
+    def save(self, filepath):
+        """Write the model to a JSON file"""
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filepath) -> 'SegmentationModel':
+        """Load a model written by ``save``"""
+        with open(filepath) as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_preprocessing(source, features: List[str], sample: pd.DataFrame,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> SegmentationModel:
+    """
+    Median fill and IQR bounds from the sample, scaler from one streaming pass
+
+    Returns:
+        SegmentationModel: Preprocessing only (no centroids yet)
+    """
+    fill_values = sample[features].median()
+    filled = sample[features].fillna(fill_values)
+    q1, q3 = filled.quantile(0.25), filled.quantile(0.75)
+    iqr = q3 - q1
+    model = SegmentationModel(features, fill_values, q1 - 1.5 * iqr, q3 + 1.5 * iqr,
+                              np.zeros(len(features)), np.ones(len(features)))
+
+    # Streaming mean and M2 of the capped features (Chan et al. merge per batch)
+    n, mean, m2 = 0, np.zeros(len(features)), np.zeros(len(features))
+    for batch in iter_feature_batches(source, features, batch_size):
+        X = model.transform(batch)
+        batch_n, batch_mean = len(X), X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        total = n + batch_n
+        delta = batch_mean - mean
+        mean = mean + delta * batch_n / total
+        m2 = m2 + batch_m2 + delta ** 2 * n * batch_n / total
+        n = total
+
+    scale = np.sqrt(m2 / n)
+    model.mean = mean
+    model.scale = np.where(scale > 0, scale, 1.0)
+    return model
+
+
+def _init_worker(context):
+    _FIT_CONTEXT.clear()
+    _FIT_CONTEXT.update(context)
+
+
+def _fit_k(task):
+    """Worker: fit k centroids by mini-batch passes and score them"""
+    k, seed = task
+    context = _FIT_CONTEXT
+    preprocessing = context['preprocessing']
+    rng = np.random.default_rng(seed)
+
+    model = SegmentationModel.from_dict(preprocessing.to_dict())
+    sample_X = model.transform(context['sample'])
+    model.centroids = _seed_centroids(sample_X, k, rng, context['n_init'])
+    model.counts = np.zeros(k)
+
+    for _ in range(context['n_epochs']):
+        for batch in iter_feature_batches(context['source'], model.features, context['batch_size']):
+            X = model.transform(batch)
+            X = X[rng.permutation(len(X))]
+            for start in range(0, len(X), context['mini_batch_size']):
+                model._update(X[start:start + context['mini_batch_size']])
+
+    inertia = 0.0
+    sizes = np.zeros(k)
+    for batch in iter_feature_batches(context['source'], model.features, context['batch_size']):
+        labels, distances = model.assign(batch, return_distance=True)
+        inertia += distances.sum()
+        sizes += np.bincount(labels, minlength=k)
+
+    sample_labels = _squared_distances(sample_X, model.centroids).argmin(axis=1)
+    return {
+        'k': k,
+        'inertia': inertia,
+        'silhouette': sampled_silhouette(sample_X, sample_labels),
+        'min_cluster_size': int(sizes.min()),
+        'model': model.to_dict(),
+    }
+
+
+def select_k(source, features: List[str], k_values: Iterable[int] = range(2, 11),
+             n_epochs: int = 3, n_init: int = DEFAULT_N_INIT, batch_size: int = DEFAULT_BATCH_SIZE,
+             mini_batch_size: int = DEFAULT_MINI_BATCH_SIZE, sample_size: int = DEFAULT_SAMPLE_SIZE,
+             seed: Optional[int] = None, n_workers: int = 1) -> Tuple[pd.DataFrame, Dict[int, SegmentationModel]]:
+    """
+    Fit mini-batch k-means for every k and score each (elbow and silhouette)
+
+    Args:
+        source: Customer features as a DataFrame, columnar directory or CSV
+        features: Feature columns to cluster on
+        k_values: Numbers of clusters to try
+        n_epochs: Passes over the data per fit
+        n_init: k-means++ starts tried on the sample per k (the best is kept)
+        batch_size: Rows read per batch
+        mini_batch_size: Rows per centroid update
+        sample_size: Rows sampled for preprocessing, seeding and silhouette
+        seed: Seed of the root SeedSequence (None for fresh entropy)
+        n_workers: Worker processes fitting different k; 1 runs in-process,
+            None uses the CPU count
+
+    Returns:
+        tuple: (results with 'k', 'inertia', 'silhouette', 'min_cluster_size'
+            per k, dict of fitted SegmentationModel by k)
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    k_values = list(k_values)
+    root = np.random.SeedSequence(seed)
+    sample_seed, *k_seeds = root.spawn(len(k_values) + 1)
+
+    sample = sample_rows(source, features, sample_size, batch_size, sample_seed)
+    preprocessing = fit_preprocessing(source, features, sample, batch_size)
+    context = {
+        'source': source,
+        'preprocessing': preprocessing,
+        'sample': sample,
+        'n_epochs': n_epochs,
+        'n_init': n_init,
+        'batch_size': batch_size,
+        'mini_batch_size': mini_batch_size,
+    }
+    tasks = list(zip(k_values, k_seeds))
+
+    if n_workers <= 1 or len(tasks) <= 1:
+        _init_worker(context)
+        try:
+            outputs = [_fit_k(task) for task in tasks]
+        finally:
+            _FIT_CONTEXT.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(tasks)), initializer=_init_worker,
+                                 initargs=(context,)) as executor:
+            outputs = list(executor.map(_fit_k, tasks))
+
+    models = {output['k']: SegmentationModel.from_dict(output.pop('model')) for output in outputs}
+    return pd.DataFrame(outputs, columns=['k', 'inertia', 'silhouette', 'min_cluster_size']), models
+
+
+def fit_segmentation(source, features: List[str], k: int, **kwargs) -> SegmentationModel:
+    """Fit a single mini-batch k-means model (see ``select_k`` for the options)"""
+    _, models = select_k(source, features, k_values=[k], **kwargs)
+    return models[k]
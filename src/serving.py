@@ -0,0 +1,497 @@
+"""
+Analytics Serving Layer for the Dashboards
+==========================================
+
+A small HTTP service (standard library only) that answers the dashboards'
+filtered queries from aggregates held in memory. Transactions are rolled up
+once into a dense segment x region x month cube of additive measures
+(revenue, profit, quantity, orders, transactions); distinct customers are
+counted exactly from the deduplicated (cell, customer) pairs. A query only
+touches the cube, and every encoded response is cached per data version, so
+repeated queries are answered from memory without recomputation.
+
+Customer segments come from the processed per-customer output (the notebooks'
+data/results/dashboard_ready_data.csv); region and month come from the
+transactions. Transactions of customers without a segment are served under
+UNASSIGNED_SEGMENT.
+
+Endpoints (all GET, JSON):
+    /api/health                      data version, load time, sources
+    /api/dimensions                  available segments, regions and months
+    /api/summary?segment=&region=&month=
+                                     totals for the filtered cells
+    /api/breakdown?by=month&segment=&region=&month=
+                                     measures per segment/region/month as
+                                     parallel arrays
+
+Filters take comma-separated values (e.g. ``region=EMEA,APJ``); months are
+``YYYY-MM`` and ``month_from``/``month_to`` select an inclusive range.
+Responses carry an ETag and honour If-None-Match (304). The source files are
+polled and the aggregates rebuilt in the background when they change; a
+failed reload keeps serving the previous data.
+
+Usage:
+    python -m src.serving --port 8050
+
+    from src.serving import AnalyticsService, make_server
+    service = AnalyticsService('data/raw/saas_sales.csv', 'data/results/dashboard_ready_data.csv')
+    service.query('/api/summary', 'segment=Champions&month_from=2023-01')
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.cohorts import encode_periods
+from src.rules import UNASSIGNED_SEGMENT
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_TRANSACTIONS_PATH = REPO_ROOT / 'data' / 'raw' / 'saas_sales.csv'
+DEFAULT_SEGMENTS_PATH = REPO_ROOT / 'data' / 'results' / 'dashboard_ready_data.csv'
+
+DIMENSIONS = ['segment', 'region', 'month']
+
+DEFAULT_RELOAD_INTERVAL = 2.0
+DEFAULT_CACHE_ENTRIES = 4096
+
+
+class QueryError(ValueError):
+    """A request the service cannot answer (unknown endpoint, filter or value)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AggregateSnapshot:
+    """
+    Immutable in-memory aggregates of one version of the source files
+
+    Attributes:
+        labels (dict): dimension -> np.ndarray of its values (sorted)
+        cube (dict): additive measure -> array of shape (segments, regions, months)
+        pairs (np.ndarray): Distinct (segment, region, month, customer) codes, one row each
+        version (str): Digest of the source file signatures
+        loaded_at (float): Unix time the snapshot was built
+        signature (tuple): (path, mtime, size) of every source file, set by the service
+    """
+
+    def __init__(self, labels, cube, pairs, version, loaded_at):
+        self.labels = labels
+        self.cube = cube
+        self.pairs = pairs
+        self.n_customers = int(pairs[:, 3].max()) + 1 if len(pairs) else 1
+        self.version = version
+        self.loaded_at = loaded_at
+        self.signature = None
+
+    @classmethod
+    def build(cls, transactions, segments, version='', customer_col='Customer ID', date_col='Order Date',
+              region_col='Region', order_col='Order ID', revenue_col='Sales', profit_col='Profit',
+              quantity_col='Quantity', segment_id_col='customer_id', segment_col='customer_segment'):
+        """
+        Roll transactions up into the segment x region x month cube
+
+        Args:
+            transactions (pd.DataFrame): One row per order line
+            segments (pd.DataFrame): One row per customer with its segment
+            version (str): Version tag of the sources
+
+        Returns:
+            AggregateSnapshot
+        """
+        periods, valid = encode_periods(transactions[date_col], 'M')
+        valid &= transactions[customer_col].notna().to_numpy()
+        tx = transactions.loc[valid]
+        periods = periods[valid]
+
+        segment_of = segments.drop_duplicates(segment_id_col).set_index(segment_id_col)[segment_col]
+        segment_values = tx[customer_col].map(segment_of).fillna(UNASSIGNED_SEGMENT).astype(str)
+        segment_codes, segment_labels = pd.factorize(segment_values, sort=True)
+        region_codes, region_labels = pd.factorize(tx[region_col].fillna('Unknown').astype(str), sort=True)
+        month_codes, month_periods = pd.factorize(periods, sort=True)
+        customer_codes, _ = pd.factorize(tx[customer_col])
+
+        labels = {
+            'segment': np.asarray(segment_labels, dtype=object),
+            'region': np.asarray(region_labels, dtype=object),
+            'month': np.asarray(month_periods, dtype='int64').astype('datetime64[M]').astype(str).astype(object),
+        }
+        shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        cells = np.ravel_multi_index((segment_codes, region_codes, month_codes), shape)
+        n_cells = int(np.prod(shape))
+
+        def cell_sum(weights=None):
+            return np.bincount(cells, weights=weights, minlength=n_cells).reshape(shape)
+
+        cube = {
+            'revenue': cell_sum(tx[revenue_col].to_numpy(dtype='float64')),
+            'profit': cell_sum(tx[profit_col].to_numpy(dtype='float64')),
+            'quantity': cell_sum(tx[quantity_col].to_numpy(dtype='float64')),
+            'transactions': cell_sum().astype('int64'),
+        }
+        # An order has one customer and one date, but dedupe per cell to be safe
+        order_codes, _ = pd.factorize(tx[order_col])
+        order_cells = np.unique(np.stack([cells, order_codes], axis=1), axis=0)[:, 0]
+        cube['orders'] = np.bincount(order_cells, minlength=n_cells).reshape(shape)
+
+        customer_cells = np.unique(np.stack([cells, customer_codes], axis=1), axis=0)
+        pairs = np.stack(np.unravel_index(customer_cells[:, 0], shape) + (customer_cells[:, 1],), axis=1)
+        return cls(labels, cube, pairs.astype('int64'), version, time.time())
+
+    def _masks(self, filters):
+        """Boolean selection per dimension from parsed filters (None: all values)"""
+        masks = {}
+        for dim in DIMENSIONS:
+            values = filters.get(dim)
+            if values is None:
+                masks[dim] = np.ones(len(self.labels[dim]), dtype=bool)
+                continue
+            known = pd.Index(self.labels[dim])
+            positions = known.get_indexer(values)
+            if (positions < 0).any():
+                unknown = [value for value, pos in zip(values, positions) if pos < 0]
+                raise QueryError(f"Unknown {dim} value(s): {', '.join(unknown)}")
+            masks[dim] = np.zeros(len(known), dtype=bool)
+            masks[dim][positions] = True
+
+        month_from, month_to = filters.get('month_from'), filters.get('month_to')
+        if month_from is not None:
+            masks['month'] &= self.labels['month'] >= month_from
+        if month_to is not None:
+            masks['month'] &= self.labels['month'] <= month_to
+        return masks
+
+    def _measures(self, cube, customers):
+        """Response measures from summed cube values (scalars or arrays)"""
+        orders = cube['orders']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_order_value = np.where(orders > 0, cube['revenue'] / np.maximum(orders, 1), 0.0)
+            margin = np.where(cube['revenue'] != 0, cube['profit'] / np.where(cube['revenue'] != 0,
+                                                                               cube['revenue'], 1), 0.0)
+        return {
+            'revenue': np.round(cube['revenue'], 2),
+            'profit': np.round(cube['profit'], 2),
+            'quantity': np.round(cube['quantity'], 2),
+            'orders': cube['orders'],
+            'transactions': cube['transactions'],
+            'customers': customers,
+            'avg_order_value': np.round(avg_order_value, 2),
+            'profit_margin': np.round(margin, 4),
+        }
+
+    def _selected_pairs(self, masks):
+        pairs = self.pairs
+        keep = masks['segment'][pairs[:, 0]] & masks['region'][pairs[:, 1]] & masks['month'][pairs[:, 2]]
+        return pairs[keep]
+
+    def summary(self, filters):
+        """Totals over the cells selected by filters"""
+        masks = self._masks(filters)
+        index = np.ix_(masks['segment'], masks['region'], masks['month'])
+        totals = {name: values[index].sum() for name, values in self.cube.items()}
+        customers = len(np.unique(self._selected_pairs(masks)[:, 3]))
+        return {name: _to_json(value) for name, value in self._measures(totals, customers).items()}
+
+    def breakdown(self, by, filters):
+        """Measures per value of one dimension over the cells selected by filters"""
+        if by not in DIMENSIONS:
+            raise QueryError(f"Unknown breakdown dimension '{by}' (expected one of {DIMENSIONS})")
+        masks = self._masks(filters)
+        axis = DIMENSIONS.index(by)
+        index = np.ix_(masks['segment'], masks['region'], masks['month'])
+        other_axes = tuple(i for i in range(len(DIMENSIONS)) if i != axis)
+        totals = {name: values[index].sum(axis=other_axes) for name, values in self.cube.items()}
+
+        pairs = self._selected_pairs(masks)
+        per_value = np.unique(pairs[:, axis] * self.n_customers + pairs[:, 3]) // self.n_customers
+        customers = np.bincount(per_value, minlength=len(self.labels[by]))[masks[by]]
+
+        result = {by: self.labels[by][masks[by]].tolist()}
+        result.update({name: _to_json(value) for name, value in self._measures(totals, customers).items()})
+        return result
+
+    def dimensions(self):
+        return {dim: self.labels[dim].tolist() for dim in DIMENSIONS}
+
+
+def _to_json(value):
+    """numpy scalars/arrays to plain JSON-serializable values"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def parse_filters(params):
+    """
+    Filters from a parsed query string
+
+    Args:
+        params (dict): Output of urllib.parse.parse_qs
+
+    Returns:
+        dict: dimension -> list of values (sorted, deduplicated) and
+            'month_from'/'month_to' strings; absent filters are omitted
+    """
+    filters = {}
+    for dim in DIMENSIONS:
+        if dim in params:
+            values = sorted({value.strip() for raw in params[dim] for value in raw.split(',') if value.strip()})
+            filters[dim] = values
+    for bound in ('month_from', 'month_to'):
+        if bound in params:
+            value = params[bound][-1].strip()
+            try:
+                value = str(np.datetime64(value, 'M'))
+            except ValueError:
+                raise QueryError(f"{bound} must be a month like 2023-01, got '{value}'")
+            filters[bound] = value
+    return filters
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+
+class AnalyticsService:
+    """
+    Query front end over the current AggregateSnapshot
+
+    Thread-safe: requests read one snapshot reference, reloads build a new
+    snapshot and swap it in, and the response cache is keyed by data version.
+    """
+
+    def __init__(self, transactions_path=DEFAULT_TRANSACTIONS_PATH, segments_path=DEFAULT_SEGMENTS_PATH,
+                 cache_entries=DEFAULT_CACHE_ENTRIES, **build_kwargs):
+        """
+        Args:
+            transactions_path (str or Path): Transactions CSV (raw sales export)
+            segments_path (str or Path): Per-customer CSV with the segment column
+            cache_entries (int): Encoded responses kept in memory (LRU)
+            **build_kwargs: Column names, passed to AggregateSnapshot.build
+        """
+        self.sources = [Path(transactions_path), Path(segments_path)]
+        self.build_kwargs = build_kwargs
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._pending_signature = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.snapshot = None
+        self.reload()
+
+    def _signature(self):
+        return tuple(_file_signature(path) for path in self.sources)
+
+    def reload(self, signature=None):
+        """Rebuild the aggregates from the source files and swap them in"""
+        with self._reload_lock:
+            signature = signature or self._signature()
+            start = time.perf_counter()
+            transactions = pd.read_csv(self.sources[0])
+            segments = pd.read_csv(self.sources[1])
+            version = hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+            snapshot = AggregateSnapshot.build(transactions, segments, version, **self.build_kwargs)
+            snapshot.signature = signature
+            self.snapshot = snapshot
+            with self._cache_lock:
+                self._cache.clear()
+            logger.info("Loaded aggregates version %s in %.2fs (%s segments, %s regions, %s months)",
+                        version, time.perf_counter() - start, *(len(snapshot.labels[d]) for d in DIMENSIONS))
+            return snapshot
+
+    def check_for_changes(self):
+        """
+        Reload if the source files changed and have been stable since the last check
+
+        Waiting for one unchanged poll avoids reading a file that is still
+        being written. Returns True if a reload happened.
+        """
+        try:
+            signature = self._signature()
+        except OSError as e:
+            logger.warning("Cannot stat sources: %s", e)
+            return False
+        if signature == self.snapshot.signature:
+            self._pending_signature = None
+            return False
+        if signature != self._pending_signature:
+            self._pending_signature = signature
+            return False
+        try:
+            self.reload(signature)
+        except Exception:
+            logger.exception("Reload failed; still serving version %s", self.snapshot.version)
+            return False
+        finally:
+            self._pending_signature = None
+        return True
+
+    def start_watching(self, interval=DEFAULT_RELOAD_INTERVAL):
+        """Poll the source files every interval seconds in a daemon thread"""
+        def watch():
+            while not self._stop.wait(interval):
+                self.check_for_changes()
+
+        self._watcher = threading.Thread(target=watch, name='serving-reload', daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _answer(self, snapshot, path, params):
+        if path == '/api/health':
+            return {'status': 'ok', 'version': snapshot.version, 'loaded_at': snapshot.loaded_at,
+                    'sources': [str(source) for source in self.sources]}
+        if path == '/api/dimensions':
+            return snapshot.dimensions()
+
+        unknown = set(params) - set(DIMENSIONS) - {'month_from', 'month_to', 'by'}
+        if unknown:
+            raise QueryError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+        filters = parse_filters(params)
+        if path == '/api/summary':
+            return {'filters': filters, **snapshot.summary(filters)}
+        if path == '/api/breakdown':
+            by = params.get('by', ['month'])[-1]
+            return {'filters': filters, 'by': by, **snapshot.breakdown(by, filters)}
+        raise QueryError(f"Unknown endpoint '{path}'", status=404)
+
+    def query(self, path, query_string=''):
+        """
+        Answer one request
+
+        Args:
+            path (str): Endpoint path, e.g. '/api/summary'
+            query_string (str): URL query string without '?'
+
+        Returns:
+            tuple: (body bytes, ETag string)
+
+        Raises:
+            QueryError: For unknown endpoints, parameters or filter values
+        """
+        snapshot = self.snapshot
+        params = parse_qs(query_string, keep_blank_values=False)
+        key = (snapshot.version, path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        body = json.dumps(self._answer(snapshot, path, params), separators=(',', ':')).encode()
+        # Content-derived, so responses unchanged by a reload still revalidate
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        with self._cache_lock:
+            self._cache[key] = (body, etag)
+            if len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return body, etag
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive connections
+    disable_nagle_algorithm = True  # small responses must not wait for delayed ACKs
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            body, etag = self.service.query(url.path, url.query)
+        except QueryError as e:
+            self._send(e.status, json.dumps({'error': str(e)}).encode())
+            return
+        except Exception:
+            logger.exception("Failed to answer %s", self.path)
+            self._send(500, b'{"error":"internal error"}')
+            return
+
+        if etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            self._send(304, b'', etag)
+        else:
+            self._send(200, body, etag)
+
+    def _send(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 drops bursts of new connections
+
+
+def make_server(service, host='127.0.0.1', port=8050):
+    """
+    HTTP server answering requests from service, one thread per connection
+
+    Args:
+        service (AnalyticsService): Query front end
+        host (str): Interface to bind
+        port (int): Port to bind (0 picks a free one; see server.server_address)
+
+    Returns:
+        ThreadingHTTPServer: Call serve_forever() to start serving
+    """
+    handler = type('RequestHandler', (_RequestHandler,), {'service': service})
+    return _Server((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve dashboard aggregates over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--transactions', default=str(DEFAULT_TRANSACTIONS_PATH))
+    parser.add_argument('--segments', default=str(DEFAULT_SEGMENTS_PATH))
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help='Seconds between source file checks (0 disables hot reload)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    service = AnalyticsService(args.transactions, args.segments)
+    if args.reload_interval > 0:
+        service.start_watching(args.reload_interval)
+    server = make_server(service, args.host, args.port)
+    logger.info("Serving on http://%s:%s/api/", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_watching()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
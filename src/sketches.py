@@ -0,0 +1,170 @@
+"""
+Mergeable Distinct-Count Sketches
+=================================
+
+Grouped HyperLogLog sketches for approximate ``nunique`` per group (e.g.
+distinct products per customer, or distinct customers per cohort cell) that
+can be built independently per chunk, partition or day and merged later.
+
+Each group keeps only its non-empty registers as (key, bucket, rank) rows
+(the "sparse" HyperLogLog representation), so a group never holds more than
+``2**precision`` entries and low-cardinality groups stay as small as their
+distinct values. Merging is a concatenation followed by a per-register max;
+estimates are only computed at output time. The relative standard error is
+about ``1.04 / sqrt(2**precision)``.
+
+Usage:
+    from src.sketches import GroupedHLL, precision_for_error
+
+    precision = precision_for_error(0.02)           # ~2% standard error
+    day1 = GroupedHLL.from_values(df1['customer_id'], df1['product'], precision)
+    day2 = GroupedHLL.from_values(df2['customer_id'], df2['product'], precision)
+    distinct_products = day1.merge(day2).estimate() # pd.Series indexed by customer
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PRECISION = 12
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+HASH_BITS = 64
+
+
+def precision_for_error(relative_error):
+    """Smallest precision whose standard error is at most relative_error"""
+    precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+    return int(min(max(precision, MIN_PRECISION), MAX_PRECISION))
+
+
+def standard_error(precision):
+    """Expected relative standard error of an estimate at the given precision"""
+    return 1.04 / math.sqrt(2 ** precision)
+
+
+def hash_values(values):
+    """Deterministic 64-bit hashes (stable across processes and runs)"""
+    return pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+
+
+def _bit_length(values):
+    """Bit length of uint64 values, exact (float64 conversion of 32-bit halves)"""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def _registers(hashes, precision):
+    """Bucket index and rank (position of the first set bit) of every hash"""
+    suffix_bits = HASH_BITS - precision
+    buckets = (hashes >> np.uint64(suffix_bits)).astype(np.int32)
+    suffix = hashes & np.uint64((1 << suffix_bits) - 1)
+    ranks = (suffix_bits - _bit_length(suffix) + 1).astype(np.uint8)
+    return buckets, ranks
+
+
+def _alpha(m):
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class GroupedHLL:
+    """
+    One sparse HyperLogLog sketch per group key.
+
+    entries is a DataFrame with columns ['key', 'bucket', 'rank'] holding at
+    most one row per (key, bucket).
+    """
+
+    def __init__(self, entries, precision=DEFAULT_PRECISION):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.entries = entries
+        self.precision = precision
+
+    @classmethod
+    def from_values(cls, keys, values, precision=DEFAULT_PRECISION):
+        """
+        Sketch the distinct values of every key
+
+        Args:
+            keys (array-like): Group key per row (e.g. customer id)
+            values (array-like): Value per row; missing keys/values are ignored
+            precision (int): log2 of the registers per sketch
+
+        Returns:
+            GroupedHLL
+        """
+        keys = pd.Series(keys).reset_index(drop=True)
+        values = pd.Series(values).reset_index(drop=True)
+        present = (keys.notna() & values.notna()).to_numpy()
+        buckets, ranks = _registers(hash_values(values[present]), precision)
+        entries = pd.DataFrame({'key': keys[present].to_numpy(), 'bucket': buckets, 'rank': ranks})
+        return cls(cls._collapse(entries), precision)
+
+    @staticmethod
+    def _collapse(entries):
+        """Keep the highest rank per (key, bucket)"""
+        collapsed = entries.groupby(['key', 'bucket'], sort=False)['rank'].max().reset_index()
+        return collapsed.astype({'bucket': np.int32, 'rank': np.uint8})
+
+    def merge(self, other):
+        """Union of two sketch sets (returns a new GroupedHLL)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precisions")
+        return GroupedHLL(self._collapse(pd.concat([self.entries, other.entries], ignore_index=True)),
+                          self.precision)
+
+    def select(self, keys):
+        """Sketches of the given keys only"""
+        return GroupedHLL(self.entries[self.entries['key'].isin(keys)].reset_index(drop=True), self.precision)
+
+    def regroup(self, groups):
+        """
+        Union the sketches of keys that map to the same group (e.g. cube cells
+        rolled up to one dimension)
+
+        Args:
+            groups (pd.Series): New key indexed by old key; unmapped keys are dropped
+
+        Returns:
+            GroupedHLL
+        """
+        keys = self.entries['key'].map(groups)
+        entries = self.entries.assign(key=keys)[keys.notna().to_numpy()]
+        return GroupedHLL(self._collapse(entries), self.precision)
+
+    def estimate(self):
+        """
+        Estimated distinct count per key
+
+        Returns:
+            pd.Series: Float estimates indexed by key
+        """
+        m = 2 ** self.precision
+        if self.entries.empty:
+            return pd.Series(dtype='float64')
+        inverse = np.ldexp(1.0, -self.entries['rank'].to_numpy().astype(np.int64))
+        grouped = pd.DataFrame({'key': self.entries['key'], 'inverse': inverse}).groupby('key', sort=True)['inverse']
+        nonzero = grouped.size()
+        zeros = m - nonzero
+        harmonic = zeros + grouped.sum()
+
+        estimate = _alpha(m) * m * m / harmonic
+        # Linear counting is more accurate while many registers are still empty
+        with np.errstate(divide='ignore'):
+            linear = m * np.log(m / zeros.where(zeros > 0))
+        use_linear = (estimate <= 2.5 * m) & (zeros > 0)
+        return estimate.where(~use_linear, linear).rename(None)
+
+    def nbytes(self):
+        """Memory held by the sketch entries"""
+        return int(self.entries.memory_usage(index=False, deep=True).sum())
@@ -0,0 +1,553 @@
+"""
+Chunked Streaming Feature Builder
+=================================
+
+Builds the same customer features as ``process_data`` without ever holding the
+raw transaction table in memory. The CSV is read in chunks and every chunk is
+reduced to mergeable per-customer partial aggregates (counts, sums, second
+central moments, min/max dates and distinct values), so peak memory is bounded
+by the chunk size plus the number of customers. With ``distinct_precision``
+the distinct values are kept as HyperLogLog sketches (``src.sketches``)
+instead of exact (customer, value) pairs, which caps their memory per
+customer; ``nunique`` features are then estimates.
+
+Usage:
+    from src.streaming import process_data_streaming
+
+    customer_features, column_mapping = process_data_streaming('../data/raw/saas_sales.csv',
+                                                               chunksize=100000)
+
+    # Approximate nunique features (~1.6% standard error)
+    customer_features, column_mapping = process_data_streaming('../data/raw/saas_sales.csv',
+                                                               distinct_precision=12)
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from src.data_processing import (
+    standardize_column_names,
+    create_column_mapping,
+    ensure_customer_id,
+    convert_date_columns,
+    build_aggregation_plan,
+    drop_uninformative_columns,
+    add_ratio_metrics,
+    merge_rfm_metrics,
+    final_data_cleanup,
+    is_numeric_feature_dtype,
+    parse_date_column,
+    pipeline_logging,
+)
+from src.sketches import GroupedHLL
+
+logger = logging.getLogger(__name__)
+
+
+def column_kind(dtype):
+    """Classify a column dtype into the partial-aggregate family used for it"""
+    if 'datetime' in str(dtype):
+        return 'datetime'
+    if dtype == 'bool':
+        return 'bool'
+    if is_numeric_feature_dtype(dtype):
+        return 'numeric'
+    return 'object'
+
+
+class CustomerAggregates:
+    """
+    Mergeable per-customer partial aggregates for a fixed aggregation plan.
+
+    Numeric columns keep the non-null count, the sum and the sum of squared
+    deviations from the mean (M2), which combine exactly across chunks using
+    Chan's parallel update. Datetime columns keep count/min/max and object
+    columns keep their count plus the distinct (customer, value) pairs needed
+    for ``nunique``. Missing numeric values are counted per customer so the
+    pipeline's median fill can be applied once the global median is known.
+
+    With ``distinct_precision`` set, object columns keep a HyperLogLog sketch
+    per customer (``GroupedHLL``) instead of the exact pairs; sketches merge
+    like the pairs do and are only turned into estimates in ``feature_table``.
+    """
+
+    def __init__(self, customer_id_col: str, agg_dict: Dict[str, List[str]],
+                 column_kinds: Dict[str, str], rfm_col: Optional[str] = None,
+                 distinct_precision: Optional[int] = None):
+        self.customer_id_col = customer_id_col
+        self.agg_dict = agg_dict
+        self.column_kinds = column_kinds
+        self.rfm_col = rfm_col
+        self.distinct_precision = distinct_precision
+        self.moments = None
+        self.distinct = {col: None for col, kind in column_kinds.items() if kind == 'object'}
+        self.n_rows = 0
+
+    @classmethod
+    def from_frame(cls, df, customer_id_col, agg_dict, column_kinds, rfm_col=None,
+                   distinct_precision=None):
+        """Reduce a cleaned transaction frame to per-customer partial aggregates"""
+        aggregates = cls(customer_id_col, agg_dict, column_kinds, rfm_col, distinct_precision)
+        aggregates.moments = aggregates._frame_moments(df)
+        for col in aggregates.distinct:
+            if distinct_precision is None:
+                aggregates.distinct[col] = df[[customer_id_col, col]].dropna().drop_duplicates()
+            else:
+                aggregates.distinct[col] = GroupedHLL.from_values(df[customer_id_col], df[col],
+                                                                  distinct_precision)
+        aggregates.n_rows = len(df)
+        return aggregates
+
+    def _frame_moments(self, df):
+        grouped = df.groupby(self.customer_id_col, sort=False)
+        sizes = grouped.size()
+        parts = {}
+        for col, kind in self.column_kinds.items():
+            if kind in ('numeric', 'bool'):
+                values = df[col].astype('int64') if kind == 'bool' else df[col]
+                g = values.groupby(df[self.customer_id_col], sort=False)
+                n = g.count()
+                parts[(col, 'n')] = n
+                parts[(col, 'sum')] = g.sum()
+                parts[(col, 'm2')] = (g.var(ddof=0) * n).fillna(0.0)
+                parts[(col, 'nulls')] = sizes - n
+            elif kind == 'datetime':
+                g = grouped[col]
+                parts[(col, 'n')] = g.count()
+                parts[(col, 'min')] = g.min()
+                parts[(col, 'max')] = g.max()
+            else:
+                parts[(col, 'n')] = grouped[col].count()
+
+        moments = pd.DataFrame(parts)
+        moments.index.name = self.customer_id_col
+        return moments
+
+    @staticmethod
+    def combine_moments(frames, column_kinds):
+        """
+        Combine any number of partial moment frames into one
+
+        Args:
+            frames (list): Moment frames indexed by customer id
+            column_kinds (dict): Column name -> partial-aggregate family
+
+        Returns:
+            pd.DataFrame: Combined moments with one row per customer
+        """
+        stacked = pd.concat(frames)
+        if len(frames) == 1:
+            return stacked
+
+        def grouped(key):
+            return stacked[key].groupby(level=0, sort=False)
+
+        parts = {}
+        for col, kind in column_kinds.items():
+            n = grouped((col, 'n')).sum()
+            parts[(col, 'n')] = n
+            if kind in ('numeric', 'bool'):
+                total = grouped((col, 'sum')).sum()
+                parts[(col, 'sum')] = total
+                parts[(col, 'nulls')] = grouped((col, 'nulls')).sum()
+
+                # Chan et al.: M2 = sum(M2_i + n_i * (mean_i - mean)^2)
+                n_i = stacked[(col, 'n')].to_numpy(dtype='float64')
+                mean_i = stacked[(col, 'sum')].to_numpy(dtype='float64') / np.where(n_i > 0, n_i, 1)
+                mean = (total / n.where(n > 0)).reindex(stacked.index).to_numpy(dtype='float64')
+                shift = np.where(n_i > 0, n_i * (mean_i - mean) ** 2, 0.0)
+                contrib = pd.Series(stacked[(col, 'm2')].to_numpy() + shift, index=stacked.index)
+                parts[(col, 'm2')] = contrib.groupby(level=0, sort=False).sum()
+            elif kind == 'datetime':
+                parts[(col, 'min')] = grouped((col, 'min')).min()
+                parts[(col, 'max')] = grouped((col, 'max')).max()
+
+        moments = pd.DataFrame(parts)
+        moments.index.name = stacked.index.name
+        return moments
+
+    def merge(self, other):
+        """
+        Fold another set of partial aggregates into this one (in place)
+
+        Only customers present on both sides go through the combine step; the
+        rest of the running state is carried over untouched.
+        """
+        if self.moments is None:
+            self.moments = other.moments
+            self.distinct = dict(other.distinct)
+        else:
+            overlap = self.moments.index.intersection(other.moments.index)
+            if len(overlap):
+                combined = self.combine_moments([self.moments.loc[overlap], other.moments], self.column_kinds)
+                self.moments = pd.concat([self.moments.drop(overlap), combined])
+            else:
+                self.moments = pd.concat([self.moments, other.moments])
+            for col, pairs in other.distinct.items():
+                if isinstance(pairs, GroupedHLL):
+                    self.distinct[col] = self.distinct[col].merge(pairs)
+                else:
+                    self.distinct[col] = pd.concat([self.distinct[col], pairs]).drop_duplicates()
+        self.n_rows += other.n_rows
+        return self
+
+    def update(self, df):
+        """Fold a cleaned chunk of transactions into the running aggregates"""
+        chunk = CustomerAggregates.from_frame(df, self.customer_id_col, self.agg_dict,
+                                              self.column_kinds, self.rfm_col, self.distinct_precision)
+        return self.merge(chunk)
+
+    def columns_with_missing_values(self):
+        """Numeric plan columns that had missing values in at least one row"""
+        return [col for col, kind in self.column_kinds.items()
+                if kind == 'numeric' and col in self.agg_dict and self.moments[(col, 'nulls')].sum() > 0]
+
+    def _numeric_statistic(self, moments, col, agg, fill_value):
+        n = moments[(col, 'n')]
+        total = moments[(col, 'sum')]
+        m2 = moments[(col, 'm2')]
+
+        # Apply the median fill: `nulls` extra observations equal to fill_value
+        if fill_value is not None:
+            nulls = moments[(col, 'nulls')]
+            filled_n = n + nulls
+            mean = total / n.where(n > 0)
+            shift = (n * nulls / filled_n.where(filled_n > 0)) * (mean - fill_value) ** 2
+            m2 = m2 + shift.fillna(0.0)
+            total = total + nulls * fill_value
+            n = filled_n
+
+        if agg == 'count':
+            return n
+        if agg == 'sum':
+            return total
+        if agg == 'mean':
+            return total / n.where(n > 0)
+        if agg == 'std':
+            return np.sqrt(m2 / (n - 1).where(n > 1))
+        raise ValueError(f"Unsupported aggregation '{agg}' for numeric column '{col}'")
+
+    def _statistic(self, moments, col, agg, fill_value=None):
+        kind = self.column_kinds[col]
+        if kind in ('numeric', 'bool'):
+            return self._numeric_statistic(moments, col, agg, fill_value)
+        if agg == 'count':
+            return moments[(col, 'n')]
+        if kind == 'datetime' and agg in ('min', 'max'):
+            return moments[(col, agg)]
+        if kind == 'object' and agg == 'nunique':
+            pairs = self.distinct[col]
+            if isinstance(pairs, GroupedHLL):
+                estimates = np.rint(pairs.select(moments.index).estimate()).astype('int64')
+                return estimates.reindex(moments.index, fill_value=0)
+            return pairs.groupby(self.customer_id_col).size().reindex(moments.index, fill_value=0)
+        raise ValueError(f"Unsupported aggregation '{agg}' for {kind} column '{col}'")
+
+    def _sorted_moments(self, customer_ids=None):
+        if customer_ids is not None:
+            return self.moments.loc[customer_ids].sort_index()
+        return self.moments.sort_index()
+
+    def feature_table(self, fill_values=None, customer_ids=None):
+        """
+        Materialize every planned feature, before constant/empty columns are pruned
+
+        Args:
+            fill_values (dict): Median fill value per numeric column with missing values
+            customer_ids (list): Restrict to these customers (default: all)
+
+        Returns:
+            pd.DataFrame: One row per customer, sorted by customer id
+        """
+        fill_values = fill_values or {}
+        moments = self._sorted_moments(customer_ids)
+
+        features = {}
+        for col, aggs in self.agg_dict.items():
+            for agg in aggs:
+                features[f"{col}_{agg}"] = self._statistic(moments, col, agg, fill_values.get(col))
+
+        return pd.DataFrame(features, index=moments.index).reset_index()
+
+    def to_customer_features(self, fill_values=None):
+        """
+        Materialize the flattened feature table produced by ``create_customer_features``
+
+        Args:
+            fill_values (dict): Median fill value per numeric column with missing values
+
+        Returns:
+            pd.DataFrame: One row per customer, sorted by customer id
+        """
+        return drop_uninformative_columns(self.feature_table(fill_values), self.customer_id_col)
+
+    def rfm_frame(self, customer_ids=None):
+        """Per-customer last transaction date and frequency for the RFM column"""
+        moments = self._sorted_moments(customer_ids)
+        customer_rfm = pd.DataFrame({
+            'last_transaction_date': moments[(self.rfm_col, 'max')],
+            'frequency': moments[(self.rfm_col, 'n')],
+        }, index=moments.index).reset_index()
+        return customer_rfm, self.moments[(self.rfm_col, 'max')].max()
+
+
+# Key bits resolved per histogram pass of the median selection
+MEDIAN_RADIX_BITS = 16
+
+
+def _sortable_keys(values):
+    """Map float64 values to uint64 keys with the same order"""
+    bits = np.ascontiguousarray(values, dtype='float64').view(np.uint64)
+    negative = (bits >> np.uint64(63)).astype(bool)
+    return np.where(negative, ~bits, bits | np.uint64(1 << 63))
+
+
+def _key_value(key):
+    """Inverse of ``_sortable_keys`` for a single key"""
+    bits = key ^ (1 << 63) if key >> 63 else ~key & ((1 << 64) - 1)
+    return float(np.array([bits], dtype=np.uint64).view('float64')[0])
+
+
+class _RankSearch:
+    """Radix selection of one rank: the key prefix known to hold it"""
+
+    def __init__(self, rank, size):
+        self.rank = rank  # rank among the values with the prefix
+        self.size = size  # number of values with the prefix
+        self.prefix = 0
+        self.bits = 0
+
+    def matching(self, keys):
+        if self.bits == 0:
+            return keys
+        return keys[(keys >> np.uint64(64 - self.bits)) == np.uint64(self.prefix)]
+
+    def digits(self, keys):
+        shift = np.uint64(64 - self.bits - MEDIAN_RADIX_BITS)
+        return ((keys >> shift) & np.uint64((1 << MEDIAN_RADIX_BITS) - 1)).astype(np.int64)
+
+    def narrow(self, counts):
+        """Descend into the bucket of the next key bits that holds the rank"""
+        cumulative = np.cumsum(counts)
+        bucket = int(np.searchsorted(cumulative, self.rank, side='right'))
+        self.rank -= int(cumulative[bucket] - counts[bucket])
+        self.size = int(counts[bucket])
+        self.prefix = (self.prefix << MEDIAN_RADIX_BITS) | bucket
+        self.bits += MEDIAN_RADIX_BITS
+
+
+def _column_keys(filepath, raw_names, id_column, columns, chunksize, read_csv_kwargs):
+    """Column-projected pass: sortable keys of the non-missing values per chunk"""
+    usecols = [raw_names[col] for col in columns]
+    if id_column is not None:
+        usecols.append(raw_names[id_column])
+    for chunk in pd.read_csv(filepath, chunksize=chunksize, usecols=usecols, **read_csv_kwargs):
+        if id_column is not None:
+            chunk = chunk.dropna(subset=[raw_names[id_column]])
+        yield {col: _sortable_keys(chunk[raw_names[col]].dropna().to_numpy(dtype='float64')) for col in columns}
+
+
+def compute_column_medians(filepath, raw_names, id_column, columns, chunksize, read_csv_kwargs):
+    """
+    Exact global median fill values, in memory bounded by the chunk size
+
+    The two middle ranks of every column are found by radix selection over
+    order-preserving integer keys of the values: each column-projected pass
+    histograms the next key bits inside the prefix holding a rank (the first
+    pass also counts the values), until at most ``chunksize`` values share
+    that prefix and a last pass selects the rank among them directly.
+    """
+    def passes():
+        return _column_keys(filepath, raw_names, id_column, columns, chunksize, read_csv_kwargs)
+
+    # The first pass histograms the top key bits of all values, which also counts them
+    top = {col: np.zeros(1 << MEDIAN_RADIX_BITS, dtype=np.int64) for col in columns}
+    for keys in passes():
+        for col in columns:
+            top[col] += np.bincount(_RankSearch(0, 0).digits(keys[col]), minlength=1 << MEDIAN_RADIX_BITS)
+    searches = {}
+    for col, histogram in top.items():
+        n = int(histogram.sum())
+        searches[col] = [_RankSearch(rank, n) for rank in sorted({(n - 1) // 2, n // 2})] if n else []
+        for search in searches[col]:
+            search.narrow(histogram)
+    limit = max(chunksize, 1)
+
+    while True:
+        pending = [(col, search) for col, col_searches in searches.items() for search in col_searches
+                   if search.size > limit and search.bits < 64]
+        if not pending:
+            break
+        histograms = [np.zeros(1 << MEDIAN_RADIX_BITS, dtype=np.int64) for _ in pending]
+        for keys in passes():
+            for (col, search), histogram in zip(pending, histograms):
+                histogram += np.bincount(search.digits(search.matching(keys[col])),
+                                         minlength=1 << MEDIAN_RADIX_BITS)
+        for (_, search), histogram in zip(pending, histograms):
+            search.narrow(histogram)
+
+    # Ranks whose prefix still holds several distinct keys are selected among them
+    selected = {}
+    open_searches = [(col, search) for col, col_searches in searches.items() for search in col_searches
+                     if search.bits < 64]
+    if open_searches:
+        matches = [[] for _ in open_searches]
+        for keys in passes():
+            for (col, search), parts in zip(open_searches, matches):
+                parts.append(search.matching(keys[col]))
+        for (_, search), parts in zip(open_searches, matches):
+            keys = np.concatenate(parts)
+            selected[id(search)] = _key_value(int(np.partition(keys, search.rank)[search.rank]))
+
+    medians = {}
+    for col, col_searches in searches.items():
+        values = [selected[id(search)] if search.bits < 64 else _key_value(search.prefix)
+                  for search in col_searches]
+        medians[col] = float(np.mean(values)) if values else float('nan')
+    return medians
+
+
+def iter_rows_after(source, date_column, watermark, chunksize, read_csv_kwargs, parse_dates=parse_date_column):
+    """
+    Yield the raw rows dated after ``watermark`` from a CSV path or dataframe
+
+    Only ``date_column`` is parsed before the filter, so rows at or before the
+    watermark (and rows without a date) are never standardized, cleaned or
+    aggregated by incremental refreshes. With no watermark every row is new.
+    """
+    if isinstance(source, pd.DataFrame):
+        chunks = [source]
+    else:
+        chunks = pd.read_csv(source, chunksize=chunksize, **read_csv_kwargs)
+    for chunk in chunks:
+        if watermark is not None:
+            chunk = chunk[(parse_dates(chunk[date_column]) > watermark).to_numpy()]
+        if len(chunk):
+            yield chunk
+
+
+def clean_chunk(standardized, customer_id_col):
+    """Per-chunk part of ``clean_data``: drop rows without an id, parse date columns"""
+    # Explicit copy: date parsing assigns columns to the filtered frame
+    standardized = standardized.dropna(subset=[customer_id_col]).copy()
+    return convert_date_columns(standardized)
+
+
+def build_customer_aggregates(filepath, chunksize=100000, distinct_precision=None, **read_csv_kwargs):
+    """
+    Stream a raw CSV into per-customer partial aggregates
+
+    The column mapping, aggregation plan and date columns are resolved on the
+    first chunk and applied to every later one. ``distinct_precision`` switches
+    distinct values to HyperLogLog sketches of that precision.
+
+    Returns:
+        tuple: (aggregates, column_mapping, raw_names, synthetic_id) where
+            raw_names maps standardized to original column names and
+            synthetic_id tells whether customer ids were generated
+    """
+    aggregates = None
+    raw_names = {}
+    synthetic_id = False
+    n_chunks = 0
+
+    for chunk in pd.read_csv(filepath, chunksize=chunksize, **read_csv_kwargs):
+        standardized = standardize_column_names(chunk)
+
+        if aggregates is None:
+            raw_names = dict(zip(standardized.columns, chunk.columns))
+            actual_column_mapping = create_column_mapping(standardized)
+            synthetic_id = 'customer_id' not in standardized.columns
+            standardized, actual_column_mapping = ensure_customer_id(standardized, actual_column_mapping)
+            synthetic_id = synthetic_id and 'customer_id' in standardized.columns
+            customer_id_col = actual_column_mapping['customer_id']
+        elif synthetic_id:
+            standardized['customer_id'] = range(aggregates.n_rows, aggregates.n_rows + len(standardized))
+
+        standardized, date_columns = clean_chunk(standardized, customer_id_col)
+
+        if aggregates is None:
+            agg_dict = build_aggregation_plan(standardized, actual_column_mapping)
+            if not agg_dict:
+                raise ValueError("No columns available for streaming aggregation")
+            column_kinds = {col: column_kind(standardized[col].dtype) for col in agg_dict}
+            rfm_col = date_columns[0] if date_columns else None
+            if rfm_col is not None:
+                column_kinds.setdefault(rfm_col, 'datetime')
+            aggregates = CustomerAggregates(customer_id_col, agg_dict, column_kinds, rfm_col,
+                                            distinct_precision)
+            logger.debug("Aggregation dictionary: %s", list(agg_dict.keys()))
+
+        aggregates.update(standardized)
+        n_chunks += 1
+
+    if aggregates is None:
+        raise ValueError(f"No rows found in {filepath}")
+
+    logger.info("Aggregated %d rows in %d chunks into %d customers",
+                aggregates.n_rows, n_chunks, len(aggregates.moments))
+    return aggregates, actual_column_mapping, raw_names, synthetic_id
+
+
+def materialize_customer_features(aggregates, fill_values=None):
+    """
+    Final customer features from partial aggregates: prune, ratios, RFM, cleanup
+    """
+    customer_id_col = aggregates.customer_id_col
+    customer_features = aggregates.to_customer_features(fill_values)
+    customer_features = add_ratio_metrics(customer_features, customer_id_col)
+
+    if aggregates.rfm_col is not None:
+        customer_rfm, current_date = aggregates.rfm_frame()
+        customer_features = merge_rfm_metrics(customer_features, customer_rfm,
+                                              current_date, customer_id_col)
+
+    return final_data_cleanup(customer_features, customer_id_col)
+
+
+def process_data_streaming(filepath, chunksize=100000, verbose=True, distinct_precision=None,
+                           **read_csv_kwargs):
+    """
+    Build customer features from a raw CSV in bounded memory
+
+    Produces the same ``customer_features`` as ``process_data`` while only
+    holding one chunk of raw rows plus per-customer partial aggregates. The
+    column mapping, aggregation plan and date columns are resolved on the first
+    chunk. If numeric plan columns contain missing values, a second pass reads
+    just those columns to compute the global median used for filling.
+
+    Args:
+        filepath (str): Path to the raw transactions CSV
+        chunksize (int): Number of raw rows read per chunk
+        verbose (bool): Print progress (see ``pipeline_logging``)
+        distinct_precision (int): Estimate ``nunique`` features with HyperLogLog
+            sketches of this precision (None: exact distinct counts)
+        **read_csv_kwargs: Extra keyword arguments forwarded to ``pd.read_csv``
+
+    Returns:
+        tuple: (customer_features, column_mapping)
+    """
+    with pipeline_logging(verbose):
+        return _process_data_streaming(filepath, chunksize, distinct_precision, read_csv_kwargs)
+
+
+def _process_data_streaming(filepath, chunksize, distinct_precision, read_csv_kwargs):
+    logger.info("Starting streaming data processing (chunksize=%d)...", chunksize)
+
+    aggregates, actual_column_mapping, raw_names, synthetic_id = build_customer_aggregates(
+        filepath, chunksize, distinct_precision, **read_csv_kwargs)
+
+    fill_values = {}
+    missing_cols = aggregates.columns_with_missing_values()
+    if missing_cols:
+        id_column = None if synthetic_id else aggregates.customer_id_col
+        fill_values = compute_column_medians(filepath, raw_names, id_column, missing_cols,
+                                      chunksize, read_csv_kwargs)
+
+    customer_features = materialize_customer_features(aggregates, fill_values)
+
+    logger.info("\nFinal customer features shape: %s", customer_features.shape)
+    return customer_features, actual_column_mapping
@@ -0,0 +1,15 @@
+import pandas as pd
+
+from src.data_processing import process_data
+from src.pipeline_cache import StageCache, process_data_cached
+
+
+def test_mixed_object_column_is_processed_without_caching(tmp_path):
+    raw = pd.DataFrame({'customer_id': ['c1', 'c2', 'c3', 'c1'], 'amount': [1.0, 2.0, 3.0, 4.0],
+                        'note': ['a', 1, None, 'b']})
+    expected = process_data(raw.copy(), verbose=False)[0]
+    cache = StageCache(tmp_path)
+
+    for _ in range(2):
+        customer_features, _ = process_data_cached(raw.copy(), cache, verbose=False)
+        pd.testing.assert_frame_equal(customer_features, expected)